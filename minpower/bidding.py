@@ -1,8 +1,10 @@
 import numpy as np
-from .commonscripts import update_attributes, pairwise
-from .optimization import value, OptimizationObject
+import pandas as pd
+from .commonscripts import update_attributes
+from .optimization import value, values_array, OptimizationObject
 from .config import user_config
 import re
+from functools import lru_cache
 from pyomo.environ import Piecewise
 
 
@@ -12,6 +14,12 @@ class Bid(OptimizationObject):
     A bid modeled by a polynomial or a set of piecewise points.
     """
 
+    # the (intercept, slope) of the lines bounding a convex cost
+    # (when the cost is modeled by cuts instead of a piecewise model)
+    cuts = None
+    # the largest difference between the linearized and the true cost
+    linearization_error = 0
+
     def __init__(
         self,
         polynomial="10P",
@@ -51,26 +59,18 @@ class Bid(OptimizationObject):
 
             self.add_variable("cost", index=self.times.set, low=0)
 
-            def pw_rule(model, time, input_var):
-                return polynomial_value(polynomial, input_var)
-
-            self.discrete_input_points = discretize_range(
-                self.num_breakpoints, self.min_input, self.max_input
-            )
-            in_pts = dict((t, self.discrete_input_points) for t in self.times.set)
-
-            pw_representation = Piecewise(
-                self.times.set,
-                self.get_variable("cost", time=None, indexed=True),
-                self.input_variable(),
-                f_rule=pw_rule,
-                pw_pts=in_pts,
-                pw_constr_type="LB",
-                warn_domain_coverage=False,
-                # unless warn_domain_coverage is set, pyomo will complain
-                # gen lower power bounds are set to zero (status trick)
-                # and Piecewise complains if Pmin>0,
+            # identical curves share their breakpoints, costs and rule
+            template = bid_template(
+                tuple(polynomial),
+                self.min_input,
+                self.max_input,
+                self.num_breakpoints,
+                user_config.breakpoint_error,
             )
+            self.discrete_input_points = list(template.points)
+            self.linearization_error = template.linearization_error
+            outputs = template.outputs
+            pw_kwargs = dict(f_rule=template.rule)
 
         else:
             # custom bid points
@@ -78,27 +78,48 @@ class Bid(OptimizationObject):
             self.is_pwl = True
             self.add_variable("cost", index=self.times.set, low=0)
             self.discrete_input_points = self.bid_points.power.values.tolist()
-            in_pts = dict((t, self.discrete_input_points) for t in self.times.set)
+            outputs = self.bid_points.cost.values
             mapping = self.bid_points.set_index("power").to_dict()["cost"]
+            if self.discrete_input_points[0] > 0:
+                # the input (and cost) is zero when the unit is off
+                self.discrete_input_points.insert(0, 0)
+                outputs = np.concatenate([[0], outputs])
+                mapping[0] = 0
 
             def pw_rule_points(model, time, input_var):
                 # just the input->output points mapping in this case
                 # see coopr/examples/pyomo/piecewise/example3.py
                 return mapping[input_var]
 
-            pw_representation = Piecewise(
-                self.times.set,
-                self.get_variable("cost", time=None, indexed=True),
-                self.input_variable(),
-                pw_pts=in_pts,
-                pw_constr_type="LB",
-                pw_repn="DCC",  # the disagregated convex combination method
+            pw_kwargs = dict(
                 f_rule=pw_rule_points,
-                warn_domain_coverage=False,
+                pw_repn="DCC",  # the disagregated convex combination method
             )
 
+        self.max_output = outputs[-1]
+        if user_config.cost_cuts and is_convex(self.discrete_input_points, outputs):
+            # the cost is at least the line through each segment -
+            # the cuts for all bids are created at once
+            # (see :meth:`~powersystems.PowerSystem.create_cost_cuts`)
+            points = np.array(self.discrete_input_points, dtype=float)
+            slopes = np.diff(outputs) / np.diff(points)
+            self.cuts = list(zip(outputs[:-1] - slopes * points[:-1], slopes))
+            return
+
+        in_pts = dict((t, self.discrete_input_points) for t in self.times.set)
+        pw_representation = Piecewise(
+            self.times.set,
+            self.get_variable("cost", time=None, indexed=True),
+            self.input_variable(),
+            pw_pts=in_pts,
+            pw_constr_type="LB",
+            warn_domain_coverage=False,
+            # unless warn_domain_coverage is set, pyomo will complain
+            # gen lower power bounds are set to zero (status trick)
+            # and Piecewise complains if Pmin>0,
+            **pw_kwargs
+        )
         pw_representation.name = self.iden()
-        self.max_output = pw_representation._f_rule(None, None, self.max_input)
         self._parent_problem().add_component_to_problem(pw_representation)
 
     def output(self, time=None, scenario=None, evaluate=False):
@@ -120,6 +141,23 @@ class Bid(OptimizationObject):
 
         return out
 
+    def output_values(self, times, status, power, scenario=None):
+        """
+        Output of the bid over times (as an array),
+        given arrays of the status and input values.
+        """
+        if self.is_linear:
+            out = self.polynomial[1] * power
+        else:
+            out = values_array(
+                self.get_variable("cost", indexed=True, scenario=scenario),
+                times.strings.values,
+            )
+
+        if self.constant_term != 0:
+            out = out + status * self.constant_term
+        return out
+
     def output_true(self, input_var, force_linear=False):
         """true output value of bid"""
         input_val = value(input_var)
@@ -127,38 +165,40 @@ class Bid(OptimizationObject):
         if (self.is_pwl or force_linear) and not self.is_linear:
             if not self.is_pwl and self.bid_points is None:
                 # construct the bid points
-                bid_pt_outputs = [
-                    polynomial_value(self.polynomial, pt)
-                    for pt in self.discrete_input_points
-                ]
-                self.bid_points = list(zip(self.discrete_input_points, bid_pt_outputs))
-
-            for A, B in pairwise(self.bid_points.values.tolist()):
-                if A[0] <= input_val <= B[0]:
-                    return get_line_value(A, B, input_val) + self.constant_term
+                self.bid_points = pd.DataFrame(
+                    dict(
+                        power=self.discrete_input_points,
+                        cost=polynomial_value(
+                            self.polynomial, np.array(self.discrete_input_points)
+                        ),
+                    )
+                )
+            out = piecewise_value(
+                self.bid_points.power.values, self.bid_points.cost.values, input_val
+            )
+            return None if np.isnan(out) else out + self.constant_term
         else:
             return polynomial_value(self.polynomial, input_val)
 
     def output_incremental(self, input_var):
         input_val = value(input_var)
         if self.is_pwl:
-            for A, B in pairwise(self.bid_points):
-                if A[0] <= input_val <= B[0]:
-                    return get_line_slope(A, B)
+            out = piecewise_slope(
+                self.bid_points.power.values, self.bid_points.cost.values, input_val
+            )
+            return None if np.isnan(out) else float(out)
         else:
-            return polynomial_incremental_value(self.polynomial, value(input_var))
+            return polynomial_incremental_value(self.polynomial, input_val)
 
     def output_incremental_range(self):
         if self.is_pwl:
             input_range = self.discrete_input_points
-            output_range = [0]
-            for A, B in pairwise(self.bid_points):
-                output_range.append(get_line_slope(A, B))
+            output_range = [0] + (
+                np.diff(self.bid_points.cost.values) / np.diff(input_range)
+            ).tolist()
         else:
             input_range = np.arange(self.min_input, self.max_input, 1.0)
-            output_range = [
-                polynomial_incremental_value(self.polynomial, x) for x in input_range
-            ]
+            output_range = polynomial_incremental_value(self.polynomial, input_range)
         return input_range, output_range
 
     def __str__(self):
@@ -182,35 +222,213 @@ def is_linear(coefs):
     return result
 
 
+def is_convex(points, outputs, tolerance=1e-9):
+    """are the slopes between the points non-decreasing"""
+    slopes = np.diff(outputs) / np.diff(np.asarray(points, dtype=float))
+    return bool(
+        np.all(np.diff(slopes) >= -tolerance * max(1, np.abs(slopes).max()))
+    )
+
+
 def discretize_range(num_breakpoints, minimum, maximum):
     step = (maximum - minimum) / float(num_breakpoints - 1)
     return [x * step + minimum for x in range(int(num_breakpoints))]
 
 
-def polynomial_value(multipliers, variable):
-    """get the value of a polynomial"""
+def adaptive_breakpoints(polynomial, minimum, maximum, tolerance, samples=1001):
+    """
+    Place the breakpoints of a polynomial's linearization so that the
+    error of each segment is within the tolerance, using few segments.
+
+    The segments are spaced by the curvature of the polynomial - the
+    error of a segment of length h is about h^2 |f''| / 8, so spacing
+    points at equal steps of the integral of sqrt(|f''|) gives segments
+    with equal errors. Segments are added until the (exact) error of
+    each is within the tolerance.
+    """
+    if maximum <= minimum:
+        return [minimum, maximum]
+    x = np.linspace(minimum, maximum, samples)
+    curvature = np.sqrt(np.abs(polynomial_value(second_derivative(polynomial), x)))
+    # the cumulative integral of the square root of the curvature
+    spacing = np.concatenate(
+        [[0], np.cumsum((curvature[1:] + curvature[:-1]) / 2 * np.diff(x))]
+    )
+    if spacing[-1] == 0:
+        # linear
+        return [minimum, maximum]
+    num_segments = max(1, int(np.ceil(spacing[-1] / np.sqrt(8 * tolerance))))
+    while True:
+        points = np.interp(
+            np.linspace(0, spacing[-1], num_segments + 1), spacing, x
+        ).tolist()
+        # the ends are exact
+        points[0], points[-1] = minimum, maximum
+        if linearization_errors(polynomial, points).max() <= tolerance * (1 + 1e-9):
+            return points
+        num_segments += 1
+
+
+def linearization_errors(polynomial, points):
+    """
+    The largest difference between a polynomial and its
+    linear interpolation between each pair of points.
+    """
+    points = np.asarray(points, dtype=float)
+    outputs = polynomial_value(polynomial, points)
+    errors = np.zeros(max(len(points) - 1, 1))
+    derivative = [mult * order for order, mult in enumerate(polynomial)][1:]
+    for i, (start, end) in enumerate(zip(points[:-1], points[1:])):
+        if end <= start:
+            continue
+        slope = (outputs[i + 1] - outputs[i]) / (end - start)
+        # the error is largest where the slopes are equal
+        roots = np.polynomial.polynomial.polyroots(
+            [derivative[0] - slope] + derivative[1:]
+        )
+        roots = roots[np.isreal(roots)].real
+        roots = roots[(roots > start) & (roots < end)]
+        if len(roots):
+            line = outputs[i] + slope * (roots - start)
+            errors[i] = np.abs(polynomial_value(polynomial, roots) - line).max()
+    return errors
+
+
+class BidTemplate(object):
+
+    """
+    The linearization of a polynomial cost curve - its breakpoints,
+    the costs at those points, the error bound and the piecewise rule -
+    which is shared by all of the bids with the same curve and limits.
+    """
+
+    def __init__(self, polynomial, minimum, maximum, num_breakpoints, tolerance):
+        if tolerance > 0:
+            points = adaptive_breakpoints(polynomial, minimum, maximum, tolerance)
+        else:
+            points = discretize_range(num_breakpoints, minimum, maximum)
+        # (the output between zero and the minimum is never used)
+        self.linearization_error = linearization_errors(polynomial, points).max()
+        if minimum > 0:
+            # the input is zero when the unit is off
+            points = [0] + list(points)
+        self.points = tuple(points)
+        self.outputs = polynomial_value(polynomial, np.array(points))
+        self.outputs.flags.writeable = False
+
+        def rule(model, time, input_var):
+            return polynomial_value(polynomial, input_var)
+
+        self.rule = rule
 
-    def term(mult, var, order):
-        if order > 1:
-            return mult * variable ** order
-        elif order == 1:
-            return mult * variable
-        elif order == 0:
-            return mult
 
-    return sum([term(mult, variable, order) for order, mult in enumerate(multipliers)])
+@lru_cache(maxsize=None)
+def bid_template(polynomial, minimum, maximum, num_breakpoints, tolerance=0):
+    """
+    get the (shared) :class:`BidTemplate` for a polynomial (as a tuple)
+    between the limits, with evenly spaced breakpoints or (if the
+    tolerance is set) adaptive breakpoints
+    """
+    return BidTemplate(polynomial, minimum, maximum, num_breakpoints, tolerance)
+
+
+def second_derivative(polynomial):
+    """the coefficients of a polynomial's second derivative"""
+    derivative = [mult * order for order, mult in enumerate(polynomial)][1:]
+    return [mult * order for order, mult in enumerate(derivative)][1:] or [0]
+
+
+class BidArrays(object):
+
+    """
+    The bids of a set of generators as arrays, to evaluate their
+    true and incremental outputs for a (generator x time) array of
+    inputs at once. The polynomial bids are stacked into a matrix of
+    coefficients (one row per bid, padded with zeros). Each piecewise
+    bid's segments are looked up by a search of its bid points.
+
+    :param bids: list of :class:`~bidding.Bid` objects
+    """
+
+    def __init__(self, bids):
+        self.bids = bids
+        self.is_pwl = np.array([bid.is_pwl for bid in bids], dtype=bool)
+        self.is_pwl_output = np.array(
+            [bid.is_pwl and not bid.is_linear for bid in bids], dtype=bool
+        )
+
+        polynomials = [
+            [] if bid.is_pwl else list(bid.polynomial) for bid in bids
+        ]
+        order = max([len(poly) for poly in polynomials] + [1])
+        self.coefficients = np.zeros((len(bids), order))
+        for i, poly in enumerate(polynomials):
+            self.coefficients[i, : len(poly)] = poly
+        self.incremental_coefficients = self.coefficients[:, 1:] * np.arange(1, order)
+
+    def output_true(self, inputs):
+        """true outputs of the bids (a row of inputs for each bid)"""
+        out = polynomial_value(self.coefficients.T, inputs.T).T
+        for i in np.flatnonzero(self.is_pwl_output):
+            bid = self.bids[i]
+            out[i] = (
+                piecewise_value(
+                    bid.bid_points.power.values, bid.bid_points.cost.values, inputs[i]
+                )
+                + bid.constant_term
+            )
+        return out
+
+    def output_incremental(self, inputs):
+        """incremental outputs of the bids (a row of inputs for each bid)"""
+        out = polynomial_value(self.incremental_coefficients.T, inputs.T).T
+        for i in np.flatnonzero(self.is_pwl):
+            bid = self.bids[i]
+            out[i] = piecewise_slope(
+                bid.bid_points.power.values, bid.bid_points.cost.values, inputs[i]
+            )
+        return out
+
+
+def polynomial_value(multipliers, variable):
+    """
+    get the value of a polynomial (by Horner's method). The variable
+    can be an array, and the multipliers can be arrays of the
+    same shape (e.g. the coefficients of many polynomials).
+    """
+    out = 0 * variable
+    for mult in reversed(list(multipliers)):
+        out = out * variable + mult
+    return out
 
 
 def polynomial_incremental_value(multipliers, variable):
     """get the incremental value of a polynomial"""
-    return sum(
-        [
-            (mult * order * variable ** (order - 1) if order > 0 else 0)
-            for order, mult in enumerate(multipliers)
-        ]
+    return polynomial_value(
+        [mult * order for order, mult in enumerate(multipliers)][1:], variable
     )
 
 
+def piecewise_value(points, outputs, variable):
+    """
+    get the value of a piecewise linear function
+    (NaN outside of the points)
+    """
+    return np.interp(variable, points, outputs, left=np.nan, right=np.nan)
+
+
+def piecewise_slope(points, outputs, variable):
+    """
+    get the slope of the segment of a piecewise linear function
+    (NaN outside of the points). At a point between two segments,
+    this is the slope of the lower segment.
+    """
+    slopes = np.diff(outputs) / np.diff(points)
+    segment = np.clip(np.searchsorted(points, variable) - 1, 0, len(slopes) - 1)
+    outside = (variable < points[0]) | (variable > points[-1])
+    return np.where(outside, np.nan, slopes[segment])
+
+
 def parse_polynomial(s):
     """
     Parse a string into a set of multipliers.
@@ -231,6 +449,13 @@ def parse_polynomial(s):
     >>> parse_polynomial('6*P - 5 + 7*P^2')
     [-5.0, 6.0, 7.0]
     """
+    # remove all whitespace from string
+    return list(_parse_polynomial(str(s).replace(" ", "")))
+
+
+@lru_cache(maxsize=None)
+def _parse_polynomial(s):
+    """parse a polynomial string (without whitespace) into a tuple of multipliers"""
 
     def parse_n(s):
         """Parse the number part of a polynomial string term"""
@@ -240,7 +465,7 @@ def parse_polynomial(s):
             return -1
         elif s == "+":
             return 1
-        return float(eval(s))
+        return float(s)
 
     def parse_p(s, powerPattern):
         """Parse the power part of a polynomial string term"""
@@ -251,7 +476,6 @@ def parse_polynomial(s):
             return 1
         return int(multipliers)
 
-    s = str(s).replace(" ", "")  # remove all whitespace from string
     m = re.search("[a-zA-Z]+", s)
     try:
         varLetter = m.group(0)
@@ -277,7 +501,7 @@ def parse_polynomial(s):
     for key, val in list(order_multipliers.items()):
         multipliers[key] = val
 
-    return multipliers
+    return tuple(multipliers)
 
 
 def get_line_slope(A, B):
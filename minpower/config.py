@@ -21,15 +21,25 @@ parser.read(
 option_types = dict(
     duals=bool,
     breakpoints=int,
+    breakpoint_error=float,
     hours_commitment=int,
     hours_overlap=int,
+    warmstart=bool,
+    pipeline_stages=bool,
     cost_load_shedding=float,
     cost_wind_shedding=float,
     economic_wind_shed=bool,
+    prebuilt_shedding=bool,
     dispatch_decommit_allowed=bool,
+    fleet_formulation=bool,
+    cost_cuts=bool,
+    ptdf_formulation=bool,
+    ptdf_tolerance=float,
+    lazy_line_limits=bool,
     solver=str,
     mipgap=float,
     solver_time_limit=float,
+    persistent_solver=bool,
     reserve_fixed=float,
     reserve_load_fraction=float,
     faststart_resolve=bool,
@@ -39,14 +49,24 @@ option_types = dict(
     output_prefix=bool,
     debugger=bool,
     scenarios=int,
+    scenario_reduction=bool,
+    scenario_reduction_tolerance=float,
+    scenario_cache=bool,
+    scenario_processes=int,
     deterministic_solve=bool,
     perfect_solve=bool,
     scenarios_directory=str,
     cvar_weight=float,
     cvar_confidence_level=float,
+    progressive_hedging=bool,
+    ph_rho=float,
+    ph_max_iterations=int,
+    ph_tolerance=float,
+    ph_processes=int,
     standalone=bool,
     pid=str,
     standalone_restart=bool,
+    phase_times=bool,
     wind_forecast_adder=float,
     wind_multiplier=float,
     wind_capacity_factor=float,
@@ -74,7 +94,9 @@ def parser_value(parser, section, key, opt_type):
     if opt_type == bool:
         meth += "boolean"
     elif opt_type == str:
-        pass
+        value = parser.get(section, key)
+        # an empty string is written as "" in the config files
+        return "" if value in ('""', "''") else value
     else:
         meth += str(opt_type).split("'")[1]
     return getattr(parser, meth)(section, key)
@@ -201,6 +223,12 @@ def setup_parser_args(parser):
         "-b",
         help="number of breakpoints to use in piecewise linearization of polynomial costs",
     )
+    add_opt(
+        parser,
+        "breakpoint_error",
+        help="place the breakpoints of each polynomial cost to linearize it "
+        + "within this error (in $/h), instead of using a fixed number",
+    )
     add_opt(
         parser,
         "hours_commitment",
@@ -213,12 +241,29 @@ def setup_parser_args(parser):
         "-o",
         help="number hours to overlap commitments in a rolling UC",
     )
+    add_opt(
+        parser,
+        "warmstart",
+        "-w",
+        help="warm start each stage of a rolling UC with the previous stage's solution",
+    )
+    add_opt(
+        parser,
+        "pipeline_stages",
+        help="build the next stage of a rolling UC while the current stage is being solved",
+    )
 
     solver_opt = parser.add_argument_group("Solver options")
     add_opt(solver_opt, "mipgap", help="the MIP gap solution tolerence")
     add_opt(
         solver_opt, "solver_time_limit", help="the MIP solver time limit (in seconds)"
     )
+    add_opt(
+        solver_opt,
+        "persistent_solver",
+        help="use the solver's persistent interface (if it has one), "
+        + "so that resolves only send the changes to the model",
+    )
 
     reserve = parser.add_argument_group(
         "Reserve", "Does the system require reserve? The default is no reserve."
@@ -246,6 +291,36 @@ def setup_parser_args(parser):
         help="flag to allow de-commitment of units in an ED -- useful for getting initial conditions for UCs",
     )
 
+    add_opt(
+        parser,
+        "fleet_formulation",
+        help="build the generator variables and constraints as (generator x time) "
+        + "indexed components (faster model building for large systems)",
+    )
+    add_opt(
+        parser,
+        "cost_cuts",
+        help="model convex cost curves by a single set of linear cuts "
+        + "(instead of a piecewise model for each generator)",
+    )
+    add_opt(
+        parser,
+        "ptdf_formulation",
+        help="model the DC power flow with power transfer distribution factors "
+        + "instead of bus angles (for large networks)",
+    )
+    add_opt(
+        parser,
+        "ptdf_tolerance",
+        help="drop power transfer distribution factors smaller than this",
+    )
+    add_opt(
+        parser,
+        "lazy_line_limits",
+        help="add line limits only where the solution violates them "
+        + "and re-solve (for networks with many lines)",
+    )
+
     add_opt(
         parser,
         "cost_load_shedding",
@@ -262,11 +337,40 @@ def setup_parser_args(parser):
         help="is wind allowed to be shed for economic reasons "
         + "(default is to allow wind shedding only if infeasible)",
     )
+    add_opt(
+        parser,
+        "prebuilt_shedding",
+        help="create the shedding variables up front (limited to zero) "
+        + "and relax their limits for an infeasible stage, instead of "
+        + "rebuilding the problem",
+    )
 
     stochastic = parser.add_argument_group(
         "Stochastic UC", "options to modify the behavior of a stochastic problem"
     )
     add_opt(stochastic, "scenarios", help="limit the number of scenarios to N")
+    add_opt(
+        stochastic,
+        "scenario_reduction",
+        help="reduce the scenarios to a representative set "
+        + "(of up to N scenarios) by fast forward selection",
+    )
+    add_opt(
+        stochastic,
+        "scenario_reduction_tolerance",
+        help="stop the scenario reduction once the reduced set is within this "
+        + "(relative) distance of the full set",
+    )
+    add_opt(
+        stochastic,
+        "scenario_cache",
+        help="cache the parsed scenario files as (memory-mapped) arrays",
+    )
+    add_opt(
+        stochastic,
+        "scenario_processes",
+        help="number of processes for parsing scenario files (0 for one per cpu)",
+    )
     add_opt(
         stochastic,
         "faststart_resolve",
@@ -304,12 +408,37 @@ def setup_parser_args(parser):
         "cvar_confidence_level",
         help="confidence level term for a CVaR objective formulation",
     )
+    add_opt(
+        stochastic,
+        "progressive_hedging",
+        help="solve the scenarios separately (in parallel) and coordinate "
+        + "their commitments by progressive hedging",
+    )
+    add_opt(
+        stochastic,
+        "ph_rho",
+        help="progressive hedging penalty on a scenario's status differing "
+        + "from the average status",
+    )
+    add_opt(stochastic, "ph_max_iterations", help="progressive hedging iteration limit")
+    add_opt(
+        stochastic,
+        "ph_tolerance",
+        help="progressive hedging convergence tolerance (on the average "
+        + "deviation of the scenario statuses from their average)",
+    )
+    add_opt(
+        stochastic,
+        "ph_processes",
+        help="number of processes for progressive hedging (0 for one per cpu)",
+    )
 
     add_opt(
         parser,
         "standalone",
         "-m",
-        help="Make each multi-day commitment its own subprocess (helps with memory issues).",
+        help="Solve a multi-day commitment one stage at a time, storing the results "
+        + "to disk instead of keeping them in memory (helps with memory issues).",
     )
     add_opt(
         parser,
@@ -332,6 +461,12 @@ def setup_parser_args(parser):
         "standalone_restart",
         help="restart a multi-stage standalone problem from where it failed",
     )
+    add_opt(
+        debugging,
+        "phase_times",
+        help="record the wall time and peak memory of each phase of the solve "
+        + "(e.g. creating constraints, the solver run) to phase-times.csv",
+    )
     debugging.add_argument(
         "--profile",
         action="store_true",
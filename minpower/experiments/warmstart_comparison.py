@@ -0,0 +1,41 @@
+"""
+Compare the stage-by-stage solve times of a rolling UC
+with and without warm starting each stage from the previous one.
+
+usage: python warmstart_comparison.py <problem directory> [solver]
+"""
+from minpower.config import user_config
+from minpower.solve import solve_problem
+import pandas as pd
+import sys
+
+
+def compare(directory=".", solver=None):
+    defaults = user_config.copy()
+    times = {}
+    objectives = {}
+    for warmstart in [False, True]:
+        user_config.update(defaults)
+        user_config.warmstart = warmstart
+        if solver:
+            user_config.solver = solver
+        sln = solve_problem(directory, csv=False)
+        name = "warm" if warmstart else "cold"
+        times[name] = sln.stage_solve_times.solve_time
+        objectives[name] = sln.objective
+    user_config.update(defaults)
+
+    comparison = pd.DataFrame(times)
+    comparison["speedup"] = comparison.cold / comparison.warm
+    return comparison, objectives
+
+
+if __name__ == "__main__":
+    comparison, objectives = compare(*sys.argv[1:3])
+    print(comparison.to_string())
+    print(
+        "total solve time: cold={cold:0.2f}s warm={warm:0.2f}s".format(
+            **comparison.sum()
+        )
+    )
+    print("objective: cold={cold} warm={warm}".format(**objectives))
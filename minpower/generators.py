@@ -1,9 +1,11 @@
 import pandas as pd
+import numpy as np
 import logging
+from pyomo.environ import Constraint, Reference
 from .config import user_config
 from .commonscripts import update_attributes, bool_to_int
 
-from .optimization import value, OptimizationObject
+from .optimization import value, values_array, OptimizationObject
 from .schedule import is_init
 from . import bidding
 
@@ -89,6 +91,15 @@ class Generator(OptimizationObject):
         self.build_cost_model()
         self.init_optimization()
 
+    # the :class:`~generators.GeneratorFleet` which holds this
+    # generator's variables (when using the fleet formulation)
+    _fleet = None
+
+    def get_variable(self, name, time=None, indexed=False, scenario=None):
+        if self._fleet is not None and name in self._fleet.variable_names:
+            return self._fleet.get_generator_variable(self, name, time, scenario)
+        return OptimizationObject.get_variable(self, name, time, indexed, scenario)
+
     def power(self, time=None, scenario=None):
         """real power output at time"""
         if time is not None and is_init(time):
@@ -174,6 +185,44 @@ class Generator(OptimizationObject):
     def cost_second_stage(self, times):
         return sum(self.operatingcost(time) for time in times)
 
+    def result_values(self, times, scenario=None):
+        """
+        The power, status and costs over times (a dict of arrays),
+        computed from the values of the whole indexed variables.
+        """
+        index = times.strings.values
+
+        def variable(name):
+            return values_array(
+                self.get_variable(name, indexed=True, scenario=scenario), index
+            )
+
+        power = variable("power")
+        if self.commitment_problem or user_config.dispatch_decommit_allowed:
+            status = variable("status")
+        else:
+            status = np.ones(len(index))
+
+        operatingcost = self.bids.output_values(times, status, power, scenario)
+        cost = operatingcost
+        if self.commitment_problem and self.startupcost != 0:
+            cost = cost + variable("startupcost")
+        if self.commitment_problem and self.shutdowncost != 0:
+            cost = cost + variable("shutdowncost")
+
+        return dict(
+            power=power,
+            status=status,
+            cost=cost,
+            operatingcost=operatingcost,
+        )
+
+    def copy(self):
+        new = OptimizationObject.copy(self)
+        # the bid parameters refer to the original's variables
+        new.build_cost_model()
+        return new
+
     def getstatus(self, tend, times, status):
         return dict(
             status=value(self.status(tend)),
@@ -281,6 +330,21 @@ class Generator(OptimizationObject):
         Also create the :class:`bidding.Bid` objects and their variables.
         """
         self.commitment_problem = len(times) > 1
+        if self.commitment_problem:
+            # power_available exists for easier reserve requirement
+            self.reserve_required = self._parent_problem().reserve_required
+
+        if self._fleet is None:
+            self.create_unit_variables(times)
+
+        self.bids = bidding.Bid(times=times, **self.bid_params)
+        return
+
+    def create_unit_variables(self, times):
+        """
+        Create the power, status and cost variables for this generator
+        (when not using the fleet formulation).
+        """
         self.add_variable("power", index=times.set, low=0, high=self.pmax)
 
         if self.commitment_problem or user_config.dispatch_decommit_allowed:
@@ -292,8 +356,6 @@ class Generator(OptimizationObject):
             )
 
         if self.commitment_problem:
-            # power_available exists for easier reserve requirement
-            self.reserve_required = self._parent_problem().reserve_required
             if self.reserve_required:
                 self.add_variable(
                     "power_available", index=times.set, low=0, high=self.pmax
@@ -307,90 +369,30 @@ class Generator(OptimizationObject):
                     "shutdowncost", index=times.set, low=0, high=self.shutdowncost
                 )
 
-        self.bids = bidding.Bid(times=times, **self.bid_params)
-        return
-
     def create_objective(self, times):
         return sum(self.cost(time) for time in times)
 
     def create_constraints(self, times):
-        """create the optimization constraints for a generator over all times"""
-
-        def roundoff(n):
-            m = int(n)
-            if n != m:  # pragma: no cover
-                raise ValueError(
-                    "min up/down times must be integer number of intervals, not {}".format(
-                        n
-                    )
-                )
-            return m
+        """
+        Create the optimization constraints for a generator over all times.
+        When the problem's initial constraints are deferred, the constraints
+        which depend on the initial condition are left out, to be added
+        by :meth:`create_initial_constraints`.
+        """
 
         if self.commitment_problem:
-            # set initial and final time constraints
-            tInitial = times.initialTimestr
-            tEnd = len(times)
-            if self.minuptime > 0:
-                up_intervals_remaining = roundoff(
-                    (self.minuptime - self.initial_status_hours) / times.intervalhrs
-                )
-                min_up_intervals_remaining_init = int(
-                    min(tEnd, up_intervals_remaining * self.initial_status)
-                )
-            else:
-                min_up_intervals_remaining_init = 0
-            if self.mindowntime > 0:
-                down_intervals_remaining = roundoff(
-                    (self.mindowntime - self.initial_status_hours) / times.intervalhrs
-                )
-                min_down_intervals_remaining_init = int(
-                    min(tEnd, down_intervals_remaining * (self.initial_status == 0))
-                )
-            else:
-                min_down_intervals_remaining_init = 0
-            # initial up down time
-            if min_up_intervals_remaining_init > 0:
-                self.add_constraint(
-                    "minuptime",
-                    tInitial,
-                    0
-                    >= sum(
-                        [
-                            (1 - self.status(times[t]))
-                            for t in range(min_up_intervals_remaining_init)
-                        ]
-                    ),
-                )
-            if min_down_intervals_remaining_init > 0:
-                self.add_constraint(
-                    "mindowntime",
-                    tInitial,
-                    0
-                    == sum(
-                        [
-                            self.status(times[t])
-                            for t in range(min_down_intervals_remaining_init)
-                        ]
-                    ),
-                )
-
-            # initial ramp rate
-            if self.rampratemax is not None:
-                if self.initial_power + self.rampratemax < self.pmax:
-                    E = self.power(times[0]) - self.initial_power <= self.rampratemax
-                    self.add_constraint("ramp lim high", tInitial, E)
+            deferred = self._parent_problem().initial_constraints_deferred
+            self._deferred_rules = dict()
 
-            if self.rampratemin is not None:
-                if self.initial_power + self.rampratemin > self.pmin:
-                    E = self.rampratemin <= self.power(times[0]) - self.initial_power
-                    self.add_constraint("ramp lim low", tInitial, E)
+            if not deferred:
+                self._create_initial_limit_constraints(times)
 
-            # calculate up down intervals
-            min_up_intervals = roundoff(self.minuptime / times.intervalhrs)
-            min_down_intervals = roundoff(self.mindowntime / times.intervalhrs)
+            # the constraint sets below are built for all units at once
+            # by the fleet formulation
+            unit_constraints = self._fleet is None
 
             # reserve
-            if self.reserve_required:
+            if unit_constraints and self.reserve_required:
 
                 def reserve_req(model, t):
                     return self.power(t) <= self.power_available(t)
@@ -398,7 +400,7 @@ class Generator(OptimizationObject):
                 self.add_constraint_set("max gen power avail", times.set, reserve_req)
 
             # ramping power
-            if self.rampratemax is not None:
+            if unit_constraints and self.rampratemax is not None:
 
                 def ramp_max(model, t):
                     tPrev = get_tPrev(t, model, times)
@@ -410,7 +412,9 @@ class Generator(OptimizationObject):
                         # + self.pmax * (1 - self.status(times[t]))
                     return self.power_available(t) - self.power(tPrev) <= ramp_limit
 
-                self.add_constraint_set("ramp limit high", times.set, ramp_max)
+                self._add_transition_constraint_set(
+                    "ramp limit high", times, ramp_max, deferred
+                )
 
             #               # EQ19 from Carrion and Arroyo - has a conflicting
             #               # definition of shutdown power, available after shutdown hour?
@@ -421,7 +425,7 @@ class Generator(OptimizationObject):
             #                        self.shutdownramplimit * -1 * self.status_change(t, times)
             #                        )
 
-            if self.rampratemin is not None:
+            if unit_constraints and self.rampratemin is not None:
 
                 def ramp_min(model, t):
                     tPrev = get_tPrev(t, model, times)
@@ -434,10 +438,12 @@ class Generator(OptimizationObject):
 
                     return ramp_limit <= self.power_available(t) - self.power(tPrev)
 
-                self.add_constraint_set("ramp limit low", times.set, ramp_min)
+                self._add_transition_constraint_set(
+                    "ramp limit low", times, ramp_min, deferred
+                )
 
             # start up and shut down costs
-            if self.startupcost > 0:
+            if unit_constraints and self.startupcost > 0:
 
                 def startupcostmin(model, t):
                     tPrev = get_tPrev(t, model, times)
@@ -445,7 +451,9 @@ class Generator(OptimizationObject):
                         self.status(t) - self.status(tPrev)
                     )
 
-                self.add_constraint_set("startup cost min", times.set, startupcostmin)
+                self._add_transition_constraint_set(
+                    "startup cost min", times, startupcostmin, deferred
+                )
 
                 # these tightening constraints make stochastic problems take a very long time
             #                def startupcostmax(model, t):
@@ -457,7 +465,7 @@ class Generator(OptimizationObject):
             #                    return self.cost_startup(t) <= self.startupcost * (1 - self.status(tPrev))
             #                self.add_constraint_set('startup cost max prev', times.set, startupcostmax_prev)
 
-            if self.shutdowncost > 0:
+            if unit_constraints and self.shutdowncost > 0:
 
                 def shutdowncost(model, t):
                     tPrev = get_tPrev(t, model, times)
@@ -465,7 +473,9 @@ class Generator(OptimizationObject):
                         self.status(t) - self.status(tPrev)
                     )
 
-                self.add_constraint_set("shutdown cost", times.set, shutdowncost)
+                self._add_transition_constraint_set(
+                    "shutdown cost", times, shutdowncost, deferred
+                )
 
             # note: costs must be >= constraints
             # for very large problems with >= constraints,
@@ -474,27 +484,21 @@ class Generator(OptimizationObject):
             # unit shutdowns if the unit has a startup cost
             # solution is to use the min and max constraints together.
 
-            # TODO: convert these to constraint list form
-            for t, time in enumerate(times):
-
-                # min up time
-                if t >= min_up_intervals_remaining_init and self.minuptime > 0:
-                    no_shut_down = list(range(t, min(tEnd, t + min_up_intervals)))
-                    min_up_intervals_remaining = min(tEnd - t, min_up_intervals)
-                    E = sum(
-                        [self.status(times[s]) for s in no_shut_down]
-                    ) >= min_up_intervals_remaining * self.status_change(t, times)
-                    self.add_constraint("min up time", time, E)
-                # min down time
-                if t >= min_down_intervals_remaining_init and self.mindowntime > 0:
-                    no_start_up = list(range(t, min(tEnd, t + min_down_intervals)))
-                    min_down_intervals_remaining = min(tEnd - t, min_down_intervals)
-                    E = sum(
-                        [1 - self.status(times[s]) for s in no_start_up]
-                    ) >= min_down_intervals_remaining * -1 * self.status_change(
-                        t, times
-                    )
-                    self.add_constraint("min down time", time, E)
+            tEnd = len(times)
+            if deferred:
+                # the first min up/down intervals depend on the initial condition
+                up_times = range(_roundoff(self.minuptime / times.intervalhrs), tEnd)
+                down_times = range(
+                    _roundoff(self.mindowntime / times.intervalhrs), tEnd
+                )
+            else:
+                up_init, down_init = self._initial_intervals(times)
+                up_times = range(up_init, tEnd)
+                down_times = range(down_init, tEnd)
+            self._create_min_up_down_constraints(times, up_times, down_times)
+
+        if self._fleet is not None:
+            return
 
         # min/max power limits
         # these always apply (even if not a UC problem)
@@ -512,14 +516,443 @@ class Generator(OptimizationObject):
 
         return
 
+    def create_initial_constraints(self, times):
+        """
+        Add the constraints which depend on the initial condition
+        (the initial min up/down time and ramping constraints and
+        the first time of the ramping, startup cost and min up/down time
+        constraints) to a problem created with them deferred.
+        """
+        if not self.commitment_problem:
+            return
+        self._create_initial_limit_constraints(times)
+
+        problem = self._parent_problem()
+        first = times.set.first()
+        for name, rule in self._deferred_rules.items():
+            expression = rule(problem._model, first)
+            if expression is not Constraint.Skip:
+                problem.get_component(self._id(name)).add(first, expression)
+        self._deferred_rules = dict()
+
+        up_init, down_init = self._initial_intervals(times)
+        self._create_min_up_down_constraints(
+            times,
+            range(up_init, _roundoff(self.minuptime / times.intervalhrs)),
+            range(down_init, _roundoff(self.mindowntime / times.intervalhrs)),
+        )
+
+    def _add_transition_constraint_set(self, name, times, rule, deferred):
+        """
+        Add a constraint set which links each time to the previous time.
+        The constraint at the first time links to the initial condition,
+        so when deferred it is left out (and the rule is kept for
+        :meth:`create_initial_constraints`).
+        """
+        if deferred:
+            self._deferred_rules[name] = rule
+            first = times.set.first()
+
+            def later_times_rule(model, t):
+                return Constraint.Skip if t == first else rule(model, t)
+
+            self.add_constraint_set(name, times.set, later_times_rule)
+        else:
+            self.add_constraint_set(name, times.set, rule)
+
+    def _initial_intervals(self, times):
+        """
+        The number of intervals at the start of the problem that the unit
+        must stay on (and off) to meet its min up (down) time,
+        given its initial condition.
+        """
+        tEnd = len(times)
+        up, down = 0, 0
+        if self.minuptime > 0:
+            up_intervals_remaining = _roundoff(
+                (self.minuptime - self.initial_status_hours) / times.intervalhrs
+            )
+            up = int(min(tEnd, up_intervals_remaining * self.initial_status))
+        if self.mindowntime > 0:
+            down_intervals_remaining = _roundoff(
+                (self.mindowntime - self.initial_status_hours) / times.intervalhrs
+            )
+            down = int(
+                min(tEnd, down_intervals_remaining * (self.initial_status == 0))
+            )
+        return up, down
+
+    def _create_min_up_down_constraints(self, times, up_times, down_times):
+        """
+        Create the min up time constraints for the time positions in
+        `up_times` and the min down time constraints for those in `down_times`.
+        """
+        tEnd = len(times)
+        min_up_intervals = _roundoff(self.minuptime / times.intervalhrs)
+        min_down_intervals = _roundoff(self.mindowntime / times.intervalhrs)
+
+        # TODO: convert these to constraint list form
+        for t, time in enumerate(times):
+
+            # min up time
+            if t in up_times and self.minuptime > 0:
+                no_shut_down = list(range(t, min(tEnd, t + min_up_intervals)))
+                min_up_intervals_remaining = min(tEnd - t, min_up_intervals)
+                E = sum(
+                    [self.status(times[s]) for s in no_shut_down]
+                ) >= min_up_intervals_remaining * self.status_change(t, times)
+                self.add_constraint("min up time", time, E)
+            # min down time
+            if t in down_times and self.mindowntime > 0:
+                no_start_up = list(range(t, min(tEnd, t + min_down_intervals)))
+                min_down_intervals_remaining = min(tEnd - t, min_down_intervals)
+                E = sum(
+                    [1 - self.status(times[s]) for s in no_start_up]
+                ) >= min_down_intervals_remaining * -1 * self.status_change(t, times)
+                self.add_constraint("min down time", time, E)
+
+    def _create_initial_limit_constraints(self, times):
+        """the initial min up/down time and initial ramping constraints"""
+        tInitial = times.initialTimestr
+        min_up_intervals_remaining_init, min_down_intervals_remaining_init = (
+            self._initial_intervals(times)
+        )
+        # initial up down time
+        if min_up_intervals_remaining_init > 0:
+            self.add_constraint(
+                "minuptime",
+                tInitial,
+                0
+                >= sum(
+                    [
+                        (1 - self.status(times[t]))
+                        for t in range(min_up_intervals_remaining_init)
+                    ]
+                ),
+            )
+        if min_down_intervals_remaining_init > 0:
+            self.add_constraint(
+                "mindowntime",
+                tInitial,
+                0
+                == sum(
+                    [
+                        self.status(times[t])
+                        for t in range(min_down_intervals_remaining_init)
+                    ]
+                ),
+            )
+
+        # initial ramp rate
+        if self.rampratemax is not None:
+            if self.initial_power + self.rampratemax < self.pmax:
+                E = self.power(times[0]) - self.initial_power <= self.rampratemax
+                self.add_constraint("ramp lim high", tInitial, E)
+
+        if self.rampratemin is not None:
+            if self.initial_power + self.rampratemin > self.pmin:
+                E = self.rampratemin <= self.power(times[0]) - self.initial_power
+                self.add_constraint("ramp lim low", tInitial, E)
+
     def __str__(self):
         return "g{ind}".format(ind=self.index)
 
 
+def _roundoff(n):
+    m = int(n)
+    if n != m:  # pragma: no cover
+        raise ValueError(
+            "min up/down times must be integer number of intervals, not {}".format(n)
+        )
+    return m
+
+
 def get_tPrev(t, model, times):
     return model.times.prev(t) if t != model.times.first() else times.initialTime
 
 
+class GeneratorFleet(OptimizationObject):
+
+    """
+    The fleet formulation of a set of controllable generators.
+    Instead of each :class:`~generators.Generator` adding its own
+    components, the power, status and cost variables and the
+    power limit, ramping, reserve and startup/shutdown cost constraints
+    are each a single component indexed by (generator, time).
+    The constraints are built from arrays of the generator parameters,
+    which are pulled once from the generator list.
+
+    The generators still read back their own variables
+    (e.g. :meth:`~generators.Generator.power`), so results are unchanged.
+    The initial min up/down time and min up/down time constraints
+    remain per generator.
+
+    :param generators: list of :class:`~generators.Generator` objects
+    """
+
+    variable_names = [
+        "power",
+        "status",
+        "power_available",
+        "startupcost",
+        "shutdowncost",
+    ]
+
+    def __init__(self, generators):
+        self.generators = generators
+        self.names = [str(gen) for gen in generators]
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+
+        self.pmin = self._array("pmin")
+        self.pmax = self._array("pmax")
+        self.rampratemax = self._array("rampratemax")
+        self.rampratemin = self._array("rampratemin")
+        self.startupramplimit = self._array("startupramplimit")
+        self.shutdownramplimit = self._array("shutdownramplimit")
+        self.startupcost = self._array("startupcost")
+        self.shutdowncost = self._array("shutdowncost")
+        self.mustrun = self._array("mustrun").astype(bool)
+
+        self.index = "fleet"
+        self._references = dict()
+        self.init_optimization()
+
+    def _array(self, attr):
+        """an array of a generator parameter (None values become NaN)"""
+        return np.array([getattr(gen, attr) for gen in self.generators], dtype=float)
+
+    def get_generator_variable(self, gen, name, time=None, scenario=None):
+        """
+        The variable for a single generator. For a single time this is
+        an element of the fleet variable. Over all times it is a
+        :class:`pyomo.Reference` to the generator's slice of the fleet
+        variable, indexed by time (like a generator's own variable).
+        """
+        var = self.get_variable(name, indexed=True, scenario=scenario)
+        if time is not None:
+            return var[str(gen), str(time)]
+
+        key = (str(gen), name, scenario)
+        if key not in self._references:
+            self._references[key] = Reference(var[str(gen), :])
+        return self._references[key]
+
+    def create_variables(self, times):
+        problem = self._parent_problem()
+        self.commitment_problem = len(times) > 1
+        self.has_status = (
+            self.commitment_problem or user_config.dispatch_decommit_allowed
+        )
+        self.reserve_required = self.commitment_problem and problem.reserve_required
+
+        problem.add_set(self._id("generators"), self.names, ordered=True)
+        index = problem.get_component(self._id("generators")) * times.set
+
+        pmax = dict(zip(self.names, self.pmax))
+        mustrun = dict(zip(self.names, self.mustrun))
+
+        def power_limits(model, g, t):
+            return (0, pmax[g])
+
+        def status_limits(model, g, t):
+            return (1, 1) if mustrun[g] else (0, 1)
+
+        self.add_variable("power", index=index, bounds=power_limits)
+        if self.has_status:
+            self.add_variable("status", index=index, kind="Binary", bounds=status_limits)
+
+        if self.commitment_problem:
+            if self.reserve_required:
+                self.add_variable("power_available", index=index, bounds=power_limits)
+            for name, costs in [
+                ("startupcost", self.startupcost),
+                ("shutdowncost", self.shutdowncost),
+            ]:
+                costs = dict(zip(self.names, costs))
+                units = [g for g in self.names if costs[g] > 0]
+                if len(units) == 0:
+                    continue
+                problem.add_set(self._id(name + " generators"), units, ordered=True)
+                self.add_variable(
+                    name,
+                    index=problem.get_component(self._id(name + " generators"))
+                    * times.set,
+                    bounds=lambda model, g, t: (0, costs[g]),
+                )
+
+    def create_constraints(self, times):
+        """create the fleet constraints over all generators and times"""
+        problem = self._parent_problem()
+        index = problem.get_component(self._id("generators")) * times.set
+        first = times.set.first()
+        pos = self.positions
+
+        power = self.get_variable("power", indexed=True)
+        power_available = self.get_variable(
+            "power_available" if self.reserve_required else "power", indexed=True
+        )
+
+        if self.has_status:
+            status = self.get_variable("status", indexed=True)
+
+            def get_status(g, t):
+                return status[g, t]
+
+        else:
+
+            def get_status(g, t):
+                return 1
+
+        def previous(var, initial, g, t):
+            if t == first:
+                return getattr(self, initial)[pos[g]]
+            else:
+                return var[g, times.set.prev(t)]
+
+        if self.commitment_problem:
+            deferred = problem.initial_constraints_deferred
+            self._deferred_rules = dict()
+            if not deferred:
+                self._set_initial_conditions()
+
+            if self.reserve_required:
+
+                def reserve_req(model, g, t):
+                    return power[g, t] <= power_available[g, t]
+
+                self.add_constraint_set("max gen power avail", index, reserve_req)
+
+            def ramp_max(model, g, t):
+                i = pos[g]
+                if np.isnan(self.rampratemax[i]):
+                    return Constraint.Skip
+                status_prev = previous(status, "initial_status", g, t)
+                ramp_limit = self.rampratemax[i] * status_prev
+                if not np.isnan(self.startupramplimit[i]):
+                    ramp_limit += self.startupramplimit[i] * (
+                        status[g, t] - status_prev
+                    )
+                return (
+                    power_available[g, t] - previous(power, "initial_power", g, t)
+                    <= ramp_limit
+                )
+
+            def ramp_min(model, g, t):
+                i = pos[g]
+                if np.isnan(self.rampratemin[i]):
+                    return Constraint.Skip
+                status_prev = previous(status, "initial_status", g, t)
+                ramp_limit = self.rampratemin[i] * status[g, t]
+                if not np.isnan(self.shutdownramplimit[i]):
+                    ramp_limit += self.shutdownramplimit[i] * (
+                        -1 * (status[g, t] - status_prev)
+                    )
+                return (
+                    ramp_limit
+                    <= power_available[g, t] - previous(power, "initial_power", g, t)
+                )
+
+            if not np.isnan(self.rampratemax).all():
+                self._add_transition_constraint_set(
+                    "ramp limit high", index, ramp_max, first, deferred
+                )
+            if not np.isnan(self.rampratemin).all():
+                self._add_transition_constraint_set(
+                    "ramp limit low", index, ramp_min, first, deferred
+                )
+
+            if (self.startupcost > 0).any():
+                startupcost = self.get_variable("startupcost", indexed=True)
+
+                def startupcostmin(model, g, t):
+                    return startupcost[g, t] >= self.startupcost[pos[g]] * (
+                        status[g, t] - previous(status, "initial_status", g, t)
+                    )
+
+                self._add_transition_constraint_set(
+                    "startup cost min",
+                    problem.get_component(self._id("startupcost generators"))
+                    * times.set,
+                    startupcostmin,
+                    first,
+                    deferred,
+                )
+
+            if (self.shutdowncost > 0).any():
+                shutdowncost = self.get_variable("shutdowncost", indexed=True)
+
+                def shutdowncostmin(model, g, t):
+                    return shutdowncost[g, t] >= self.shutdowncost[pos[g]] * -1 * (
+                        status[g, t] - previous(status, "initial_status", g, t)
+                    )
+
+                self._add_transition_constraint_set(
+                    "shutdown cost",
+                    problem.get_component(self._id("shutdowncost generators"))
+                    * times.set,
+                    shutdowncostmin,
+                    first,
+                    deferred,
+                )
+
+        # min/max power limits
+        def min_power(model, g, t):
+            pmin = self.pmin[pos[g]]
+            if pmin <= 0:
+                return Constraint.Skip
+            return power[g, t] >= get_status(g, t) * pmin
+
+        def max_power(model, g, t):
+            return power_available[g, t] <= get_status(g, t) * self.pmax[pos[g]]
+
+        if (self.pmin > 0).any():
+            self.add_constraint_set("min gen power", index, min_power)
+        self.add_constraint_set("max gen power", index, max_power)
+
+    def create_initial_constraints(self, times):
+        """
+        Add the first time of the ramping and startup/shutdown cost
+        constraints (which depend on the generators' initial conditions)
+        to a problem created with them deferred.
+        """
+        if not self.commitment_problem:
+            return
+        self._set_initial_conditions()
+        problem = self._parent_problem()
+        first = times.set.first()
+        for name, (index, rule) in self._deferred_rules.items():
+            constraint = problem.get_component(self._id(name))
+            generators = list(index.subsets())[0]
+            for g in generators:
+                expression = rule(problem._model, g, first)
+                if expression is not Constraint.Skip:
+                    constraint.add((g, first), expression)
+        self._deferred_rules = dict()
+
+    def _set_initial_conditions(self):
+        self.initial_power = self._array("initial_power")
+        self.initial_status = self._array("initial_status")
+
+    def _add_transition_constraint_set(self, name, index, rule, first, deferred):
+        """
+        Add a constraint set which links each time to the previous time.
+        When deferred, the constraints at the first time (which link to
+        the initial conditions) are left out.
+        """
+        if deferred:
+            self._deferred_rules[name] = (index, rule)
+
+            def later_times_rule(model, g, t):
+                return Constraint.Skip if t == first else rule(model, g, t)
+
+            self.add_constraint_set(name, index, later_times_rule)
+        else:
+            self.add_constraint_set(name, index, rule)
+
+    def __str__(self):
+        return "fleet"
+
+
 class Generator_nonControllable(Generator):
 
     """
@@ -556,11 +989,17 @@ class Generator_nonControllable(Generator):
         self.is_stochastic = False
         self.shedding_mode = sheddingallowed and user_config.economic_wind_shed
 
+    prebuilt_shedding = False
+
     def power(self, time, scenario=None):
         if self.shedding_mode:
             power = self.get_variable(
                 "power_used", time, scenario=scenario, indexed=True
             )
+        elif self.prebuilt_shedding:
+            power = self.power_available(time, scenario=scenario) - self.shed(
+                time, scenario=scenario
+            )
         else:
             power = self.power_available(time)
         return power
@@ -572,6 +1011,9 @@ class Generator_nonControllable(Generator):
         return self.get_parameter("power", time, indexed=True)
 
     def shed(self, time, scenario=None, evaluate=False):
+        if self.prebuilt_shedding:
+            shed = self.get_variable("shed", time, scenario=scenario, indexed=True)
+            return value(shed) if evaluate else shed
         Pused = self.power(time, scenario=scenario)
         Pavail = self.power_available(time, scenario=scenario)
         if evaluate:
@@ -592,6 +1034,7 @@ class Generator_nonControllable(Generator):
     def create_variables(self, times):
         if self.shedding_mode:
             self.create_variables_shedding(times)
+        self.create_variables_prebuilt_shedding(times)
         self.add_parameter(
             "power",
             index=times.set,
@@ -612,6 +1055,23 @@ class Generator_nonControllable(Generator):
     def create_variables_shedding(self, times):
         self.add_variable("power_used", index=times.set, low=0)
 
+    def create_variables_prebuilt_shedding(self, times):
+        self.prebuilt_shedding = (
+            self.sheddingallowed
+            and user_config.prebuilt_shedding
+            and not self.shedding_mode
+        )
+        if self.prebuilt_shedding:
+            # no shedding until the bounds are relaxed
+            self.add_variable("shed", index=times.set, low=0, high=0)
+
+    def set_shedding_limits(self, times, allowed=True, scenario=None):
+        """relax (or re-tighten) the limits on the prebuilt shedding variable"""
+        for time in times:
+            self.get_variable("shed", time, scenario=scenario, indexed=True).setub(
+                self.power_available(time, scenario=scenario) if allowed else 0
+            )
+
     def create_constraints(self, times):
         if self.shedding_mode:
             for time in times:
@@ -647,6 +1107,41 @@ class Generator_nonControllable(Generator):
     def cost_second_stage(self, times):
         return sum(self.cost(time) for time in times)
 
+    def result_values(self, times, scenario=None):
+        """
+        The power, shedding and costs over times (a dict of arrays),
+        computed from the values of the whole indexed variables.
+        """
+        index = times.strings.values
+        available = values_array(self.power_available(scenario=scenario), index)
+        if self.shedding_mode:
+            power = values_array(
+                self.get_variable("power_used", indexed=True, scenario=scenario),
+                index,
+            )
+            shed = available - power
+        elif self.prebuilt_shedding:
+            shed = values_array(
+                self.get_variable("shed", indexed=True, scenario=scenario), index
+            )
+            power = available - shed
+        else:
+            power = available
+            shed = np.zeros(len(index))
+
+        status = np.ones(len(index))
+        cost = (
+            self.bids.output_values(times, status, power, scenario)
+            + user_config.cost_wind_shedding * shed
+        )
+        return dict(
+            power=power,
+            status=status,
+            shed=shed,
+            cost=cost,
+            operatingcost=cost,
+        )
+
     def get_scheduled_ouput(self, time):
         return float(self.schedule.loc[time])
 
@@ -696,6 +1191,10 @@ class Generator_Stochastic(Generator_nonControllable):
         self.shedding_mode = sheddingallowed and user_config.economic_wind_shed
 
     def power(self, time, scenario=None):
+        if self.prebuilt_shedding and not self.shedding_mode:
+            return self.power_available(time, scenario=scenario) - self.shed(
+                time, scenario=scenario
+            )
         return self.get_variable(
             "power_used" if self.shedding_mode else "power",
             time=time,
@@ -707,23 +1206,22 @@ class Generator_Stochastic(Generator_nonControllable):
         return self.get_variable("power", time=time, scenario=scenario, indexed=True)
 
     def _get_scenario_values(self, times, s=0):
-        # scenario values are structured as a pd.Panel
-        # with axes: day, scenario, {prob, [hours]}
-        # the panel has items which are dates
-        return (
-            self.scenario_values[times.Start.date()][list(range(len(times)))]
-            .loc[s]
-            .dropna()
-            .values.tolist()
-        )
+        # scenario values are a stochastic.ScenarioStore
+        # with axes: day, scenario, hour
+        values = self._get_scenario_array(times)[s]
+        return values[~np.isnan(values)].tolist()
+
+    def _get_scenario_array(self, times):
+        """the values of all of the scenarios (an array of scenarios x times)"""
+        return self.scenario_values.values_for(times.Start.date(), len(times))
 
     def _get_scenario_probabilities(self, times):
-        # if any of the scenario values are defined, we want them
-        return self.scenario_values[times.Start.date()].dropna(how="all").probability
+        return self.scenario_values.probabilities_for(times.Start.date())
 
     def create_variables(self, times):
         if self.shedding_mode:
             self.create_variables_shedding(times)
+        self.create_variables_prebuilt_shedding(times)
 
         if self.is_stochastic:
             # initialize parameter set to first scenario value
@@ -5,13 +5,13 @@ Get data from spreadsheet files and parse it into
 Also extract the time information and create all
     :class:`~schedule.Timelist` objects.
 """
+import numpy as np
 import pandas as pd
-import xarray as xr
 from pandas import DataFrame, Timestamp, read_csv
 from glob import glob
 from collections import OrderedDict
 
-from . import powersystems
+from . import __version__, powersystems, stochastic
 from .schedule import just_one_time, get_schedule, TimeIndex, make_constant_schedule
 from .commonscripts import joindir, drop_case_spaces, set_trace
 
@@ -20,7 +20,11 @@ from .generators import Generator, Generator_Stochastic, Generator_nonControllab
 from .config import user_config
 
 import os
+import json
+import hashlib
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 fields = dict(
     Line=["name", "tobus", "frombus", "reactance", "pmax"],
@@ -75,8 +79,8 @@ def nice_names(df):
 def parse_standalone(storage, times):
     """load problem info from a pandas.HDFStore"""
 
-    # filter timeseries data to only this stage
-    timeseries = storage["data_timeseries"].loc[times.strings.values]
+    # read only this stage's rows of the timeseries
+    timeseries = _stage_timeseries(storage, times)
 
     # add loads
     loads = build_class_list(
@@ -95,15 +99,33 @@ def parse_standalone(storage, times):
 
     gen = power_system.get_generator_with_scenarios()
     if gen:
-        # TODO - maybe only extract current day's values here
-        scenario_values = storage["data_scenario_values"]
+        scenario_values = _stage_scenarios(storage, times)
         gen.scenario_values = scenario_values
     else:
-        scenario_values = xr.DataArray()
+        scenario_values = stochastic.ScenarioStore()
 
     return power_system, times, scenario_values
 
 
+def _stage_timeseries(storage, times):
+    """
+    read the rows of the stored timeseries for the times
+    (the timeseries rows are the whole problem's times, in order)
+    """
+    start = int(times.strings.values[0].strip("t"))
+    return storage.select(
+        "data_timeseries", start=start, stop=start + len(times)
+    ).loc[times.strings.values]
+
+
+def _stage_scenarios(storage, times):
+    """read the stored scenarios for the day of the times"""
+    stage_day = Timestamp(times.Start.date())
+    return stochastic.ScenarioStore.from_frame(
+        storage.select("data_scenario_values", where="day == stage_day")
+    )
+
+
 def _load_raw_data():
     """import data from spreadsheets"""
     datadir = user_config.directory
@@ -136,11 +158,14 @@ def _load_raw_data():
     return generators_data, loads_data, lines_data, init_data
 
 
-def _parse_raw_data(generators_data, loads_data, lines_data, init_data):
+def _parse_raw_data(
+    generators_data, loads_data, lines_data, init_data, schedules=None
+):
     # create times
-    timeseries, times, generators_data, loads_data = setup_times(
-        generators_data, loads_data
-    )
+    # (unless the schedules are from a compiled case)
+    if schedules is None:
+        schedules = setup_times(generators_data, loads_data)
+    timeseries, times, generators_data, loads_data = schedules
 
     # add loads
     loads = build_class_list(loads_data, powersystems.Load, times, timeseries)
@@ -201,8 +226,14 @@ def parsedir(**filename_kwargs):
     """
     Import data from spreadsheets and build lists of
     :mod:`powersystems` classes.
+    If the case has been compiled (see :func:`compile_case`)
+    and its sources are unchanged, the compiled case is loaded instead.
     """
 
+    bundle = _load_bundle()
+    if bundle is not None:
+        return _parse_raw_data(*bundle["raw"], schedules=bundle["schedules"])
+
     generators_data, loads_data, lines_data, init_data = _load_raw_data(
         **filename_kwargs
     )
@@ -210,6 +241,179 @@ def parsedir(**filename_kwargs):
     return _parse_raw_data(generators_data, loads_data, lines_data, init_data)
 
 
+# the compiled case is a JSON file (the key, the sources and the tables
+# read from the spreadsheets) and a NumPy file (the timeseries) -
+# neither can run code when it is loaded
+bundle_filename = "compiled-case.json"
+bundle_arrays_filename = "compiled-case.npz"
+
+# the options which change the schedules read by setup_times
+bundle_options = [
+    "file_gens",
+    "file_loads",
+    "file_lines",
+    "file_init",
+    "load_multiplier",
+    "load_adder",
+    "wind_multiplier",
+    "wind_forecast_adder",
+    "wind_error_multiplier",
+    "wind_capacity_factor",
+]
+
+
+def compile_case():
+    """
+    Read the case's spreadsheets and schedule files and write them to
+    two files in the case directory: the tables (with their types) and
+    the unified timeseries, after the schedule options have been applied.
+    The case is built once to validate it.
+
+    :func:`parsedir` loads the compiled case for as long as the content of
+    its sources, the schedule options and the minpower and pandas versions
+    are unchanged. (Scenario files are not compiled - they have their own
+    cache, see `scenario_cache`.)
+    """
+    raw = _load_raw_data()
+    sources = _case_sources(*raw[:2])
+    key = _bundle_key(sources)
+    schedules = setup_times(raw[0].copy(), raw[1].copy())
+
+    # validate by building the case
+    _parse_raw_data(
+        *[df.copy() for df in raw],
+        schedules=tuple(x.copy() if hasattr(x, "copy") else x for x in schedules)
+    )
+
+    timeseries, times, generators_data, loads_data = schedules
+    bundle = dict(
+        key=key,
+        sources=sources,
+        raw=[_frame_to_dict(df) for df in raw],
+        schedules=[_frame_to_dict(generators_data), _frame_to_dict(loads_data)],
+        columns=timeseries.columns.tolist(),
+        dtypes=[str(dtype) for dtype in timeseries.dtypes],
+        tz=str(times.times.tz) if len(timeseries) and times.times.tz else None,
+        freq=times.times.freqstr if len(timeseries) else None,
+        # setup_times scales the wind to get the wind_capacity_factor
+        wind_multiplier=user_config.wind_multiplier,
+    )
+    np.savez(
+        joindir(user_config.directory, bundle_arrays_filename),
+        timeseries=timeseries.values.astype(float),
+        times=times.times.asi8 if len(timeseries) else np.zeros(0, dtype=np.int64),
+    )
+    filename = joindir(user_config.directory, bundle_filename)
+    with open(filename, "w") as f:
+        json.dump(bundle, f)
+    return filename
+
+
+def _frame_to_dict(df):
+    """a table (with the types of its columns) as plain lists"""
+    return dict(
+        columns=df.columns.tolist(),
+        index=df.index.tolist(),
+        dtypes=[str(dtype) for dtype in df.dtypes],
+        data=df.astype(object).where(df.notnull(), None).values.tolist(),
+    )
+
+
+def _frame_from_dict(table):
+    df = DataFrame(table["data"], index=table["index"], columns=table["columns"])
+    for col, dtype in zip(df.columns, table["dtypes"]):
+        if dtype == "object":
+            # missing values are NaN, as read_csv has them
+            df[col] = df[col].where(df[col].notnull(), np.nan)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _case_sources(generators_data, loads_data):
+    """the case's spreadsheets and the schedule files they reference"""
+    filenames = [
+        user_config.file_gens,
+        user_config.file_loads,
+        user_config.file_lines,
+        user_config.file_init,
+    ]
+    for data in [generators_data, loads_data]:
+        for col in ["schedulefilename", "observedfilename", "forecastfilename"]:
+            if col in data.columns:
+                filenames.extend(data[col].dropna().unique())
+    return list(OrderedDict.fromkeys(filenames))
+
+
+def _bundle_key(sources):
+    """
+    a hash of the content of the sources, of the schedule options
+    and of the versions which wrote the bundle
+    """
+    sha = hashlib.sha1()
+    sha.update(repr([__version__, pd.__version__]).encode())
+    sha.update(repr([user_config[opt] for opt in bundle_options]).encode())
+    for filename in sources:
+        sha.update(filename.encode())
+        try:
+            with open(joindir(user_config.directory, filename), "rb") as f:
+                sha.update(f.read())
+        except IOError:
+            # the optional files (lines and initial conditions)
+            sha.update(b"missing")
+    return sha.hexdigest()
+
+
+def _load_bundle():
+    """
+    the compiled case (from :func:`compile_case`),
+    or None if there is none or it is out of date
+    """
+    filename = joindir(user_config.directory, bundle_filename)
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename) as f:
+            bundle = json.load(f)
+        up_to_date = _bundle_key(bundle["sources"]) == bundle["key"]
+    except (ValueError, KeyError, TypeError):
+        up_to_date = False
+    if not up_to_date:
+        logging.warning(
+            "the compiled case is out of date (recompile it or remove {})".format(
+                filename
+            )
+        )
+        return None
+
+    # only read the tables once the key matches
+    logging.debug("loading the compiled case {}".format(filename))
+    arrays = np.load(
+        joindir(user_config.directory, bundle_arrays_filename), allow_pickle=False
+    )
+    user_config.wind_multiplier = bundle["wind_multiplier"]
+    generators_data, loads_data = [_frame_from_dict(t) for t in bundle["schedules"]]
+    if len(arrays["times"]) == 0:
+        # an ED or OPF problem - the single time is today
+        timeseries, times = DataFrame(), just_one_time()
+    else:
+        index = pd.to_datetime(arrays["times"], utc=True)
+        if bundle["tz"]:
+            index = index.tz_convert(bundle["tz"])
+        else:
+            index = index.tz_localize(None)
+        times = TimeIndex(pd.DatetimeIndex(index, freq=bundle["freq"]))
+        timeseries = DataFrame(
+            arrays["timeseries"],
+            index=times.strings.values,
+            columns=bundle["columns"],
+        ).astype(dict(zip(bundle["columns"], bundle["dtypes"])))
+    return dict(
+        raw=[_frame_from_dict(t) for t in bundle["raw"]],
+        schedules=(timeseries, times, generators_data, loads_data),
+    )
+
+
 def setup_initialcond(data, generators, times):
     """
     Take a list of initial conditions parameters and
@@ -242,9 +446,14 @@ def setup_initialcond(data, generators, times):
 
     # add initial conditions for generators
     # which are specified in the initial file
-    for i, row in data.iterrows():
-        g = names.index(row["name"])
-        kwds = row[fields_initial].dropna().to_dict()
+    # (the first generator with each name)
+    by_name = dict((name, g) for g, name in reversed(list(enumerate(names))))
+    rows = _row_values(data.reindex(columns=fields_initial))
+    for name, kwds in zip(data["name"], rows):
+        try:
+            g = by_name[name]
+        except KeyError:
+            raise ValueError("{} is not in list".format(repr(name)))
         generators[g].set_initial_condition(**kwds)
     return
 
@@ -252,39 +461,59 @@ def setup_initialcond(data, generators, times):
 def build_class_list(data, model, times=None, timeseries=None):
     """
     Create list of class instances from the row of a DataFrame.
+    The fields are validated and the values and schedule names of
+    all of the rows are taken from the frame at once.
     """
     datadir = user_config.directory
     is_generator = model == Generator
 
-    all_models = []
-
     if "schedulename" in data.columns:
         data["schedule"] = None
 
-    for i, row in data.iterrows():
-        row_model = model
-        row = row.dropna()
-
-        power = row.get("power")
-        schedulename = row.get("schedulename")
-
-        if is_generator:
-            # get all those extra things which need to be parsed
-            observed_name = row.get("observedname")
-            forecast_name = row.get("forecastname")
+    # check for fields not in model (with values in any row)
+    valid_fields = pd.Index(fields[model.__name__] + ["schedulename"])
+    if is_generator:
+        valid_fields = valid_fields.union(pd.Index(gen_extra_fields))
+    invalid_fields = [
+        col
+        for col in data.columns.difference(valid_fields)
+        if data[col].notnull().any()
+    ]
+    if len(invalid_fields) > 0:
+        raise ValueError("invalid fields in model:: {}".format(invalid_fields))
 
-            scenariosfilename = row.get("scenariosfilename")
-            scenariosdirectory = row.get("scenariosdirectory")
+    if is_generator and user_config.scenarios_directory and (
+        "scenariosdirectory" in data.columns
+    ):
+        # override the scenarios directory with the one \
+        # specified in the commandline options
+        has_directory = data.scenariosdirectory.map(bool) & (
+            data.scenariosdirectory.notnull()
+        )
+        data.loc[has_directory, "scenariosdirectory"] = user_config.scenarios_directory
 
-            if scenariosdirectory and user_config.scenarios_directory:
-                # override the scenarios directory with the one \
-                # specified in the commandline options
-                scenariosdirectory = user_config.scenarios_directory
-                data.loc[i, "scenariosdirectory"] = user_config.scenarios_directory
+    model_fields = [col for col in data.columns if col in fields[model.__name__]]
+    references = ["power", "schedulename"]
+    if is_generator:
+        references += gen_extra_fields
+    all_kwds = _row_values(data[model_fields])
+    all_refs = _row_values(data.reindex(columns=references))
 
-            bid_points_filename = row.get("costcurvepointsfilename")
+    bid_points = {}
+    all_models = []
+    for i, kwds, refs in zip(data.index, all_kwds, all_refs):
+        row_model = model
+        power = refs.get("power")
+        schedulename = refs.get("schedulename")
 
         if is_generator:
+            # get all those extra things which need to be parsed
+            observed_name = refs.get("observedname")
+            forecast_name = refs.get("forecastname")
+            scenariosfilename = refs.get("scenariosfilename")
+            scenariosdirectory = refs.get("scenariosdirectory")
+            bid_points_filename = refs.get("costcurvepointsfilename")
+
             if (
                 schedulename
                 or power
@@ -295,23 +524,10 @@ def build_class_list(data, model, times=None, timeseries=None):
             elif scenariosdirectory or scenariosfilename:
                 row_model = Generator_Stochastic
 
-        # warn about fields not in model
-        valid_fields = pd.Index(fields[model.__name__] + ["schedulename"])
-        if is_generator:
-            valid_fields = valid_fields.union(pd.Index(gen_extra_fields))
-        invalid_fields = row.index.difference(valid_fields)
-        if len(invalid_fields) > 0:
-            raise ValueError(
-                "invalid fields in model:: {}".format(invalid_fields.tolist())
-            )
-            # logging.warning
-
-        kwds = row[row.index.isin(fields[model.__name__])].to_dict()
-
         # add in any schedules
         if schedulename:
             kwds["schedule"] = timeseries[schedulename]
-        elif pd.notnull(power):
+        elif power is not None:
             # a constant power schedule
             kwds["schedule"] = make_constant_schedule(times, power)
             kwds.pop("power")
@@ -336,10 +552,13 @@ def build_class_list(data, model, times=None, timeseries=None):
                     )
 
             # add a custom bid points file with {power, cost} columns
+            # (each file is read once)
             if bid_points_filename:
-                kwds["bid_points"] = read_bid_points(
-                    joindir(datadir, bid_points_filename)
-                )
+                if bid_points_filename not in bid_points:
+                    bid_points[bid_points_filename] = read_bid_points(
+                        joindir(datadir, bid_points_filename)
+                    )
+                kwds["bid_points"] = bid_points[bid_points_filename].copy()
                 kwds["costcurveequation"] = None
 
         try:
@@ -353,6 +572,14 @@ def build_class_list(data, model, times=None, timeseries=None):
     return all_models
 
 
+def _row_values(data):
+    """the values of each row of a frame as a dict (without the missing values)"""
+    values = data.astype(object).where(data.notnull(), None).to_dict("records")
+    return [
+        dict((k, v) for k, v in row.items() if v is not None) for row in values
+    ]
+
+
 def read_bid_points(filename):
     bid_points = read_csv(filename)
     # return a dataframe of bidpoints
@@ -365,6 +592,9 @@ def setup_times(generators_data, loads_data):
     from the schedule files.
 
     Also create a unified DataFrame of all the schedules, `timeseries`.
+    Each file is read once, even if it is the schedule of many units.
+    A file can be the schedule of one unit or have a column
+    for each unit (named for the unit).
 
     If there are no schedule files (as in ED,OPF),
     create an index with just a single time.
@@ -380,39 +610,48 @@ def setup_times(generators_data, loads_data):
     if fcol not in generators_data.columns:
         generators_data[fcol] = None
 
-    datadir = user_config.directory
+    # the observed and forecast power columns
+    fobscol = "observedfilename"
+    obscol = "observedname"
+    ffcstcol = "forecastfilename"
+    fcstcol = "forecastname"
 
-    timeseries = {}
+    timeseries = OrderedDict()
 
     def filter_notnull(df, col):
         return df[df[col].notnull()]
 
-    for i, load in filter_notnull(loads_data, fcol).iterrows():
-        name = "d{}".format(i)
-        loads_data.loc[i, ncol] = name
+    # read each of the files once, in parallel
+    filenames = set(loads_data[fcol].dropna())
+    for col in [fcol, fobscol, ffcstcol]:
+        if col in generators_data:
+            filenames.update(generators_data[col].dropna())
+    files = _read_schedule_files(filenames)
+
+    def scheduled(df, col, name_format, name_col):
+        """name the schedules of the units with a file in the column"""
+        units = filter_notnull(df, col)
+        names = [name_format.format(i) for i in units.index]
+        df.loc[units.index, name_col] = names
+        unit_names = units["name"] if "name" in units else [None] * len(units)
+        for name, filename, unit_name in zip(names, units[col], unit_names):
+            yield name, _unit_schedule(files[filename], filename, unit_name)
+
+    for name, schedule in scheduled(loads_data, fcol, "d{}", ncol):
         timeseries[name] = (
-            get_schedule(joindir(datadir, load[fcol])) * user_config.load_multiplier
-            + user_config.load_adder
+            schedule * user_config.load_multiplier + user_config.load_adder
         )
 
-    for i, gen in filter_notnull(generators_data, fcol).iterrows():
-        name = "g{}".format(i)
-        generators_data.loc[i, ncol] = name
-        timeseries[name] = get_schedule(joindir(datadir, gen[fcol]))
-
-    # handle observed and forecast power
-    fobscol = "observedfilename"
-    obscol = "observedname"
-    ffcstcol = "forecastfilename"
-    fcstcol = "forecastname"
+    for name, schedule in scheduled(generators_data, fcol, "g{}", ncol):
+        timeseries[name] = schedule
 
     obs_name = None
     if fobscol in generators_data:
         generators_data[obscol] = None
-        for i, gen in filter_notnull(generators_data, fobscol).iterrows():
-            obs_name = "g{}_observations".format(i)
-            generators_data.loc[i, obscol] = obs_name
-            timeseries[obs_name] = get_schedule(joindir(datadir, gen[fobscol]))
+        for obs_name, schedule in scheduled(
+            generators_data, fobscol, "g{}_observations", obscol
+        ):
+            timeseries[obs_name] = schedule
             if user_config.wind_multiplier != 1.0:
                 timeseries[obs_name] *= user_config.wind_multiplier
 
@@ -421,18 +660,17 @@ def setup_times(generators_data, loads_data):
     fcst_name = None
     if ffcstcol in generators_data:
         generators_data[fcstcol] = None
-        for i, gen in filter_notnull(generators_data, ffcstcol).iterrows():
-            fcst_name = "g{}_forecast".format(i)
-            generators_data.loc[i, fcstcol] = fcst_name
+        for fcst_name, schedule in scheduled(
+            generators_data, ffcstcol, "g{}_forecast", fcstcol
+        ):
             timeseries[fcst_name] = (
-                get_schedule(joindir(datadir, gen[ffcstcol]))
-                * user_config.wind_multiplier
+                schedule * user_config.wind_multiplier
                 + user_config.wind_forecast_adder
             )
 
             if user_config.wind_error_multiplier != 1.0:
                 logging.debug("scaling wind forecast error")
-                obs_name = "g{}_observations".format(i)
+                obs_name = fcst_name.replace("_forecast", "_observations")
                 error = timeseries[fcst_name] - timeseries[obs_name]
                 timeseries[fcst_name] = (
                     timeseries[obs_name] + error * user_config.wind_error_multiplier
@@ -452,7 +690,7 @@ def setup_times(generators_data, loads_data):
         # this is a ED or OPF problem - only one time
         return DataFrame(), just_one_time(), generators_data, loads_data
 
-    timeseries = DataFrame(timeseries)
+    timeseries = _timeseries_frame(timeseries)
     times = TimeIndex(timeseries.index)
     timeseries.index = times.strings.values
 
@@ -483,13 +721,69 @@ def setup_times(generators_data, loads_data):
     return timeseries, times, generators_data, loads_data
 
 
+def _read_schedule_files(filenames):
+    """read each schedule file (in parallel threads)"""
+    filenames = sorted(filenames)
+    datadir = user_config.directory
+    with ThreadPoolExecutor() as pool:
+        schedules = pool.map(
+            lambda filename: get_schedule(joindir(datadir, filename)), filenames
+        )
+        return dict(zip(filenames, schedules))
+
+
+def _unit_schedule(schedule, filename, unit_name):
+    """
+    a unit's schedule from a file - either the file's only column
+    or (in a file with a column for each unit) the column named for the unit
+    """
+    if isinstance(schedule, DataFrame):
+        try:
+            schedule = schedule[unit_name]
+        except KeyError:
+            raise KeyError(
+                "schedule file {} has more than one column, ".format(filename)
+                + "but none named {}".format(unit_name)
+            )
+    # the file's schedule may be shared by other units
+    return schedule.copy()
+
+
+def _timeseries_frame(schedules):
+    """
+    the schedules as one frame - when they all have the same times
+    their values are used as is, instead of being aligned
+    """
+    index = next(iter(schedules.values())).index
+    if all(schedule.index.equals(index) for schedule in schedules.values()):
+        return DataFrame(
+            OrderedDict(
+                (name, schedule.values) for name, schedule in schedules.items()
+            ),
+            index=index,
+        )
+    return DataFrame(schedules)
+
+
 def _parse_scenario_day(filename):
     logging.debug("reading scenarios from %s", filename)
     data = read_csv(filename, parse_dates=True, index_col=0)
 
     # select subset of scenarios
     Nscenarios = user_config.scenarios
-    if Nscenarios:
+    if user_config.scenario_reduction:
+        selected, probability = stochastic.reduce_scenarios(
+            data[data.columns.drop("probability")].values,
+            data["probability"].values / data["probability"].sum(),
+            count=Nscenarios,
+            tolerance=user_config.scenario_reduction_tolerance,
+        )
+        logging.debug("reduced to %i of %i scenarios", len(selected), len(data))
+        data = data.iloc[selected].copy()
+        data["probability"] = probability
+        # scenarios are labeled by their position
+        data.index = pd.Index(list(range(len(data))), name=data.index.name)
+    elif Nscenarios:
         data = data[data.index < Nscenarios]
         data["probability"] = data["probability"] / sum(data["probability"])
 
@@ -500,7 +794,7 @@ def _parse_scenario_day(filename):
 def setup_scenarios(gen_data, generators, times):
 
     col = "scenariosdirectory"
-    scenario_values = xr.DataArray()
+    scenario_values = stochastic.ScenarioStore()
     if (
         user_config.deterministic_solve
         or user_config.perfect_solve
@@ -527,56 +821,92 @@ def setup_scenarios(gen_data, generators, times):
     if not filenames:
         raise IOError('no scenario files in "{}"'.format(scenarios_directory))
 
-    alldata = OrderedDict()
-    for i, f in enumerate(filenames):
-        data = _parse_scenario_day(f)
-        # label scenarios for the day with the date
-        date = Timestamp(data.columns.drop("probability")[0]).date()
-        alldata[date] = data
+    # only read the files for the days in the problem's times
+    days = set(times.times.normalize().date)
+    filenames = [f for f in filenames if _scenario_file_day(f) in days]
+    if not filenames:
+        raise IOError(
+            'no scenario files in "{}" for {} to {}'.format(
+                scenarios_directory, min(days), max(days)
+            )
+        )
 
     # TODO - assumes one hour intervals!!
     hrs = user_config.hours_commitment + user_config.hours_overlap
 
-    # make scenarios into a xarray with axes: day, scenario, {prob, [hours]}
-    # FIXME: make this work
-    scenario_values = xr.DataArray(
-        items=list(alldata.keys()),
-        major_axis=list(range(max([len(dat) for dat in list(alldata.values())]))),
-        minor_axis=["probability"] + list(range(hrs)),
-    )
+    cache = None
+    if user_config.scenario_cache:
+        cache = _scenario_cache_prefix(filenames, hrs)
+        if os.path.exists(cache + "-values.npy"):
+            logging.debug("loading cached scenarios from %s", cache)
+            gen.scenario_values = stochastic.ScenarioStore.load(cache)
+            return gen.scenario_values
 
-    for day, scenarios in list(alldata.items()):
-        if "probability" == scenarios.columns[-1]:
-            # reoder so that probability is the first column
-            scenarios = scenarios[scenarios.columns[:-1].insert(0, "probability")]
-        # rename the times into just hour offsets
-        scenarios = scenarios.rename(
-            columns=dict(
-                list(
-                    zip(
-                        scenarios.columns,
-                        ["probability"] + list(range(len(scenarios.columns) - 1)),
-                    )
-                )
-            )
-        )
-
-        # and take the number of hours needed
-        scenarios = scenarios[scenarios.columns[: 1 + hrs]]
+    alldata = OrderedDict()
+    for data in _parse_scenario_days(filenames):
+        # label scenarios for the day with the date
+        date = Timestamp(data.columns.drop("probability")[0]).date()
+        alldata[date] = data
 
-        scenario_values[day] = scenarios
+    # make scenarios into a store with axes: day, scenario, hour
+    # (and the probabilities with axes: day, scenario)
+    scenario_values = stochastic.ScenarioStore.from_days(alldata, hours=hrs)
 
     if user_config.wind_multiplier != 1.0:
-        # FIXME: make this work
-        scenario_values *= user_config.wind_multiplier
-        svt = scenario_values.transpose(2, 1, 0)
-        svt["probability"] *= 1 / user_config.wind_multiplier
-        scenario_values = svt.transpose(2, 1, 0)
+        scenario_values.values *= user_config.wind_multiplier
+
+    if cache is not None:
+        scenario_values.save(cache)
 
     gen.scenario_values = scenario_values
     # defer scenario tree construction until actual time stage starts
     return scenario_values
 
 
+def _scenario_file_day(filename):
+    """the day of a scenario file (from the first time in its header)"""
+    with open(filename) as f:
+        header = f.readline().strip().split(",")[1:]
+    return Timestamp([col for col in header if col != "probability"][0]).date()
+
+
+def _parse_scenario_days(filenames):
+    """
+    Parse the scenario files in a pool of (forked) processes, which
+    inherit the parsing options. Where forking is not available
+    (or there is one process), the files are parsed in this process.
+    """
+    processes = user_config.scenario_processes or os.cpu_count()
+    processes = min(processes, len(filenames))
+    if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            return list(pool.map(_parse_scenario_day, filenames))
+    else:
+        return [_parse_scenario_day(f) for f in filenames]
+
+
+def _scenario_cache_prefix(filenames, hours):
+    """
+    The cache file prefix for the parsed scenario files, which
+    changes if the contents of the files or the parsing options change.
+    """
+    digest = hashlib.sha1()
+    for f in filenames:
+        with open(f, "rb") as fobj:
+            digest.update(hashlib.sha1(fobj.read()).digest())
+    options = (
+        hours,
+        user_config.scenarios,
+        user_config.scenario_reduction,
+        user_config.scenario_reduction_tolerance,
+        user_config.wind_multiplier,
+    )
+    digest.update(repr(options).encode())
+    return joindir(
+        os.path.dirname(filenames[0]), ".scenarios-" + digest.hexdigest()[:12]
+    )
+
+
 def _has_valid_attr(obj, name):
     return getattr(obj, name, None) is not None
@@ -0,0 +1,178 @@
+"""
+Record the wall time and peak memory of each phase of a minpower run
+(e.g. data parsing, problem creation, the solver, solution loading),
+so that slow or memory hungry phases can be found without a profiler.
+
+Phases are recorded as they finish. Phases can be nested; a nested
+phase is named by its path, e.g. ``solve/solver``. Memory is the peak
+resident memory of the minpower process during the phase (the memory
+used by solvers run as subprocesses is not included).
+
+Phases run on a worker thread (e.g. building the next stage of a
+pipelined rolling UC) are nested and labeled with a stage separately
+from the main thread's phases. The peak memory can only be measured
+for the whole process, so phases which overlap a phase on another
+thread are marked as ``overlapped``: their peak is the process's peak
+over the overlapping phases, not their own.
+"""
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+columns = ["stage", "phase", "wall_time", "peak_memory", "overlapped"]
+
+records = []
+
+# the open phases of all threads
+_open = []
+_lock = threading.Lock()
+
+
+class _ThreadState(threading.local):
+    """the active phases and stage label (of each thread)"""
+
+    def __init__(self):
+        self.active = []
+        self.stage = None
+
+
+_state = _ThreadState()
+
+
+def reset():
+    """clear the records (at the start of a run)"""
+    del records[:]
+    del _open[:]
+    _state.active = []
+    _state.stage = None
+
+
+def set_stage(stage):
+    """label the following phases (of this thread) with a stage number"""
+    _state.stage = stage
+
+
+@contextmanager
+def phase(name):
+    """
+    Record the wall time (in sec) and peak memory (in MB)
+    of the code run within the context.
+    """
+    active = _state.active
+    current = dict(
+        name=_path(name), peak=None, thread=threading.get_ident(), overlapped=False
+    )
+    with _lock:
+        others = [p for p in _open if p["thread"] != current["thread"]]
+        if others:
+            # the peak is shared with the other thread's phases,
+            # so it must not be reset from under them
+            for p in others + active + [current]:
+                p["overlapped"] = True
+        else:
+            if active:
+                # keep the parent's peak so far, before the reset
+                active[-1]["peak"] = _max(active[-1]["peak"], _peak_memory())
+            _reset_peak_memory()
+        _open.append(current)
+        active.append(current)
+    start = time.time()
+    try:
+        yield
+    finally:
+        elapsed = time.time() - start
+        with _lock:
+            active.pop()
+            _open[:] = [p for p in _open if p is not current]
+        peak = _max(current["peak"], _peak_memory())
+        if active:
+            # the parent's peak includes this phase's peak
+            active[-1]["peak"] = _max(active[-1]["peak"], peak)
+        records.append(
+            dict(
+                stage=_state.stage,
+                phase=current["name"],
+                wall_time=elapsed,
+                peak_memory=peak,
+                overlapped=current["overlapped"],
+            )
+        )
+
+
+def record(name, wall_time):
+    """
+    Record a phase (nested within the current phase) which was timed
+    elsewhere, e.g. the solver's run time as reported by the solver.
+    Its memory is not known.
+    """
+    records.append(
+        dict(
+            stage=_state.stage,
+            phase=_path(name),
+            wall_time=wall_time,
+            peak_memory=None,
+            overlapped=False,
+        )
+    )
+
+
+def phase_times():
+    """:returns: the phase records as a DataFrame"""
+    return pd.DataFrame(records, columns=columns)
+
+
+def save(filename):
+    """
+    Append the phase records to a csv file (creating it
+    if it does not exist) and clear them.
+    """
+    df = phase_times()
+    exists = os.path.exists(filename)
+    df.to_csv(filename, mode="a" if exists else "w", header=not exists, index=False)
+    del records[:]
+    return df
+
+
+def _path(name):
+    """the name of a phase, nested within the current thread's active phases"""
+    return "/".join([p["name"] for p in _state.active] + [name])
+
+
+def _max(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _reset_peak_memory():
+    """reset the high water mark of the process's memory (linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except (IOError, OSError):
+        pass
+
+
+def _peak_memory():
+    """
+    The peak resident memory of the process (in MB) since the last reset.
+    Where the peak can not be reset, this is the peak over the
+    life of the process.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # not available on windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # mac reports in bytes, linux in kB
+    return peak / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0)
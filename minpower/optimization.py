@@ -2,15 +2,20 @@
 An optimization command library for Minpower.
 Basically a wrapper around Coopr's `pyomo.ConcreteModel` class.
 """
+import copy
 import logging
 import time
 import weakref
+from itertools import count
 from .commonscripts import quiet, not_quiet, update_attributes, joindir
 from pyomo.core.expr.current import evaluate_expression
 from pyomo import environ as pyomo
 from pyomo.opt.base import solvers as cooprsolver
+from pyomo.common.collections import ComponentMap, ComponentSet
 from .config import user_config
+from . import instrumentation
 import pandas as pd
+import numpy as np
 
 
 variable_kinds = dict(
@@ -18,6 +23,11 @@ variable_kinds = dict(
 )
 
 
+# each model (and each change to a model's components) gets a new version,
+# so that cached component handles can be checked for staleness
+_model_versions = count()
+
+
 def full_filename(filename):
     return joindir(user_config.directory, filename)
 
@@ -96,13 +106,17 @@ class OptimizationObject(object):
         :param kind: type of variable, specified by string. {Continuous or Binary/Boolean}
         :param low: low limit of variable
         :param high: high limit of variable
+        :param bounds: a rule giving the (low, high) limits of each element
+            of an indexed variable (instead of `low` and `high`)
         :param fixed_value: a fixed value for a variable (making it a parameter)
         :param time: a single time for a variable
         :param index: a :class:`pyomo.Set` over which a variable is created
         """
 
-        def map_args(kind="Continuous", low=None, high=None):
-            return dict(bounds=(low, high), domain=variable_kinds[kind])
+        def map_args(kind="Continuous", low=None, high=None, bounds=None):
+            if bounds is None:
+                bounds = (low, high)
+            return dict(bounds=bounds, domain=variable_kinds[kind])
 
         orig_name = name
         if index is None:
@@ -164,30 +178,64 @@ class OptimizationObject(object):
         else:
             return None
 
-    def get_variable(self, name, time=None, indexed=False, scenario=None):
+    _handles = None
+    _handles_version = None
+
+    def _get_handle(self, name, time, indexed, scenario):
+        """
+        Get a model component (or an element of an indexed component),
+        looked up by name the first time and then from the object's cache
+        until the problem's model changes.
+        """
+        problem = self._parent_problem()
+        if self._handles_version != problem._model_version:
+            self._handles = {}
+            self._handles_version = problem._model_version
+
+        key = (name, time, indexed, scenario)
+        try:
+            return self._handles[key]
+        except KeyError:
+            pass
+
         if indexed:
-            var_name = self._id(name)
-            if time is None:
-                return self._parent_problem().get_component(var_name, scenario)
-            else:
-                index = str(time)
-                return self._parent_problem().get_component(var_name, scenario)[index]
+            component = problem.get_component(self._id(name), scenario)
+            if time is not None:
+                component = component[str(time)]
         else:
-            var_name = self._t_id(name, time)
-            return self._parent_problem().get_component(var_name, scenario)
+            component = problem.get_component(self._t_id(name, time), scenario)
+        self._handles[key] = component
+        return component
+
+    def copy(self):
+        """
+        A copy of the object, without the original's
+        optimization components.
+        """
+        new = copy.copy(self)
+        new._handles = None
+        new._handles_version = None
+        new.init_optimization()
+        return new
+
+    def _clear_handles(self):
+        """drop the cached handles (of this object and its children)"""
+        self._handles = None
+        self._handles_version = None
+        for children in self.children.values():
+            if isinstance(children, dict):
+                children = children.values()
+            for child in children:
+                child._clear_handles()
+
+    def get_variable(self, name, time=None, indexed=False, scenario=None):
+        return self._get_handle(name, time, indexed, scenario)
 
     def get_constraint(self, name, time):
-        return self._parent_problem().get_component(self._t_id(name, time))
+        return self._get_handle(name, time, False, None)
 
     def get_parameter(self, name, time, indexed=False):
-        if indexed:
-            name = self._id(name)
-            if time is None:
-                return self._parent_problem().get_component(name)
-            else:
-                return self._parent_problem().get_component(name)[str(time)]
-        else:
-            return self._parent_problem().get_component(self._t_id(name, time))
+        return self._get_handle(name, time, indexed, None)
 
     def add_children(self, objects, name):
         """Add a child :class:`~optimization.OptimizationObject` to this object."""
@@ -247,11 +295,11 @@ class OptimizationObject(object):
 
     def _remove_component(self, name, time=None):
         key = self._t_id(name, time)
-        delattr(self._parent_problem()._model, key)
+        self._parent_problem()._remove_component(key)
 
     def values(self, name, reindex=None):
         """return the values of an indexed pyomo component as a Series"""
-        var = self._parent_problem().get_component(self._id(name))
+        var = self.get_variable(name, indexed=True)
         out = pd.Series(dict([(k, value(v)) for k, v in list(var.items())]))
         if reindex is not None:
             out.index = reindex
@@ -267,8 +315,11 @@ class OptimizationProblem(OptimizationObject):
 
     def init_optimization(self):
         self._model = pyomo.ConcreteModel("power system problem")
+        self._model_version = next(_model_versions)
         self.stochastic_formulation = False
         self.solved = False
+        self.use_warmstart = False
+        self.warm_started = False
         self.children = dict()
         self.variables = dict()
         self.constraints = dict()
@@ -339,6 +390,11 @@ class OptimizationProblem(OptimizationObject):
     def _remove_component(self, name, time=None):
         key = self._t_id(name, time) if time is not None else name
         delattr(self._model, key)
+        self._model_changed()
+
+    def _model_changed(self):
+        """invalidate the children's cached component handles"""
+        self._model_version = next(_model_versions)
 
     def reset_objective(self):
         delattr(self._model, "objective")
@@ -349,15 +405,7 @@ class OptimizationProblem(OptimizationObject):
             instances.append(self._stochastic_instance)
 
         for instance in instances:
-            # piecewise models leak memory
-            # keep until Coopr release integrates:
-            # https://software.sandia.gov/trac/coopr/changeset/5781
-            for pw in instance.component_objects(pyomo.Piecewise, active=True):
-                pw._constraints_dict = None
-                pw._vars_dict = None
-                pw._sets_dict = None
-
-            # another memory leak
+            # the component indexes leak memory
             for var in instance.component_objects(pyomo.Param, active=True):
                 var._index = None
             for var in instance.component_objects(pyomo.Var, active=True):
@@ -393,8 +441,21 @@ class OptimizationProblem(OptimizationObject):
 
             self._stochastic_instance = None
 
+        if getattr(self, "_persistent_solver", False):
+            # the solver holds on to the old model
+            del self._opt_solver
+
         self.solved = False
+        self.use_warmstart = False
+        self.warm_started = False
         self._model = pyomo.ConcreteModel()
+        self._model_changed()
+        # don't hold on to the old model's components
+        for children in self.children.values():
+            for child in children:
+                child._clear_handles()
+        if getattr(self, "fleet", None) is not None:
+            self.fleet._clear_handles()
 
     def show_model(self):
         components = self._model.components._component
@@ -444,6 +505,15 @@ class OptimizationProblem(OptimizationObject):
             self.solution_time = elapsed  # results.Solver[0]['Wallclock time']
             logging.info("Problem solved in {}s.".format(self.solution_time))
 
+        # add any constraints which were left out but are violated
+        # (e.g. lazy line limits) and re-solve the same model
+        while self.solved and not self.stochastic_formulation:
+            if not self.add_violated_constraints():
+                break
+            results, elapsed = self._solve_instance(instance, solver)
+            self.solution_time += elapsed
+            logging.info("Problem re-solved in {}s.".format(elapsed))
+
         if user_config.problem_file:
             self.write_model(full_filename("problem.lp"))
 
@@ -472,6 +542,16 @@ class OptimizationProblem(OptimizationObject):
         )
         return instance
 
+    def add_violated_constraints(self):
+        """
+        Add constraints which were left out of the problem and are
+        violated by its solution (overridden by problems which
+        generate constraints lazily).
+
+        :returns: the number of constraints added
+        """
+        return 0
+
     def __str__(self):
         return "system"
 
@@ -499,34 +579,76 @@ class OptimizationProblem(OptimizationObject):
             #                    kwds['solver_io'] = 'python'
             #            except ImportError: pass
 
-            self._opt_solver = cooprsolver.SolverFactory(solver, **kwds)
-            self._opt_solver.options.mipgap = user_config.mipgap
+            self._opt_solver = self._get_persistent_solver(solver)
+            if self._opt_solver is None:
+                self._opt_solver = cooprsolver.SolverFactory(solver, **kwds)
 
             if self._opt_solver is None:
                 msg = 'solver "{}" not found by coopr'.format(solver)
                 raise OptimizationError(msg)
 
+            self._opt_solver.options.mipgap = user_config.mipgap
+
         if user_config.solver_time_limit:
             self._opt_solver.options.timelimit = user_config.solver_time_limit
 
         # if we are debugging, show the solver output
         show_solver_output = user_config.logging_level <= 10
 
+        solve_kwds = {}
+        if self.use_warmstart and not get_duals:
+            # the variable values are a MIP start for this solve
+            self.use_warmstart = False
+            if self._opt_solver.warm_start_capable():
+                solve_kwds["warmstart"] = True
+                # was the problem (in any of its solves) warm started
+                self.warm_started = True
+            else:
+                logging.debug("{} can not be warm started".format(solver))
+
         start = time.time()
 
         quiet_fn = not_quiet if keepfiles or show_solver_output else quiet
 
-        with quiet_fn():
-            results = self._opt_solver.solve(
-                instance,
-                suffixes=suffixes,
-                keepfiles=keepfiles,
-                tee=show_solver_output,
-            )
-        try:
-            self._opt_solver._symbol_map = None  # this should mimic the memory leak bugfix at: software.sandia.gov/trac/coopr/changeset/5449
-        except AttributeError:
-            pass  # should remove after this fix becomes part of a release
+        phase = instrumentation.phase("solve duals" if get_duals else "solve")
+        with phase:
+            if self._persistent_solver:
+                # the fixed-integer LP must be sent as an LP
+                relaxed = _relax_fixed_integers(instance) if get_duals else []
+                with instrumentation.phase("update persistent solver"):
+                    self._persistent_record = _update_persistent_solver(
+                        self._opt_solver, instance, self._persistent_record
+                    )
+                solve_start = time.time()
+                with quiet_fn():
+                    results = self._opt_solver.solve(
+                        instance,
+                        suffixes=suffixes,
+                        tee=show_solver_output,
+                        load_solutions=False,
+                        **solve_kwds
+                    )
+                _record_solver_time(results, time.time() - solve_start)
+                _restore_integers(relaxed)
+            else:
+                solve_start = time.time()
+                with quiet_fn():
+                    results = self._opt_solver.solve(
+                        instance,
+                        suffixes=suffixes,
+                        keepfiles=keepfiles,
+                        tee=show_solver_output,
+                        load_solutions=False,
+                        **solve_kwds
+                    )
+                _record_solver_time(results, time.time() - solve_start)
+                try:
+                    self._opt_solver._symbol_map = None  # this should mimic the memory leak bugfix at: software.sandia.gov/trac/coopr/changeset/5449
+                except AttributeError:
+                    pass  # should remove after this fix becomes part of a release
+
+            with instrumentation.phase("load solution"):
+                _load_solution(instance, results)
         elapsed = time.time() - start
         self.solved = detect_status(results, self._opt_solver.name)
 
@@ -539,6 +661,33 @@ class OptimizationProblem(OptimizationObject):
 
         return results, elapsed
 
+    def _get_persistent_solver(self, solver):
+        """
+        Get the persistent interface for the solver (if it has one
+        and `user_config.persistent_solver` is set). The model is sent
+        to a persistent solver once and only the changes
+        (bounds, fixed variables, added and removed constraints)
+        are sent for subsequent solves.
+        Solvers without a persistent interface (like glpk and cbc)
+        write out a problem file for each solve.
+        """
+        self._persistent_solver = False
+        self._persistent_record = None
+        if not user_config.persistent_solver:
+            return None
+
+        name = solver + "_persistent"
+        if name in cooprsolver.SolverFactory:
+            opt = cooprsolver.SolverFactory(name)
+            if opt.available(exception_flag=False):
+                self._persistent_solver = True
+                return opt
+
+        logging.info(
+            "{} has no persistent solver interface, using problem files".format(solver)
+        )
+        return None
+
     def fix_binary_variables(self):
         _fix_binary_variables(self._model, self.stochastic_formulation)
 
@@ -553,6 +702,7 @@ class OptimizationProblem(OptimizationObject):
             self._model.component_objects(pyomo.Constraint, active=True).keys()
         ):
             delattr(self._model, key)
+        self._model_changed()
 
 
 def _fix_binary_variables(instance, is_stochastic=False):
@@ -600,17 +750,133 @@ def _unfix_variables(instance):
             var.fixed = False
 
 
+def _record_solver_time(results, elapsed):
+    """
+    Split the time of a call to the solver's `solve` into the solver's
+    run (as the solver reports it) and the rest of the call:
+    writing the problem and reading the results.
+    """
+    for name in ["time", "wallclock_time"]:
+        try:
+            solver_time = float(getattr(results.solver, name, None))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= solver_time <= elapsed:
+            break
+    else:
+        return
+    instrumentation.record("solver", solver_time)
+    instrumentation.record("write problem and read results", elapsed - solver_time)
+
+
+def _load_solution(instance, results):
+    """load the solver results into the instance (as the solver would)"""
+    if len(results.solution) > 0:
+        instance.solutions.load_from(results)
+        results._smap_id = None
+        results.solution.clear()
+
+
+def _persistent_record(instance):
+    """record the state of the model that has been sent to a persistent solver"""
+    return dict(
+        instance=instance,
+        objective=instance.objective,
+        constraints=ComponentSet(
+            instance.component_data_objects(
+                pyomo.Constraint, active=True, descend_into=True
+            )
+        ),
+        variables=ComponentMap(
+            (var, _variable_state(var))
+            for var in instance.component_data_objects(pyomo.Var, descend_into=True)
+        ),
+    )
+
+
+def _variable_state(var):
+    return (var.fixed, var.value if var.fixed else None, var.lb, var.ub, var.domain)
+
+
+def _update_persistent_solver(opt, instance, record):
+    """
+    Send the changes to the model since the last solve to a persistent solver.
+    A new model instance is sent to the solver in full.
+
+    :returns: the record of the model state that the solver has
+    """
+    if record is None or record["instance"] is not instance:
+        opt.set_instance(instance)
+        return _persistent_record(instance)
+
+    current = _persistent_record(instance)
+
+    # constraints that were removed (or deactivated)
+    for con in record["constraints"]:
+        if con not in current["constraints"]:
+            opt.remove_constraint(con)
+    # variables that were removed
+    for var in record["variables"]:
+        if var not in current["variables"]:
+            opt.remove_var(var)
+    # new and changed variables
+    for var, state in current["variables"].items():
+        if var not in record["variables"]:
+            opt.add_var(var)
+        elif state != record["variables"][var]:
+            opt.update_var(var)
+    # new constraints
+    for con in current["constraints"]:
+        if con not in record["constraints"]:
+            opt.add_constraint(con)
+
+    if current["objective"] is not record["objective"]:
+        opt.set_objective(current["objective"])
+    return current
+
+
+def _relax_fixed_integers(instance):
+    """
+    make the fixed integer variables continuous (for a fixed-integer LP)
+    :returns: the relaxed variables
+    """
+    relaxed = []
+    for var in instance.component_data_objects(pyomo.Var, descend_into=True):
+        if var.fixed and var.is_integer():
+            relaxed.append((var, var.domain))
+            var.domain = pyomo.Reals
+    return relaxed
+
+
+def _restore_integers(relaxed):
+    for var, domain in relaxed:
+        var.domain = domain
+
+
 def value(variable):
     """
     Value of an optimization variable after the problem is solved.
+    Expressions (e.g. a schedule minus a shedding variable) are evaluated.
     If passed a numeric value, will return the number.
     """
     try:
         return variable.value
     except AttributeError:
+        if getattr(variable, "is_expression_type", lambda: False)():
+            return pyomo.value(variable)
         return variable  # just a number
 
 
+def values_array(component, index):
+    """
+    Values of an indexed variable (or parameter) at each of the index
+    keys as an array, pulled from the whole component at once.
+    Unset values are NaN.
+    """
+    values = component.extract_values()
+    return np.array([values.get(key) for key in index], dtype=float)
+
+
 def detect_status(results, solver):
     """decide between a solver success or failure"""
     status_text = str(results.solver[0]["Termination condition"])
@@ -8,20 +8,26 @@ optimization framework from :class:`~optimization.OptimizationObject`.
 """
 
 import logging
+from numbers import Number
+import weakref
 
 from .commonscripts import update_attributes, getattrL, flatten
 from .config import user_config
 from .optimization import (
     value,
+    values_array,
     OptimizationObject,
     OptimizationProblem,
     OptimizationError,
 )
+from .generators import GeneratorFleet
 from . import stochastic
 
-from pyomo.environ import Block
+from pyomo.environ import Var, Constraint
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
 
 
 class Load(OptimizationObject):
@@ -35,6 +41,8 @@ class Load(OptimizationObject):
         (bounded to be at most the scheduled amount).
     """
 
+    prebuilt_shedding = False
+
     def __init__(
         self,
         name="",
@@ -56,15 +64,42 @@ class Load(OptimizationObject):
             if evaluate:
                 power = value(power)
             return power
+        elif self.prebuilt_shedding:
+            return self.get_scheduled_output(time) - self.shed(time, scenario, evaluate)
         else:
             return self.get_scheduled_output(time)
 
     def shed(self, time, scenario=None, evaluate=False):
+        if self.prebuilt_shedding:
+            shed = self.get_variable("shed", time, scenario=scenario, indexed=True)
+            return value(shed) if evaluate else shed
         return self.get_scheduled_output(time) - self.power(time, scenario, evaluate)
 
     def cost(self, time, scenario=None):
         return self.cost_shedding * self.shed(time, scenario)
 
+    def result_values(self, times, scenario=None):
+        """
+        The power and shedding over times (a dict of arrays),
+        computed from the values of the whole indexed variables.
+        """
+        index = times.strings.values
+        scheduled = self.schedule.loc[index].values.astype(float)
+        if self.shedding_mode:
+            power = values_array(
+                self.get_variable("power", indexed=True, scenario=scenario), index
+            )
+            shed = scheduled - power
+        elif self.prebuilt_shedding:
+            shed = values_array(
+                self.get_variable("shed", indexed=True, scenario=scenario), index
+            )
+            power = scheduled - shed
+        else:
+            power = scheduled
+            shed = np.zeros(len(index))
+        return dict(power=power, shed=shed)
+
     def cost_first_stage(self, times):
         return 0
 
@@ -72,8 +107,19 @@ class Load(OptimizationObject):
         return sum(self.cost(time) for time in times)
 
     def create_variables(self, times):
+        self.prebuilt_shedding = self.sheddingallowed and user_config.prebuilt_shedding
         if self.shedding_mode:
             self.add_variable("power", index=times.set, low=0)
+        elif self.prebuilt_shedding:
+            # no shedding until the bounds are relaxed
+            self.add_variable("shed", index=times.set, low=0, high=0)
+
+    def set_shedding_limits(self, times, allowed=True, scenario=None):
+        """relax (or re-tighten) the limits on the prebuilt shedding variable"""
+        for time in times:
+            self.get_variable("shed", time, scenario=scenario, indexed=True).setub(
+                self.get_scheduled_output(time) if allowed else 0
+            )
 
     def create_constraints(self, times):
         if self.shedding_mode:
@@ -117,29 +163,113 @@ class Line(OptimizationObject):
             self.pmin = -1 * self.pmax  # default is -1*pmax
         self.init_optimization()
 
+    # the positions of the line's from and to buses
+    # (set by the power system)
+    bus_indices = None
+    # in the PTDF formulation: the bus indices and distribution factors
+    # (arrays) for the line and if the line can reach its limits
+    ptdf = None
+    monitored = True
+
+    # in the PTDF formulation with lazy limits: the flow is only part
+    # of the problem at times where the limits have been added
+    lazy_flow = False
+
     def power(self, time):
+        if not self.monitored or (self.lazy_flow and time not in self.limited_times):
+            # the flow is not part of the problem,
+            # but can be evaluated from the bus injections
+            injections = self._parent_problem().ptdf_injections(time)
+            return _ptdf_flow(self.ptdf, injections)
         return self.get_variable("power", time, indexed=True)
 
     def price(self, time):
         """congestion price on line"""
+        if not self.monitored or (self.lazy_flow and time not in self.limited_times):
+            return 0 if user_config.duals else None
         return self.get_dual("line flow", time)
 
     def create_variables(self, times):
-        self.add_variable("power", index=times.set)
+        # the times with limit constraints (all times, unless lazy)
+        self.limited_times = set()
+        if self.monitored:
+            self.add_variable("power", index=times.set)
+
+    def create_constraints(self, times, buses, injections=None, lazy=False):
+        """
+        Create the constraints for a line over all times.
+        In the PTDF formulation the flow is a function of the bus
+        `injections` (see :meth:`PowerSystem.ptdf_injections`)
+        at each time and only monitored lines have constraints.
+
+        If `lazy`, the limits are left out (except at times where they
+        have already been added by :meth:`add_violated_limits`).
+        In the PTDF formulation the flow is also left out.
+        """
+        if self.ptdf is not None and not self.monitored:
+            return
+        self.lazy_flow = lazy and self.ptdf is not None
 
-    def create_constraints(self, times, buses):
-        """create the constraints for a line over all times"""
-        busNames = getattrL(buses, "name")
-        iFrom, iTo = busNames.index(self.frombus), busNames.index(self.tobus)
         for t in times:
-            line_flow_ij = self.power(t) == 1 / self.reactance * (
-                buses[iFrom].angle(t) - buses[iTo].angle(t)
-            )
-            self.add_constraint("line flow", t, line_flow_ij)
-            self.add_constraint("line limit high", t, self.power(t) <= self.pmax)
-            self.add_constraint("line limit low", t, self.pmin <= self.power(t))
+            limited = not lazy or t in self.limited_times
+            if limited or not self.lazy_flow:
+                self.create_flow_constraint(t, buses, injections)
+            if limited:
+                self.create_limit_constraints(t)
         return
 
+    def create_flow_constraint(self, time, buses=None, injections=None):
+        power = self.get_variable("power", time, indexed=True)
+        if self.ptdf is None:
+            iFrom, iTo = self.bus_indices
+            line_flow_ij = power == 1 / self.reactance * (
+                buses[iFrom].angle(time) - buses[iTo].angle(time)
+            )
+        else:
+            line_flow_ij = power == _ptdf_flow(self.ptdf, injections[time])
+        self.add_constraint("line flow", time, line_flow_ij)
+
+    def create_limit_constraints(self, time):
+        power = self.get_variable("power", time, indexed=True)
+        self.add_constraint("line limit high", time, power <= self.pmax)
+        self.add_constraint("line limit low", time, self.pmin <= power)
+        self.limited_times.add(time)
+
+    def remove_constraints(self, time):
+        """remove the line's flow (and any limit) constraints at a time"""
+        limited = time in self.limited_times
+        if limited or not self.lazy_flow:
+            self._remove_component("line flow", time)
+        if limited:
+            self._remove_component("line limit high", time)
+            self._remove_component("line limit low", time)
+
+    def add_violated_limits(self, times, tolerance=1e-05):
+        """
+        If the solved flow is over the line's limits at any of the times,
+        add the limit constraints (and in the PTDF formulation, the flow
+        constraint) at all of the times without them. A line which is
+        congested in one hour is likely to be in others, so this takes
+        fewer re-solves than adding limits just at the violated times.
+
+        :returns: the number of times limits were added
+        """
+        if not self.monitored:
+            return 0
+        unlimited = [t for t in times if t not in self.limited_times]
+        violated = any(
+            not (self.pmin - tolerance <= value(self.power(t)) <= self.pmax + tolerance)
+            for t in unlimited
+        )
+        if not violated:
+            return 0
+        for t in unlimited:
+            if self.lazy_flow:
+                injections = {t: self._parent_problem().ptdf_injections(t)}
+                self.create_flow_constraint(t, injections=injections)
+            self.create_limit_constraints(t)
+        return len(unlimited)
+
     def __str__(self):
         return "k{ind}".format(ind=self.index)
 
@@ -166,6 +296,9 @@ class Bus(OptimizationObject):
         return self.get_variable("angle", time, indexed=True)
 
     def price(self, time):
+        problem = self._parent_problem()
+        if problem.ptdf is not None:
+            return problem.ptdf_price(self, time)
         return self.get_dual("power balance", time)
 
     def Pgen(self, t, evaluate=False):
@@ -184,11 +317,11 @@ class Bus(OptimizationObject):
         if len(allBuses) == 1:
             lineFlowsFromBus = 0
         else:
+            # only the buses connected to this one have non-zero admittances
+            row = slice(Bmatrix.indptr[self.index], Bmatrix.indptr[self.index + 1])
             lineFlowsFromBus = sum(
-                [
-                    Bmatrix[self.index][otherBus.index] * otherBus.angle(t)
-                    for otherBus in allBuses
-                ]
+                B * allBuses[j].angle(t)
+                for j, B in zip(Bmatrix.indices[row], Bmatrix.data[row])
             )  # P_{ij}=sum_{i} B_{ij}*theta_j ???
         return sum([-lineFlowsFromBus, -self.Pload(t), self.Pgen(t)])
 
@@ -213,7 +346,8 @@ class Bus(OptimizationObject):
         for load in self.loads:
             load.create_variables(times)
         logging.debug("created load variables")
-        self.add_variable("angle", index=times.set)
+        if self._parent_problem().ptdf is None:
+            self.add_variable("angle", index=times.set)
         logging.debug("created bus variables ... returning")
         return
 
@@ -236,6 +370,9 @@ class Bus(OptimizationObject):
                 gen.create_constraints(times)
             for load in self.loads:
                 load.create_constraints(times)
+        if self._parent_problem().ptdf is not None:
+            # the power balance is system wide in the PTDF formulation
+            return
         nBus = len(buses)
         for time in times:
             self.add_constraint(
@@ -282,6 +419,11 @@ class PowerSystem(OptimizationProblem):
 
         buses = self.make_buses_list(loads, generators)
         self.create_admittance_matrix(buses, lines)
+        self.ptdf = None
+        self._injections = dict()
+        self._lazy_times = None
+        if user_config.ptdf_formulation and len(buses) > 1:
+            self.create_ptdf(buses, lines)
         self.init_optimization()
 
         self.add_children(buses, "buses")
@@ -289,6 +431,25 @@ class PowerSystem(OptimizationProblem):
 
         self.is_stochastic = len([gen for gen in generators if gen.is_stochastic]) > 0
         self.shedding_mode = False
+        self._shedding_relaxed = None
+        self.fleet = None
+
+    # when set, the constraints which depend on the generators'
+    # initial conditions are left out of the problem
+    # (see :meth:`create_initial_constraints`)
+    initial_constraints_deferred = False
+
+    def copy(self):
+        """
+        A new power system with copies of this system's components.
+        The copy has its own optimization problem, so it can be built
+        while this system's problem is being solved.
+        """
+        return PowerSystem(
+            [gen.copy() for gen in self.generators()],
+            [load.copy() for load in self.loads()],
+            [line.copy() for line in self.lines],
+        )
 
     def make_buses_list(self, loads, generators):
         """
@@ -309,20 +470,16 @@ class PowerSystem(OptimizationProblem):
         if len(busNameL) == 0:
             busNameL = [None]
 
-        buses = []
-        swingHasBeenSet = False
-
-        for b, busNm in enumerate(busNameL):
-            newBus = Bus(name=busNm, index=b)
-            for gen in generators:
-                if gen.bus == newBus.name:
-                    newBus.generators.append(gen)
-                if not swingHasBeenSet:
-                    newBus.isSwing = swingHasBeenSet = True
-            for ld in loads:
-                if ld.bus == newBus.name:
-                    newBus.loads.append(ld)
-            buses.append(newBus)
+        buses = [Bus(name=busNm, index=b) for b, busNm in enumerate(busNameL)]
+        busesByName = dict((bus.name, bus) for bus in buses)
+        for gen in generators:
+            if gen.bus in busesByName:
+                busesByName[gen.bus].generators.append(gen)
+        for ld in loads:
+            if ld.bus in busesByName:
+                busesByName[ld.bus].loads.append(ld)
+        if len(generators) > 0:
+            buses[0].isSwing = True
         return buses
 
     def create_admittance_matrix(self, buses, lines):
@@ -334,16 +491,113 @@ class PowerSystem(OptimizationProblem):
         :param buses: list of :class:`~powersystems.Line` objects
         :param lines: list of :class:`~powersystems.Bus` objects
         """
-        nB = len(buses)
-        self.Bmatrix = np.zeros((nB, nB))
-        namesL = [bus.name for bus in buses]
+        nB, nL = len(buses), len(lines)
+        positions = dict((bus.name, bus.index) for bus in buses)
         for line in lines:
-            busFrom = buses[namesL.index(line.frombus)]
-            busTo = buses[namesL.index(line.tobus)]
-            self.Bmatrix[busFrom.index, busTo.index] += -1 / line.reactance
-            self.Bmatrix[busTo.index, busFrom.index] += -1 / line.reactance
-        for i in range(0, nB):
-            self.Bmatrix[i, i] = -1 * sum(self.Bmatrix[i, :])
+            line.bus_indices = (positions[line.frombus], positions[line.tobus])
+        # the line-bus incidence matrix (+1 at the from bus, -1 at the to bus)
+        self._incidence = sparse.csr_matrix(
+            (
+                np.repeat([[1.0, -1.0]], nL, axis=0).ravel(),
+                (
+                    np.repeat(np.arange(nL), 2),
+                    [b for line in lines for b in line.bus_indices],
+                ),
+            ),
+            shape=(nL, nB),
+        )
+        self._admittance = np.array([1.0 / line.reactance for line in lines])
+        self.Bmatrix = (
+            self._incidence.T @ sparse.diags(self._admittance) @ self._incidence
+        ).tocsr()
+
+    def create_ptdf(self, buses, lines, chunk_size=500):
+        """
+        Calculate the power transfer distribution factors (PTDF):
+        the flow on each line for a unit injection at each bus
+        (withdrawn at the swing bus). Factors smaller than
+        `user_config.ptdf_tolerance` are dropped.
+
+        Also find the lines which can reach their limits
+        (for some balanced set of bus injections within the
+        generation and load limits). Only these lines are monitored.
+        """
+        nB, nL = len(buses), len(lines)
+        swing = ([bus.index for bus in buses if bus.isSwing] + [0])[0]
+        others = np.array([b for b in range(nB) if b != swing])
+        try:
+            reduced = splu(self.Bmatrix[others][:, others].tocsc())
+        except RuntimeError:
+            raise ValueError("the PTDF formulation requires a connected network")
+        line_admittances = (
+            sparse.diags(self._admittance) @ self._incidence[:, others]
+        ).tocsr()
+
+        low, high = _injection_limits(buses)
+        pmin = np.array([line.pmin for line in lines], dtype=float)
+        pmax = np.array([line.pmax for line in lines], dtype=float)
+
+        factors_chunks = []
+        monitored = np.zeros(nL, dtype=bool)
+        for start in range(0, nL, chunk_size):
+            chunk = slice(start, min(nL, start + chunk_size))
+            factors = np.zeros((chunk.stop - start, nB))
+            factors[:, others] = reduced.solve(
+                line_admittances[chunk].T.toarray()
+            ).T
+            monitored[chunk] = (_max_flows(factors, low, high) > pmax[chunk]) | (
+                -1 * _max_flows(-1 * factors, low, high) < pmin[chunk]
+            )
+            factors[np.abs(factors) < user_config.ptdf_tolerance] = 0
+            factors_chunks.append(sparse.csr_matrix(factors))
+
+        self.ptdf = sparse.vstack(factors_chunks).tocsr()
+        self._ptdf_by_bus = self.ptdf.tocsc()
+        for l, line in enumerate(lines):
+            row = slice(self.ptdf.indptr[l], self.ptdf.indptr[l + 1])
+            line.ptdf = (self.ptdf.indices[row], self.ptdf.data[row])
+            line.monitored = bool(monitored[l])
+        logging.debug(
+            "PTDF formulation monitors {} of {} lines".format(monitored.sum(), nL)
+        )
+
+    def ptdf_injections(self, time):
+        """
+        The net injection at each bus (for the PTDF formulation),
+        split into an array of the fixed injections (e.g. scheduled
+        loads) and a dict of the variable injections by bus position.
+        Keeping the fixed part numeric keeps the line flow expressions
+        to one term per bus with generation (or load shedding).
+        """
+        if time not in self._injections:
+            fixed = np.zeros(len(self.buses))
+            variable = dict()
+            for b, bus in enumerate(self.buses):
+                for injection in [bus.Pgen(time), -1 * bus.Pload(time)]:
+                    if isinstance(injection, Number):
+                        fixed[b] += injection
+                    else:
+                        variable[b] = variable.get(b, 0) + injection
+            self._injections[time] = (fixed, variable)
+        return self._injections[time]
+
+    def ptdf_price(self, bus, time):
+        """
+        The price (LMP) at a bus in the PTDF formulation:
+        the system price, less the congestion prices of the lines
+        that an injection at the bus flows over.
+        """
+        if not user_config.duals:
+            return None
+        price = self._model.dual[self.get_component(self._t_id("power balance", time))]
+        column = slice(
+            self._ptdf_by_bus.indptr[bus.index], self._ptdf_by_bus.indptr[bus.index + 1]
+        )
+        for l, factor in zip(
+            self._ptdf_by_bus.indices[column], self._ptdf_by_bus.data[column]
+        ):
+            price -= factor * self.lines[l].price(time)
+        return price
 
     def loads(self):
         return flatten(bus.loads for bus in self.buses)
@@ -356,12 +610,33 @@ class PowerSystem(OptimizationProblem):
         self.add_variable("cost_second_stage")
         self.add_set("times", times._set, ordered=True)
         times.set = self._model.times
+        self.create_fleet(times)
         for bus in self.buses:
             bus.create_variables(times)
         for line in self.lines:
             line.create_variables(times)
         logging.debug("... created power system vars... returning")
 
+    def create_fleet(self, times):
+        """
+        In the fleet formulation (see :class:`~generators.GeneratorFleet`),
+        create the variables for all of the controllable generators at once.
+        """
+        generators = self.get_generators_controllable()
+        if user_config.fleet_formulation and len(generators) > 0:
+            if self.is_stochastic:
+                raise NotImplementedError(
+                    "the fleet formulation does not handle stochastic problems"
+                )
+            self.fleet = GeneratorFleet(generators)
+            self.fleet._parent_problem = weakref.ref(self)
+            self.fleet.create_variables(times)
+        else:
+            self.fleet = None
+
+        for gen in generators:
+            gen._fleet = self.fleet
+
     def cost_first_stage(self, scenario=None):
         return self.get_component("cost_first_stage", scenario=scenario)
 
@@ -371,14 +646,24 @@ class PowerSystem(OptimizationProblem):
     def create_objective(self, times):
         self.add_objective(self.cost_first_stage() + self.cost_second_stage())
 
-    def create_constraints(self, times, include_children=True):
+    def create_constraints(self, times, include_children=True, initial=True):
+        self.initial_constraints_deferred = not initial
         if include_children:
             if user_config.duals:
                 self.add_suffix("dual")
+            if self.fleet is not None:
+                self.fleet.create_constraints(times)
+            self.create_cost_cuts(times)
             for bus in self.buses:
                 bus.create_constraints(times, self.Bmatrix, self.buses)
-            for line in self.lines:
-                line.create_constraints(times, self.buses)
+            self._lazy_times = times if self.lazy_line_limits else None
+            if self.ptdf is None:
+                for line in self.lines:
+                    line.create_constraints(
+                        times, self.buses, lazy=self.lazy_line_limits
+                    )
+            else:
+                self.create_ptdf_constraints(times)
 
         # system reserve constraint
         self._has_reserve = not self.shedding_mode and (
@@ -409,6 +694,88 @@ class PowerSystem(OptimizationProblem):
             == sum(bus.cost_second_stage(times) for bus in self.buses),
         )
 
+    def create_cost_cuts(self, times):
+        """
+        Create the cuts bounding the costs of the generators' convex bids
+        (see the `cost_cuts` option) as a single constraint, indexed by
+        (bid, segment, time).
+        """
+        bids = [gen.bids for gen in self.generators() if gen.bids.cuts]
+        if not bids:
+            return
+        self.add_set(
+            "cost_cuts_index",
+            [(b, k) for b, bid in enumerate(bids) for k in range(len(bid.cuts))],
+            ordered=True,
+        )
+        costs = [bid.get_variable("cost", indexed=True) for bid in bids]
+        powers = [bid.input_variable() for bid in bids]
+
+        def cut(model, b, k, time):
+            # (the intercept is scaled by the status, so an off unit costs 0)
+            intercept, slope = bids[b].cuts[k]
+            status = bids[b].status_variable(time)
+            return costs[b][time] >= intercept * status + slope * powers[b][time]
+
+        self.add_component_to_problem(
+            Constraint(
+                self._model.cost_cuts_index * times.set, name="cost_cuts", rule=cut
+            )
+        )
+
+    def create_ptdf_constraints(self, times):
+        """
+        Create the system power balance and the line constraints
+        for the PTDF formulation.
+        """
+        self._injections = dict()
+        injections = dict()
+        for time in times:
+            injections[time] = fixed, variable = self.ptdf_injections(time)
+            self.add_constraint(
+                "power balance",
+                fixed.sum() + sum(variable.values()) == 0,
+                time=time,
+            )
+        for line in self.lines:
+            line.create_constraints(
+                times, self.buses, injections, lazy=self.lazy_line_limits
+            )
+
+    @property
+    def lazy_line_limits(self):
+        """
+        Line limits are added only where violated (see
+        :meth:`add_violated_constraints`). Scenario problems are copies
+        of the model, so their line limits are always created.
+        """
+        return user_config.lazy_line_limits and not self.is_stochastic
+
+    def add_violated_constraints(self):
+        """
+        When line limits are lazy, add the limits of the lines
+        whose solved flows are over their limits.
+
+        :returns: the number of (line, time) limits added
+        """
+        if self._lazy_times is None:
+            return 0
+        added = sum(line.add_violated_limits(self._lazy_times) for line in self.lines)
+        logging.info("added {} line limits (for violated lines)".format(added))
+        return added
+
+    def create_initial_constraints(self, times):
+        """
+        Add the constraints which depend on the generators' initial
+        conditions, for a problem created with ``initial=False``
+        (before the initial conditions were known).
+        """
+        if self.fleet is not None:
+            self.fleet.create_initial_constraints(times)
+        for gen in self.get_generators_controllable():
+            gen.create_initial_constraints(times)
+        self.initial_constraints_deferred = False
+
     def iden(self, time=None):
         name = "system"
         if time is not None:
@@ -475,15 +842,82 @@ class PowerSystem(OptimizationProblem):
                 gen.finalstatus = gen.getstatus(tEndstr, times.non_overlap(), stat)
         return
 
-    def set_initialconditions(self, initTime):
-        for gen in self.generators():
-            finalstatus = getattr(gen, "finalstatus", {})
+    def set_initialconditions(self, initTime, source=None):
+        """
+        Set the generators' initial conditions to their final conditions
+        from the previous stage, which was solved by the `source`
+        power system (a copy of this one) or by this system.
+        """
+        source = self if source is None else source
+        for gen, source_gen in zip(self.generators(), source.generators()):
+            finalstatus = getattr(source_gen, "finalstatus", {})
             if finalstatus:
                 gen.set_initial_condition(**finalstatus)
-                del gen.finalstatus
+                del source_gen.finalstatus
         return
 
+    def get_warmstart(self, times, target=None):
+        """
+        Store the solved status and power of the controllable generators
+        (over all of the stage's times, including any overlap)
+        to warm start the next stage, on the `target` power system
+        (a copy of this one) or on this system.
+        """
+        target = self if target is None else target
+        generators = self.get_generators_controllable()
+        target._warmstart_values = dict(
+            (
+                kind,
+                pd.DataFrame(
+                    dict(
+                        (str(gen), [value(getattr(gen, kind)(t)) for t in times])
+                        for gen in generators
+                    ),
+                    index=times.strings.index,
+                ),
+            )
+            for kind in ["status", "power"]
+        )
+
+    def set_warmstart(self, times):
+        """
+        Set the status and power variables to the stored solution of
+        the previous stage, as a MIP start. Times in the overlap with the
+        previous stage get its solution directly. The rest of the times
+        get the previous stage's solution, shifted by the commitment horizon.
+
+        :returns: True if a warm start was set
+        """
+        stored = getattr(self, "_warmstart_values", None)
+        if stored is None:
+            return False
+
+        index = times.strings.index
+        shift = pd.Timedelta(hours=user_config.hours_commitment)
+        for kind, values in stored.items():
+            shifted = values.copy()
+            shifted.index = values.index + shift
+            values = values.reindex(index).combine_first(shifted.reindex(index))
+            if kind == "status":
+                values = values.round()
+
+            for gen in self.get_generators_controllable():
+                for t, val in zip(times, values[str(gen)]):
+                    var = getattr(gen, kind)(t)
+                    if (
+                        pd.notnull(val)
+                        and getattr(var, "is_variable_type", lambda: False)()
+                        and not var.fixed
+                    ):
+                        var.value = val
+
+        self._warmstart_values = None
+        self.use_warmstart = True
+        return True
+
     def solve_problem(self, times):
+        if self.is_stochastic and user_config.progressive_hedging:
+            return stochastic.solve_progressive_hedging(self, times)
         try:
             instance = self.solve()
 
@@ -500,7 +934,12 @@ class PowerSystem(OptimizationProblem):
 
     def resolve_stochastic_with_observed(self, instance, sln):
         s = sln.scenarios[0]
-        self._model = instance.component_objects(Block, active=True)[s]
+        if user_config.progressive_hedging:
+            # the scenarios share one instance
+            self._model = self._scenario_instances.load(s)
+        else:
+            self._model = self._scenario_instances[s]
+        self._model_changed()
         self.is_stochastic = False
         self.stochastic_formulation = False
 
@@ -548,6 +987,9 @@ class PowerSystem(OptimizationProblem):
             gen.shedding_mode = to_mode
 
     def allow_shedding(self, times, resolve=False):
+        if user_config.prebuilt_shedding:
+            return self._relax_shedding(times, resolve)
+
         self.shedding_mode = True
         self._set_load_shedding(True)
 
@@ -577,12 +1019,21 @@ class PowerSystem(OptimizationProblem):
                 gen.create_constraints(const_times)
 
         # recalc the power balance constraint
-        for bus in self.buses:
+        if self.ptdf is None:
+            for bus in self.buses:
+                for time in const_times:
+                    bus._remove_component("power balance", time)
+                bus.create_constraints(
+                    const_times, self.Bmatrix, self.buses, include_children=False
+                )
+        else:
+            # the line flows also depend on the load power
             for time in const_times:
-                bus._remove_component("power balance", time)
-            bus.create_constraints(
-                const_times, self.Bmatrix, self.buses, include_children=False
-            )
+                self._remove_component("power balance", time)
+                for line in self.lines:
+                    if line.monitored:
+                        line.remove_constraints(time)
+            self.create_ptdf_constraints(const_times)
 
         # reset objective
         self.reset_objective()
@@ -603,7 +1054,54 @@ class PowerSystem(OptimizationProblem):
             # and the stochastic instance
             stochastic.create_problem_with_scenarios(self, times)
 
+    def _shedding_objects(self):
+        """the objects with prebuilt shedding variables"""
+        return [
+            obj
+            for obj in self.loads() + self.get_generators_noncontrollable()
+            if obj.prebuilt_shedding
+        ]
+
+    def _scenarios(self):
+        scenarios = [None]
+        if self.stochastic_formulation:
+            scenarios.extend(self._scenario_instances.keys())
+        return scenarios
+
+    def _relax_shedding(self, times, resolve=False):
+        """
+        Allow shedding by relaxing the bounds of the shedding variables
+        (created with the problem) and removing the reserve requirement.
+        The model is not rebuilt.
+        """
+        const_times = times.non_overlap() if resolve else times
+        for scenario in self._scenarios():
+            for obj in self._shedding_objects():
+                obj.set_shedding_limits(const_times, allowed=True, scenario=scenario)
+        self._set_reserve_active(const_times, False)
+        self._shedding_relaxed = const_times
+
+    def _set_reserve_active(self, times, active):
+        if not getattr(self, "_has_reserve", False):
+            return
+        for scenario in self._scenarios():
+            for time in times:
+                try:
+                    con = self.get_component(self._t_id("reserve", time), scenario)
+                except AttributeError:
+                    # reserve constraints are not created in a resolve
+                    continue
+                con.activate() if active else con.deactivate()
+
     def disallow_shedding(self):
+        if self._shedding_relaxed is not None:
+            times = self._shedding_relaxed
+            for scenario in self._scenarios():
+                for obj in self._shedding_objects():
+                    obj.set_shedding_limits(times, allowed=False, scenario=scenario)
+            self._set_reserve_active(times, True)
+            self._shedding_relaxed = None
+
         # change shedding allowed flags for the next stage
         self.shedding_mode = False
         self._set_load_shedding(False)
@@ -710,16 +1208,20 @@ class PowerSystem(OptimizationProblem):
         the idea is that fast-starts should be contributing power
         only for system security, not economics
         """
-        names = []
+        variables = []
         for gen in [
             gen
             for gen in self.generators()
             if (not gen.faststart) and gen.is_controllable
         ]:
-            names.append(gen.status().name)
+            variables.append(gen.status())
             if fix_power:
-                names.append(gen.power().name)
-        self._fix_variables(names)
+                variables.append(gen.power())
+        # fix the elements directly (rather than by name)
+        # so that fleet formulation variables are also handled
+        for var in [var for var in variables if var.ctype is Var]:
+            for ind_var in var.values():
+                ind_var.fixed = True
 
     def debug_infeasible(self, times, resolve_sln=None):  # pragma: no cover
         generators = self.generators()
@@ -743,12 +1245,9 @@ class PowerSystem(OptimizationProblem):
 
             if self.is_stochastic:
                 gen = self.get_generator_with_scenarios()
-                scenarios = (
-                    gen.scenario_values[times.Start.date()]
-                    .drop("probability", axis=1)
-                    .T
+                scenarios = pd.DataFrame(
+                    gen._get_scenario_array(times).T, index=scheduled.index
                 )
-                scenarios.index = scheduled.index
 
                 scheduled["net_load"] = scheduled["load"] - sum(
                     [
@@ -827,3 +1326,70 @@ class PowerSystem(OptimizationProblem):
             print((pd.Series([gen.initial_status for gen in self.generators()])))
 
         return scheduled, committed
+
+
+def _output_range(component):
+    """
+    The range of a generator's output (or a load's consumption)
+    over all times. Loads (and non-controllable generators)
+    can be shed down to zero.
+    """
+    if getattr(component, "is_stochastic", False):
+        return 0, np.inf
+    elif getattr(component, "is_controllable", False):
+        return 0, component.pmax
+    schedule = getattr(component, "schedule", None)
+    if schedule is None:
+        return 0, np.inf
+    return min(0, schedule.min()), max(0, schedule.max())
+
+
+def _ptdf_flow(ptdf, injections):
+    """
+    The flow on a line from its distribution factors
+    and the (fixed and variable) bus injections.
+    """
+    indices, factors = ptdf
+    fixed, variable = injections
+    flow = float(np.dot(factors, fixed[indices]))
+    return flow + sum(
+        factor * variable[b]
+        for b, factor in zip(indices.tolist(), factors.tolist())
+        if b in variable
+    )
+
+
+def _injection_limits(buses):
+    """
+    The low and high limits of each bus's net injection
+    (generation less load) over all times.
+    """
+    low, high = np.zeros(len(buses)), np.zeros(len(buses))
+    for bus in buses:
+        for gen in bus.generators:
+            gen_low, gen_high = _output_range(gen)
+            low[bus.index] += gen_low
+            high[bus.index] += gen_high
+        for load in bus.loads:
+            load_low, load_high = _output_range(load)
+            low[bus.index] -= load_high
+            high[bus.index] -= load_low
+    return low, high
+
+
+def _max_flows(factors, low, high):
+    """
+    The max. flow on each line (a row of distribution factors)
+    over all bus injections within their limits which balance.
+    Starting from all buses at their low limits, the balancing
+    injection is added at the buses with the largest factors first.
+    """
+    order = np.argsort(-1 * factors, axis=1)
+    room = (high - low)[order]
+    # the room at the buses ahead of each bus in the order
+    ahead = np.zeros_like(room)
+    ahead[:, 1:] = np.cumsum(room[:, :-1], axis=1)
+    added = np.clip(-1 * low.sum() - ahead, 0, room)
+    return factors @ low + (np.take_along_axis(factors, order, axis=1) * added).sum(
+        axis=1
+    )
@@ -21,6 +21,7 @@ from .commonscripts import (
 )
 from .schedule import TimeIndex
 from .optimization import value
+from .bidding import BidArrays
 from .config import user_config
 import matplotlib
 import matplotlib.pyplot as plot
@@ -92,7 +93,7 @@ def make_multistage_solution(power_system, stage_times, stage_solutions):
         logging.warning("no visualization for multistage SCUC yet")
     klass = (
         MultistageStandalone
-        if getattr(stage_solutions, "path", False)
+        if isinstance(stage_solutions, pd.HDFStore)
         else Solution_UC_multistage
     )
     return klass(power_system, stage_times, stage_solutions)
@@ -106,6 +107,8 @@ class Solution(object):
     spreadsheet output, e.g. :class:`~solution.Solution_ED`.
     """
 
+    warmstart = False
+
     def __init__(self, power_system, times, datadir=".", is_stochastic=False):
         update_attributes(self, locals())
         self._resolved = False
@@ -137,16 +140,31 @@ class Solution(object):
             out = [value(getattr(obj, method)) for obj in items]
         return out
 
-    def gen_time_df(self, method, non_overlap=True, evaluate=False, generators=None):
+    def gen_time_df(
+        self, method, non_overlap=True, evaluate=False, generators=None, scenario=None
+    ):
+        """
+        A frame of the generators' values over times. The values are
+        pulled from whole indexed variables (see `result_values`),
+        so they are always evaluated.
+        """
         times = self.times_non_overlap if non_overlap else self.times
         if generators is None:
             generators = self.generators
+        values = [
+            self._result_values(gen, times, scenario)[method] for gen in generators
+        ]
         return gen_time_dataframe(
-            generators,
-            times,
-            [self.get_values(generators, method, t, evaluate) for t in times],
+            generators, times, np.array(values).reshape(len(generators), len(times)).T
         )
 
+    def _result_values(self, obj, times, scenario=None):
+        """the result arrays of an object (cached until the outputs are reset)"""
+        key = (id(obj), id(times), scenario)
+        if key not in self._values:
+            self._values[key] = obj.result_values(times, scenario)
+        return self._values[key]
+
     def _get_problem_info(self):
         self.solve_time = self.power_system.solution_time
         self.objective = float(value(self.power_system.objective))
@@ -156,19 +174,21 @@ class Solution(object):
             self.mipgap = None
 
     def _get_outputs(self):
+        self._values = {}
         self.generators_power = self.gen_time_df("power")
         self.generators_status = correct_status(self.gen_time_df("status"))
 
     def _get_costs(self):
         self.totalcost_generation = self.gen_time_df("cost", evaluate=True)
         self.fuelcost = self.gen_time_df("operatingcost", evaluate=True)
-        self.fuelcost_true = self.gen_time_df("truecost").sum().sum()
-        self.incremental_cost = self.gen_time_df("incrementalcost")
+        truecost, self.incremental_cost = self._get_true_costs()
+        self.fuelcost_true = truecost.sum().sum()
 
         times = self.times_non_overlap
         self.load_shed_timeseries = pd.Series(
-            [sum(self.get_values(self.loads, "shed", t, evaluate=True)) for t in times],
+            sum(self._result_values(load, times)["shed"] for load in self.loads),
             index=times.strings.index,
+            dtype=float,
         )
         self.gen_shed_timeseries = self.gen_time_df(
             "shed",
@@ -185,6 +205,30 @@ class Solution(object):
             logging.debug("load shed: {}MW".format(self.load_shed))
         self._get_cost_error()
 
+    def _get_true_costs(self):
+        """
+        The exact (from the bid polynomials or points) and incremental
+        costs of the generators, evaluated for all of them at once.
+        """
+        times = self.times_non_overlap
+        values = [self._result_values(gen, times) for gen in self.generators]
+        shape = (len(self.generators), len(times))
+        power = np.array([v["power"] for v in values]).reshape(shape)
+        status = np.array([v["status"] for v in values]).reshape(shape)
+
+        bids = BidArrays([gen.bids for gen in self.generators])
+        truecost = status * bids.output_true(power)
+        incremental = np.where(status != 0, bids.output_incremental(power), np.nan)
+        # the true cost of a non-controllable generator is its cost
+        # (including the cost of any shedding)
+        for i, gen in enumerate(self.generators):
+            if not gen.is_controllable:
+                truecost[i] = values[i]["cost"]
+        return (
+            gen_time_dataframe(self.generators, times, truecost.T),
+            gen_time_dataframe(self.generators, times, incremental.T),
+        )
+
     def _get_cost_error(self):
         try:
             self.costerror = (
@@ -192,6 +236,11 @@ class Solution(object):
             )
         except ZeroDivisionError:
             self.costerror = 0
+        # the bound on each generator's linearization error (in $/h)
+        self.linearization_errors = pd.Series(
+            [gen.bids.linearization_error for gen in self.generators],
+            index=[str(gen) for gen in self.generators],
+        )
 
     def _get_prices(self):
         self.lmps = {}
@@ -258,7 +307,9 @@ class Solution(object):
                 ]
             ),
             "angle={}".format(
-                self.get_values(buses, "angle", t) if len(buses) > 1 else []
+                self.get_values(buses, "angle", t)
+                if len(buses) > 1 and self.power_system.ptdf is None
+                else []
             ),
             "LMP={}".format(self.lmps[str(t)]),
         ]
@@ -282,6 +333,9 @@ class Solution(object):
             "linearized fuel cost of generation={}".format(self.fuelcost.sum().sum()),
             "polynomial fuel cost of generation={}".format(self.fuelcost_true),
             "percentage difference\t\t={diff:.2%}".format(diff=self.costerror),
+            "largest linearization error={}$/h".format(
+                self.linearization_errors.max()
+            ),
         ]
 
 
@@ -416,9 +470,7 @@ class Solution_ED(Solution):
 
         out = pd.DataFrame(columns=["power", "IC"], index=self.generators_power.columns)
         out["power"] = self.generators_power.loc[t]
-        out["IC"] = [
-            nice_zeros(g.incrementalcost(self.times[0])) for g in self.generators
-        ]
+        out["IC"] = self.incremental_cost.loc[t].map(nice_zeros)
 
         if user_config.dispatch_decommit_allowed:
             # add status, but label all units at Pmin as OFF
@@ -498,7 +550,7 @@ class Solution_OPF(Solution):
         fields.append("P")
         data.append(self.get_values(gens, "power", t))
         fields.append("IC")
-        data.append(self.get_values(gens, "incrementalcost", t))
+        data.append(self.incremental_cost.iloc[0].tolist())
 
         writeCSV(
             fields, transpose(data), filename=full_filename("powerflow-generators.csv")
@@ -583,6 +635,13 @@ class Solution_UC_multistage(Solution_UC):
         self.objective = self._sum_over("objective", stage_solutions)
         self.solve_time = self._sum_over("solve_time", stage_solutions)
         self.mipgaps = pd.Series([sln.mipgap for sln in stage_solutions])
+        self.stage_solve_times = pd.DataFrame(
+            dict(
+                solve_time=[sln.solve_time for sln in stage_solutions],
+                warmstart=[sln.warmstart for sln in stage_solutions],
+            ),
+            index=[times.Start for times in stage_times],
+        )
 
         self._get_outputs(stage_solutions)
         self._get_costs(stage_solutions)
@@ -673,9 +732,48 @@ class Solution_UC_multistage(Solution_UC):
         ]
 
 
+class _stored_table(object):
+
+    """
+    A results table of a :class:`MultistageStandalone` solution,
+    read from the store (with all of the stages' rows) when it is first used.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, sln, cls=None):
+        if sln is None:
+            return self
+        table = sln.store[self.name]
+        # keep the table on the solution, instead of reading it again
+        setattr(sln, self.__name__, table)
+        return table
+
+    def __set_name__(self, cls, name):
+        self.__name__ = name
+
+
 class MultistageStandalone(Solution_UC_multistage):
+
+    """
+    A multi-stage unit commitment whose stage results are in a store
+    (see :mod:`~standalone`). The results are read as they are used.
+    """
+
+    generators_power = _stored_table("power")
+    generators_status = _stored_table("status")
+    load_shed_timeseries = _stored_table("load_shed")
+    gen_shed_timeseries = _stored_table("gen_shed")
+    expected_cost = _stored_table("expected_cost")
+    observed_cost = _stored_table("observed_cost")
+    expected_power = _stored_table("expected_power")
+    expected_status = _stored_table("expected_status")
+    mipgaps = _stored_table("mipgap")
+
     def __init__(self, power_system, stage_times, store):
         self.power_system = power_system
+        self.store = store
         self.is_stochastic = power_system.is_stochastic
         self._resolved = (
             self.is_stochastic
@@ -686,20 +784,19 @@ class MultistageStandalone(Solution_UC_multistage):
         self.times = TimeIndex(times)
         self.times.set_initial(stage_times[0].initialTime)
 
-        self.expected_cost = self.totalcost_generation = store["expected_cost"]
-
-        if self._resolved:
-            self.observed_cost = self.totalcost_generation = store["observed_cost"]
+        self.solve_time = store["solve_time"].sum()
 
-        self.generators_power = store["power"]
-        self.generators_status = store["status"]
-        self.load_shed_timeseries = store["load_shed"]
-        self.gen_shed_timeseries = store["gen_shed"]
+    @property
+    def totalcost_generation(self):
+        return self.observed_cost if self._resolved else self.expected_cost
 
-        self.load_shed = store["load_shed"].sum()
-        self.gen_shed = store["gen_shed"].sum()
+    @property
+    def load_shed(self):
+        return self.load_shed_timeseries.sum()
 
-        self.solve_time = store["solve_time"].sum()
+    @property
+    def gen_shed(self):
+        return self.gen_shed_timeseries.sum()
 
 
 class Solution_Stochastic(Solution):
@@ -712,10 +809,7 @@ class Solution_Stochastic(Solution):
 
         gen = self.power_system.get_generator_with_scenarios()
 
-        try:  # single stage setup
-            self.probability = gen.scenario_values.probability.dropna()
-        except AttributeError:  # staged setup
-            self.probability = gen._get_scenario_probabilities(times)
+        self.probability = gen._get_scenario_probabilities(times)
 
         self.probability.index = self.scenarios
 
@@ -724,44 +818,29 @@ class Solution_Stochastic(Solution):
         self._get_costs()
         self._get_prices()
 
-    def stg_panel(self, method, generators=None, no_overlap=True, evaluate=False):
-        if generators is None:
-            generators = self.generators
-
-        times = self.times_non_overlap if no_overlap else self.times
-        if evaluate:
-            getval = lambda s, gen, t: value(getattr(gen, method)(t, s, evaluate=True))
-        else:
-            getval = lambda s, gen, t: value(getattr(gen, method)(t, s))
-        return pd.Panel(
+    def scenario_time_df(self, method, generators=None, non_overlap=True):
+        """
+        A frame of the values over times in each scenario,
+        indexed by (scenario, time) with a column for each generator.
+        """
+        return pd.concat(
             [
-                [[getval(s, gen, t) for gen in generators] for t in times]
+                self.gen_time_df(method, s, non_overlap, generators=generators)
                 for s in self.scenarios
             ],
-            items=[s for s in self.scenarios],
-            major_axis=times.strings.index,
-            minor_axis=[str(g) for g in generators],
+            keys=self.scenarios,
+            names=["scenario"],
         )
 
     def gen_time_df(
         self, method, scenario, non_overlap=True, evaluate=False, generators=None
     ):
-        if generators is None:
-            generators = self.generators
-
-        if evaluate:
-            getval = lambda gen, t: value(
-                getattr(gen, method)(t, scenario, evaluate=True)
-            )
-        else:
-            getval = lambda gen, t: value(getattr(gen, method)(t, scenario))
-
-        times = self.times_non_overlap if non_overlap else self.times
-        return gen_time_dataframe(
-            generators, times, [[getval(gen, t) for t in times] for gen in generators]
+        return Solution.gen_time_df(
+            self, method, non_overlap, evaluate, generators, scenario=scenario
         )
 
     def _get_outputs(self, resolve=False):
+        self._values = {}
         if resolve:
             # observed generator power
             # resolved on the first scenario instance
@@ -770,20 +849,25 @@ class Solution_Stochastic(Solution):
             self.generators_status = self.gen_time_df("status", None)
 
         else:
-            self.generators_power_scenarios = self.stg_panel("power")
-            self.generators_status_scenarios = correct_status(self.stg_panel("status"))
-            self.expected_status = self.generators_status_scenarios[self.scenarios[0]]
+            self.generators_power_scenarios = self.scenario_time_df("power")
+            self.generators_status_scenarios = correct_status(
+                self.scenario_time_df("status")
+            )
+            self.expected_status = self.generators_status_scenarios.loc[
+                self.scenarios[0]
+            ]
             self.generators_status = self.expected_status.copy()
             self.expected_power = self.generators_power = self._calc_expected(
                 self.generators_power_scenarios
             )
         return
 
-    def _calc_expected(self, panel):
-        out = panel.copy()
-        for s, pr in list(self.probability.items()):
-            out[s] *= pr
-        return out.sum(axis=0)
+    def _calc_expected(self, scenario_df):
+        return (
+            scenario_df.mul(self.probability, axis=0, level="scenario")
+            .groupby(level="time", sort=False)
+            .sum()
+        )
 
     def _calc_expected_cost(self, method):
         """
@@ -791,7 +875,7 @@ class Solution_Stochastic(Solution):
         multiplying each scenario cost by its probability,
         and summing over the scenarios
         """
-        return self._calc_expected(self.stg_panel(method, evaluate=True))
+        return self._calc_expected(self.scenario_time_df(method))
 
     def _get_costs(self, resolve=False):
         if resolve:
@@ -809,10 +893,7 @@ class Solution_Stochastic(Solution):
             if len(self.loads) > 1:
                 raise NotImplementedError
             self.load_shed_timeseries = pd.Series(
-                [
-                    self.power_system.loads()[0].shed(time, evaluate=True)
-                    for time in self.times_non_overlap
-                ],
+                self._result_values(self.loads[0], self.times_non_overlap)["shed"],
                 index=self.generators_power.index,
             )
 
@@ -838,19 +919,16 @@ class Solution_Stochastic(Solution):
 
             # calculate expected load, gen shed
             self.expected_gen_shed_timeseries = self._calc_expected(
-                self.stg_panel(
+                self.scenario_time_df(
                     "shed",
-                    evaluate=True,
                     generators=self.power_system.get_generators_noncontrollable(),
                 )
             )
             self.expected_gen_shed = self.expected_gen_shed_timeseries.sum().sum()
 
             self.expected_load_shed_timeseries = self._calc_expected(
-                self.stg_panel(
-                    "shed", evaluate=True, generators=self.power_system.loads()
-                )
-            )
+                self.scenario_time_df("shed", generators=self.loads)
+            ).sum(axis=1)
             self.expected_load_shed = self.expected_load_shed_timeseries.sum()
 
             if self.expected_gen_shed > 0.01:
@@ -9,10 +9,10 @@ import traceback
 import sys
 import os
 import logging
-import subprocess
 import time as timer
 import argparse
 import pdb
+from concurrent.futures import ThreadPoolExecutor
 
 from .config import user_config, parse_command_line_config
 from .commonscripts import joindir, StreamToLogger
@@ -20,7 +20,21 @@ from . import powersystems
 from . import get_data
 from . import stochastic
 from . import results
-from .standalone import store_times, init_store, get_storage, repack_storage
+from . import instrumentation
+from .standalone import (
+    store_times,
+    init_store,
+    get_storage,
+    store_state,
+    stages_completed,
+    remove_incomplete_stage,
+    set_initial_state,
+)
+
+
+def _save_phase_times():
+    if user_config.phase_times:
+        instrumentation.save(results.full_filename("phase-times.csv"))
 
 
 def _set_store_filename(pid=None):
@@ -32,50 +46,81 @@ def _set_store_filename(pid=None):
 
 
 def solve_multistage_standalone(power_system, times, scenario_tree, data):
-
+    """
+    Solve a rolling UC one stage at a time, storing each stage's
+    results (in HDF format) instead of keeping them in memory.
+    Each stage is built into a fresh model and the previous stage's
+    model is released, so memory use does not grow with the number of stages.
+    """
     stage_times = times.subdivide(
         user_config.hours_commitment, user_config.hours_overlap
     )
 
-    pid = user_config.pid if user_config.pid else os.getpid()
-    has_pid = user_config.output_prefix or user_config.pid
-
     if user_config.standalone_restart:
         # get the last stage in storage
         storage = get_storage()
-        stg_start = len(storage["solve_time"].dropna())
+        stg_start = stages_completed(storage)
+        if stg_start == len(stage_times):
+            logging.info("All stages are already solved")
+            return storage, stage_times
         logging.info("Restarting on stage {}".format(stg_start))
-        stage_times_remaining = stage_times[stg_start:]
+        remove_incomplete_stage(storage, stg_start, stage_times[stg_start].Start)
+        set_initial_state(power_system, storage, stage_times[stg_start].initialTime)
     else:
         storage = init_store(power_system, stage_times, data)
-        stage_times_remaining = stage_times
         stg_start = 0
 
-    for stg, t_stage in enumerate(stage_times_remaining):
+    for stg in range(stg_start, len(stage_times)):
+        t_stage = stage_times[stg]
         logging.info("Stage starting at {}".format(t_stage.Start.date()))
         # store current stage times
-        storage = store_times(t_stage, storage)
-        storage.close()
-        storage = None
-        command = "standalone_minpower {dir} {stg} {pid} {db}".format(
-            dir=user_config.directory,
-            stg=stg + stg_start,
-            pid="--pid {}".format(pid) if has_pid else "",
-            db="--debugger" if user_config.debugger else "",
-        )
-        try:
-            subprocess.check_call(command, shell=True, stdout=sys.stdout)
-        except AttributeError:
-            # HACK - avoid error when nose hijacks sys.stdout
-            subprocess.check_call(command, shell=True)
+        store_times(t_stage, storage)
+
+        sln = create_solve_problem(power_system, t_stage, scenario_tree, stg)
+        _log_stage_solve(stg, sln)
+        with instrumentation.phase("write output"):
+            store_state(power_system, t_stage, sln, storage)
+        storage.flush()
+        # don't hold on to the stage's solution
+        del sln
+
+        _next_stage(power_system, stage_times, stg)
 
-    repack_storage()
-    storage = get_storage()
     return storage, stage_times
 
 
+def _log_stage_solve(stg, sln):
+    logging.info(
+        "Stage {} solved in {:0.2f}s{}".format(
+            stg, sln.solve_time, " (warm start)" if sln.warmstart else ""
+        )
+    )
+
+
+def _next_stage(power_system, stage_times, stg, next_system=None):
+    """
+    release the stage's model and set up the next stage
+    (on `next_system`, when stages alternate between power systems)
+    """
+    next_system = power_system if next_system is None else next_system
+    if user_config.warmstart and not power_system.is_stochastic:
+        power_system.get_warmstart(stage_times[stg], next_system)
+    # reset model
+    power_system.reset_model()
+    # the stage's times hold on to the model's time set
+    stage_times[stg].set = None
+    # set inital state for next stage
+    if stg < len(stage_times) - 1:
+        next_system.set_initialconditions(
+            stage_times[stg + 1].initialTime, power_system
+        )
+
+
 def standaloneUC():
-    """the hook for the ``standalone_minpower`` script"""
+    """
+    the hook for the ``standalone_minpower`` script:
+    solve a single stage of a standalone problem from its store
+    """
     from .standalone import store_state, load_state
 
     parser = argparse.ArgumentParser()
@@ -104,8 +149,10 @@ def standaloneUC():
 
         sln = create_solve_problem(power_system, times, scenario_tree, stage_number=stg)
 
-        store = store_state(power_system, times, sln)
-        store.close()
+        with instrumentation.phase("write output"):
+            store = store_state(power_system, times, sln)
+            store.close()
+        _save_phase_times()
     except:
         if user_config.debugger or args.debugger:
             __, __, tb = sys.exc_info()
@@ -146,9 +193,17 @@ def solve_problem(
 
     logging.debug(dict(user_config))
 
+    instrumentation.reset()
+    if user_config.phase_times and not user_config.standalone_restart:
+        try:
+            os.remove(results.full_filename("phase-times.csv"))
+        except OSError:
+            pass
+
     start_time = timer.time()
     logging.debug("Minpower reading {}".format(datadir))
-    generators, loads, lines, times, scenario_tree, data = get_data.parsedir()
+    with instrumentation.phase("parse data"):
+        generators, loads, lines, times, scenario_tree, data = get_data.parsedir()
     logging.debug("data read")
     power_system = powersystems.PowerSystem(generators, loads, lines)
 
@@ -175,11 +230,14 @@ def solve_problem(
             solution.show()
             sys.stdout = stdout
         solution.show()
+    instrumentation.set_stage(None)
     if csv and not user_config.standalone:
-        solution.saveCSV()
+        with instrumentation.phase("write output"):
+            solution.saveCSV()
     if user_config.visualization:
         solution.visualization()
     logging.info("total time: {}s".format(timer.time() - start_time))
+    _save_phase_times()
 
     if user_config.on_complete_script:
         os.system(user_config.on_complete_script)
@@ -192,35 +250,117 @@ def solve_multistage(power_system, times, scenario_tree=None, data=None):
         user_config.hours_commitment, user_config.hours_overlap
     )
 
+    if user_config.pipeline_stages:
+        stage_solutions = solve_multistage_pipelined(
+            power_system, stage_times, scenario_tree
+        )
+        return stage_solutions, stage_times
+
     stage_solutions = []
 
     for stg, t_stage in enumerate(stage_times):
         logging.info("Stage starting at {}".format(t_stage.Start.date()))
         # solve
         solution = create_solve_problem(power_system, t_stage, scenario_tree, stg)
+        _log_stage_solve(stg, solution)
         # add to stage solutions
         stage_solutions.append(solution)
-        # reset model
-        power_system.reset_model()
-        # set inital state for next stage
-        if stg < len(stage_times) - 1:
-            power_system.set_initialconditions(stage_times[stg + 1].initialTime)
+        _next_stage(power_system, stage_times, stg)
 
     return stage_solutions, stage_times
 
 
+def solve_multistage_pipelined(power_system, stage_times, scenario_tree=None):
+    """
+    Solve a rolling UC, building the next stage's problem (on a worker
+    thread) while the current stage is being solved. The stages alternate
+    between the power system and a copy of it. The next stage is built
+    without the constraints which depend on its initial conditions; these
+    are added once the current stage's final conditions are known.
+
+    Pyomo does not document building models as thread safe. The two
+    threads never share a model or its components (each system has its
+    own copies), but they do share Pyomo's module level state, such as its
+    pausing of garbage collection. A process can not be used for the build
+    instead, as the built model would have to be pickled back to this one.
+    """
+    if power_system.is_stochastic:
+        raise NotImplementedError(
+            "pipelined stages are not implemented for stochastic problems"
+        )
+
+    systems = [power_system, power_system.copy()]
+    stage_solutions = []
+
+    with ThreadPoolExecutor(max_workers=1) as builder:
+        instrumentation.set_stage(0)
+        create_problem(power_system, stage_times[0], scenario_tree, 0)
+
+        for stg, t_stage in enumerate(stage_times):
+            system = systems[stg % 2]
+            next_system = systems[(stg + 1) % 2]
+            if stg > 0:
+                instrumentation.set_stage(stg)
+                with instrumentation.phase("create initial constraints"):
+                    system.create_initial_constraints(t_stage)
+
+            building = None
+            if stg < len(stage_times) - 1:
+                building = builder.submit(
+                    _build_stage,
+                    next_system,
+                    stage_times[stg + 1],
+                    scenario_tree,
+                    stg + 1,
+                )
+
+            logging.info("Stage starting at {}".format(t_stage.Start.date()))
+            solution = solve_created_problem(system, t_stage, stg)
+            _log_stage_solve(stg, solution)
+            stage_solutions.append(solution)
+
+            if building is not None:
+                with instrumentation.phase("wait for next stage"):
+                    building.result()
+            _next_stage(system, stage_times, stg, next_system)
+
+    return stage_solutions
+
+
+def _build_stage(power_system, times, scenario_tree, stage_number):
+    """create a stage's problem, leaving out its initial condition constraints"""
+    instrumentation.set_stage(stage_number)
+    create_problem(power_system, times, scenario_tree, stage_number, initial=False)
+
+
 def create_solve_problem(
     power_system, times, scenario_tree=None, stage_number=None, rerun=False
 ):
     """create and solve an optimization problem."""
 
+    instrumentation.set_stage(stage_number)
+
     create_problem(power_system, times, scenario_tree, stage_number, rerun)
 
+    return solve_created_problem(power_system, times, stage_number)
+
+
+def solve_created_problem(power_system, times, stage_number=None):
+    """solve a created optimization problem and make its solution."""
+
+    instrumentation.set_stage(stage_number)
+
+    if user_config.warmstart:
+        power_system.set_warmstart(times)
+
     instance = power_system.solve_problem(times)
 
     logging.debug("solved... get results")
 
-    sln = results.make_solution(power_system, times)
+    with instrumentation.phase("make solution"):
+        sln = results.make_solution(power_system, times)
+    # only if the solver could use the warm start
+    sln.warmstart = power_system.warm_started
 
     power_system.disallow_shedding()
 
@@ -240,24 +380,40 @@ def create_solve_problem(
 
 
 def create_problem(
-    power_system, times, scenario_tree=None, stage_number=None, rerun=False
+    power_system,
+    times,
+    scenario_tree=None,
+    stage_number=None,
+    rerun=False,
+    initial=True,
 ):
-    """Create an optimization problem."""
+    """
+    Create an optimization problem. If not `initial`, the constraints which
+    depend on the initial conditions are left out (to be added with
+    :meth:`~powersystems.PowerSystem.create_initial_constraints`).
+    """
 
     logging.debug("initialized problem")
-    power_system.create_variables(times)
+    with instrumentation.phase("create variables"):
+        power_system.create_variables(times)
     logging.debug("created variables")
-    power_system.create_objective(times)
+    with instrumentation.phase("create objective"):
+        power_system.create_objective(times)
     logging.debug("created objective")
-    power_system.create_constraints(times)
+    with instrumentation.phase("create constraints"):
+        power_system.create_constraints(times, initial=initial)
     logging.debug("created constraints")
 
-    if scenario_tree is not None and sum(scenario_tree.shape) > 0 and not rerun:
-        stochastic.construct_simple_scenario_tree(
-            power_system, times, time_stage=stage_number
-        )
-        stochastic.define_stage_variables(power_system, times)
-        stochastic.create_problem_with_scenarios(power_system, times)
+    if power_system.is_stochastic and user_config.progressive_hedging and not rerun:
+        with instrumentation.phase("create scenario problem"):
+            stochastic.create_scenario_instances(power_system, times)
+    elif scenario_tree is not None and sum(scenario_tree.shape) > 0 and not rerun:
+        with instrumentation.phase("create scenario problem"):
+            stochastic.construct_simple_scenario_tree(
+                power_system, times, time_stage=stage_number
+            )
+            stochastic.define_stage_variables(power_system, times)
+            stochastic.create_problem_with_scenarios(power_system, times)
     return
 
 
@@ -283,8 +439,14 @@ def main():
     """
     The command line interface for minpower. For more info use:
     ``minpower --help``
+
+    To compile a case (see :func:`~get_data.compile_case`) use:
+    ``minpower compile <directory>``
     """
 
+    if sys.argv[1:2] == ["compile"]:
+        return compile_case(sys.argv[2:])
+
     args = parse_command_line_config(
         argparse.ArgumentParser(description="Minpower command line interface")
     )
@@ -316,6 +478,17 @@ def main():
                 raise
 
 
+def compile_case(args=None):
+    """compile a case, with the options given on the command line"""
+    parse_command_line_config(
+        argparse.ArgumentParser(description="Compile a minpower case"), args
+    )
+    directory = user_config.directory
+    if not os.path.isdir(directory):
+        raise OSError('There is no folder named "{}".'.format(directory))
+    print("compiled case to {}".format(get_data.compile_case()))
+
+
 # for use in dev
 if __name__ == "__main__":
     main()
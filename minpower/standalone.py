@@ -2,13 +2,17 @@
 A module to workaround a memory leak in coopr by saving the results
 of each day of a rolling unit commitment to disk (in HDF format)
 and reloading them to run the next day as a memory independent subprocess.
+
+The results of each stage are appended to the store's tables
+(in the HDF table format), so writing a stage does not rewrite
+the results of the stages before it.
 """
 
 import os
 import logging
 import sys
 import pandas as pd
-from pandas import Series, DataFrame
+from pandas import Series
 from .commonscripts import (
     gen_time_dataframe,
     correct_status,
@@ -19,7 +23,7 @@ from .config import user_config
 
 from .schedule import TimeIndex
 from .get_data import parse_standalone
-import pkg_resources
+from . import __version__
 
 
 def wipe_storage():
@@ -49,15 +53,18 @@ def init_store(power_system, times, data):
 
     # store the problem info read from the spreadsheets
     for key, df in list(data.items()):
-        if key != "scenario_values":
-            for k, v in (df.dtypes == object).iterkv():
+        if key == "scenario_values":
+            if not len(df):
+                continue
+            # store the scenarios as a (day, scenario) indexed frame
+            df = df.to_frame()
+        else:
+            for k, v in (df.dtypes == object).items():
                 if v:
                     df[k] = df[k].fillna("")
 
-        key = "data_" + key
-        storage[key] = df
+        put_data(storage, "data_" + key, df)
 
-    stages = len(times)  # stage_times
     est_Nt = len(data["timeseries"])
     t = [times[0].initialTime]
 
@@ -68,40 +75,34 @@ def init_store(power_system, times, data):
             generators, t, values=[[gen.initial_power for gen in generators]]
         ),
         expectedrows=est_Nt,
+        index=False,
     )
 
     storage.append(
         "status",
         gen_time_dataframe(
             generators, t, values=[[gen.initial_status for gen in generators]]
-        ),
+        ).astype(float),
         expectedrows=est_Nt,
+        index=False,
     )
 
-    storage["hrsinstatus"] = gen_time_dataframe(
-        generators, t, values=[[gen.initial_status_hours for gen in generators]]
+    storage.append(
+        "hrsinstatus",
+        gen_time_dataframe(
+            generators, t, values=[[gen.initial_status_hours for gen in generators]]
+        ).astype(float),
+        index=False,
     )
 
-    # setup empty containers for variables
-    storage["load_shed"] = Series()
-    storage["gen_shed"] = Series()
-    storage["expected_cost"] = DataFrame()
-    storage["observed_cost"] = DataFrame()
-    storage["expected_status"] = DataFrame()
-    storage["expected_power"] = DataFrame()
-    storage["expected_fuelcost"] = DataFrame()
-    storage["observed_fuelcost"] = DataFrame()
-
-    # setup one-per-stage results
-    storage["solve_time"] = Series(index=list(range(stages)))
-    storage["mipgap"] = Series(index=list(range(stages)))
+    # the results tables are created by the first stage's appends
 
     # store configuration
     storage["configuration"] = Series(user_config)
 
     storage["version"] = Series(
         {
-            "minpower": pkg_resources.get_distribution("minpower").version,
+            "minpower": __version__,
             # try storing version number of the current working directory
             "problem": _get_problem_version(),
         }
@@ -110,6 +111,20 @@ def init_store(power_system, times, data):
     return storage
 
 
+def put_data(storage, key, df):
+    """
+    store a table of the problem data - the timeseries and the scenarios
+    are stored in the table format, so that each stage can read
+    just its own rows (see :func:`~get_data.parse_standalone`)
+    """
+    if key in ("data_timeseries", "data_scenario_values"):
+        # the table format needs string column names
+        df = df.rename(columns=str)
+        storage.put(key, df, format="table")
+    else:
+        storage[key] = df
+
+
 def _get_problem_version():
     version = ""
     possible_init = os.path.join(os.path.abspath(user_config.directory), "__init__.py")
@@ -119,37 +134,48 @@ def _get_problem_version():
     return version
 
 
-def store_state(power_system, times, sln=None):
-    storage = get_storage()
+def store_state(power_system, times, sln=None, storage=None):
+    if storage is None:
+        storage = get_storage()
     generators = power_system.generators()
 
     stg = sln.stage_number
     table_append(storage, "power", sln.generators_power)
-    table_append(storage, "status", sln.generators_status)
+    table_append(storage, "status", sln.generators_status.astype(float))
     table_append(storage, "load_shed", sln.load_shed_timeseries)
     table_append(storage, "gen_shed", sln.gen_shed_timeseries)
 
     tEnd = times.last_non_overlap()
-    storage["hrsinstatus"] = gen_time_dataframe(
-        generators,
-        [tEnd],
-        values=[[gen.finalstatus["hoursinstatus"] for gen in generators]],
+    # (a table of each stage's final hours in status, so that a restart
+    # can read the row it starts from)
+    table_append(
+        storage,
+        "hrsinstatus",
+        gen_time_dataframe(
+            generators,
+            [tEnd],
+            values=[[gen.finalstatus["hoursinstatus"] for gen in generators]],
+        ).astype(float),
     )
 
-    _add_tbl_val(storage, "solve_time", stg, sln.solve_time)
-    _add_tbl_val(storage, "mipgap", stg, sln.mipgap)
-
     if sln._resolved:
         table_append(storage, "observed_cost", sln.observed_totalcost)
         table_append(storage, "observed_fuelcost", sln.observed_fuelcost)
         table_append(storage, "expected_cost", sln.expected_totalcost)
         table_append(storage, "expected_fuelcost", sln.expected_fuelcost)
         table_append(storage, "expected_power", sln.expected_power)
-        table_append(storage, "expected_status", sln.expected_status)
+        table_append(storage, "expected_status", sln.expected_status.astype(float))
     else:
         table_append(storage, "expected_cost", sln.totalcost_generation)
         table_append(storage, "expected_fuelcost", sln.fuelcost)
 
+    # the one-per-stage results are written last -
+    # a stage is complete once its solve time is stored
+    table_append(storage, "mipgap", Series([sln.mipgap], index=[stg], dtype=float))
+    table_append(
+        storage, "solve_time", Series([sln.solve_time], index=[stg], dtype=float)
+    )
+
     #    # DEBUGGING
     #    from pandas.util.testing import assert_frame_equal
     #    try:
@@ -176,6 +202,41 @@ def store_state(power_system, times, sln=None):
     return storage
 
 
+def stages_completed(storage):
+    """the number of stages whose results are in the store"""
+    return len(storage["solve_time"]) if "solve_time" in storage else 0
+
+
+# the tables a stage appends its results to, indexed by time
+# (the mipgap and solve_time tables are indexed by stage)
+stage_tables = [
+    "power",
+    "status",
+    "load_shed",
+    "gen_shed",
+    "hrsinstatus",
+    "observed_cost",
+    "observed_fuelcost",
+    "expected_cost",
+    "expected_fuelcost",
+    "expected_power",
+    "expected_status",
+]
+
+
+def remove_incomplete_stage(storage, stage, start):
+    """
+    remove any results of the stage (starting at time `start`) which were
+    stored before it was interrupted, so that a restart does not repeat them
+    """
+    for name in stage_tables:
+        if name in storage:
+            storage.remove(name, where="index >= start")
+    for name in ["mipgap", "solve_time"]:
+        if name in storage:
+            storage.remove(name, where="index >= stage")
+
+
 def load_state():
     storage = get_storage()
     user_config.update(storage["configuration"].to_dict())
@@ -194,37 +255,26 @@ def load_state():
 
     # create power_system
     power_system, times, scenario_tree = parse_standalone(storage, times)
-    generators = power_system.generators()
+    set_initial_state(power_system, storage, times.initialTime)
+    return power_system, times, scenario_tree
+
 
-    # set up initial state
-    t = times.initialTime
-    status = correct_status(storage["status"]).loc[t]
-    for gen in generators:
+def set_initial_state(power_system, storage, t):
+    """set the generators' initial conditions from the stored state at time t"""
+    # read just the row at t (not the results of all the stages so far)
+    status = correct_status(storage.select("status", where="index == t")).loc[t]
+    power = storage.select("power", where="index == t").loc[t]
+    hours = storage.select("hrsinstatus", where="index == t").loc[t]
+    for gen in power_system.generators():
         g = str(gen)
         gen.set_initial_condition(
-            power=storage["power"][g][t],
+            power=power[g],
             status=status[g],
-            hoursinstatus=storage["hrsinstatus"][g][t],
+            hoursinstatus=hours[g],
         )
 
-    return power_system, times, scenario_tree
-
-
-def repack_storage():
-    """compress that ballooning storage"""
-    # http://stackoverflow.com/questions/13089359/mystery-when-storing-a
-    # -dataframe-containing-strings-in-hdf-with-pandas
-    os.system(
-        "ptrepack {f} {f}.copy; mv {f}.copy {f};".format(f=user_config.store_filename)
-    )
-
-
-def _add_tbl_val(storage, tablename, index, value):
-    tbl = storage[tablename]
-    tbl[index] = value
-    storage[tablename] = tbl
-
 
 def table_append(store, name, newvals):
-    store[name] = store[name].append(newvals)
-    return
+    """append a stage's values to a table of the store (creating it if needed)"""
+    # don't index the rows - updating the index takes longer as the table grows
+    store.append(name, newvals, index=False)
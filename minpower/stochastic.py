@@ -1,12 +1,183 @@
 """
 Stochastic scenario models for schedules.
 """
-from pyomo.environ import AbstractModel, Set, Param, Boolean, Var
+from pyomo.environ import AbstractModel, Set, Param, Boolean, Var, Objective
+from pyomo.core.base.componentuid import ComponentUID
+from pyomo.opt.base import solvers as cooprsolver
 from .config import user_config
+from .optimization import OptimizationError, detect_status, _load_solution, value
+from . import instrumentation
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+import multiprocessing
+import os
+import time
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import cdist
 import gc
 import logging
 
 
+class ScenarioStore(object):
+    """
+    The scenario values of a generator, for each day: a (day x scenario
+    x hour) array of values and a (day x scenario) array of probabilities.
+    Days with fewer scenarios are padded (with NaN values and zero
+    probabilities) and a day's values are a view of the array.
+
+    The arrays can be saved to and loaded from ``.npy`` files, with the
+    values memory-mapped, so that the scenario files are parsed once.
+    """
+
+    def __init__(self, days=None, values=None, probabilities=None, counts=None):
+        self.days = list(days) if days is not None else []
+        self.values = values if values is not None else np.zeros((0, 0, 0))
+        self.probabilities = (
+            probabilities if probabilities is not None else np.zeros((0, 0))
+        )
+        self.counts = (
+            counts if counts is not None else (self.probabilities > 0).sum(axis=1)
+        )
+        self._positions = dict((day, i) for i, day in enumerate(self.days))
+
+    @classmethod
+    def from_days(cls, days, hours=None):
+        """
+        Create the store from a dict of the scenarios for each day
+        (DataFrames with a probability column and a column for each hour).
+        """
+        frames = list(days.values())
+        hours = hours or max(len(df.columns) - 1 for df in frames)
+        n = max(len(df) for df in frames)
+        values = np.full((len(frames), n, hours), np.nan)
+        probabilities = np.zeros((len(frames), n))
+        counts = np.zeros(len(frames), dtype=int)
+        for d, df in enumerate(frames):
+            day_values = df.drop(columns="probability").values[:, :hours]
+            values[d, : len(df), : day_values.shape[1]] = day_values
+            probabilities[d, : len(df)] = df["probability"].values
+            counts[d] = len(df)
+        return cls(list(days.keys()), values, probabilities, counts)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __len__(self):
+        return len(self.days)
+
+    def values_for(self, day, hours=None):
+        """the (scenario x hour) values for a day"""
+        i = self._positions[day]
+        return self.values[i, : self.counts[i], :hours]
+
+    def probabilities_for(self, day):
+        """the probability of each of the day's scenarios"""
+        i = self._positions[day]
+        return pd.Series(self.probabilities[i, : self.counts[i]])
+
+    def to_frame(self):
+        """the scenarios as a DataFrame indexed by day and scenario"""
+        frames = [
+            pd.DataFrame(
+                self.values_for(day), columns=list(range(self.shape[2]))
+            ).assign(day=pd.Timestamp(day), scenario=list(range(self.counts[i])))
+            for i, day in enumerate(self.days)
+        ]
+        df = pd.concat(frames).set_index(["day", "scenario"])
+        df.insert(
+            0,
+            "probability",
+            np.concatenate([self.probabilities_for(day).values for day in self.days]),
+        )
+        return df
+
+    @classmethod
+    def from_frame(cls, df):
+        """create the store from :meth:`to_frame` output"""
+        days = OrderedDict()
+        for day, day_df in df.groupby(level="day", sort=True):
+            days[pd.Timestamp(day).date()] = day_df.reset_index(drop=True)
+        return cls.from_days(days, hours=len(df.columns) - 1)
+
+    def save(self, prefix):
+        """save the arrays (to ``<prefix>-values.npy`` and ``<prefix>-index.npz``)"""
+        np.save(prefix + "-values.npy", self.values)
+        np.savez(
+            prefix + "-index.npz",
+            days=np.array([str(day) for day in self.days]),
+            probabilities=self.probabilities,
+            counts=self.counts,
+        )
+
+    @classmethod
+    def load(cls, prefix, mmap_mode="r"):
+        """load saved arrays, with the values memory-mapped"""
+        index = np.load(prefix + "-index.npz")
+        return cls(
+            [pd.Timestamp(str(day)).date() for day in index["days"]],
+            np.load(prefix + "-values.npy", mmap_mode=mmap_mode),
+            index["probabilities"],
+            index["counts"],
+        )
+
+
+def reduce_scenarios(values, probabilities, count=None, tolerance=0):
+    """
+    Select a representative subset of the scenarios by fast forward
+    selection (Heitsch and Romisch, 2003). Scenarios are added to the
+    selection one at a time, each time choosing the scenario which
+    most reduces the probability weighted distance of the unselected
+    scenarios to their nearest selected scenario. The probability of
+    each unselected scenario is then moved to its nearest selected one.
+
+    :param values: array of the scenario values (scenarios x times)
+    :param probabilities: the probability of each scenario
+    :param count: the (maximum) number of scenarios to select
+    :param tolerance: stop selecting once the distance of the unselected
+        scenarios is within this fraction of their distance
+        to the best single scenario
+    :returns: the indices of the selected scenarios (in order)
+        and their new probabilities
+    """
+    values = np.asarray(values, dtype=float)
+    probabilities = np.asarray(probabilities, dtype=float)
+    n = len(probabilities)
+    count = min(count, n) if count else n
+
+    distances = cdist(values, values)
+    # the distance of each scenario to its nearest selected scenario
+    nearest = np.full(n, np.inf)
+    remaining = np.ones(n, dtype=bool)
+    selected = []
+    reference = None
+    while len(selected) < count:
+        candidates = np.flatnonzero(remaining)
+        # the distance of the unselected scenarios, with each candidate added
+        distance = probabilities[candidates].dot(
+            np.minimum(
+                nearest[candidates, None], distances[np.ix_(candidates, candidates)]
+            )
+        )
+        best = distance.argmin()
+        selected.append(candidates[best])
+        remaining[candidates[best]] = False
+        nearest = np.minimum(nearest, distances[:, candidates[best]])
+
+        if reference is None:
+            reference = distance[best]
+        if distance[best] <= tolerance * reference:
+            break
+
+    selected = np.sort(selected)
+    # move the probability of each scenario to its nearest selected scenario
+    assigned = distances[:, selected].argmin(axis=1)
+    reduced = np.bincount(assigned, weights=probabilities, minlength=len(selected))
+    return selected, reduced
+
+
 def construct_simple_scenario_tree(power_system, times, time_stage=None):
     """Construct a simple scenario tree instance"""
 
@@ -114,28 +285,32 @@ def create_problem_with_scenarios(power_system, times):
         raise ValueError("not a valid scenario tree")
 
     gen = power_system.get_generator_with_scenarios()
+    scenario_tree.defineVariableIndexSets(power_system._model)
 
     scenario_instances = {}
 
-    # construct scenario instances
+    # the values of all of the scenarios, read at once
+    scenario_values = gen._get_scenario_array(times)
+
+    # construct scenario instances: the extensive form needs an instance per
+    # scenario, so the problem's instance is the template for the others
+    # and is itself the last scenario's instance
     logging.debug("constructing scenario instances")
+    scenarios = scenario_tree._scenarios
     gc.disable()
-    for s, scenario in enumerate(scenario_tree._scenarios):
-        scenario_instance = power_system._model.clone()
-
-        power = getattr(scenario_instance, "power_{}".format(str(gen)))
-        # set the values of the parameter for this scenario
-        logging.debug("setting scenario values for s%i" % s)
-        scenario_vals = gen._get_scenario_values(times, s=s)
-        for t, time in enumerate(times):
-            power[time] = scenario_vals[t]
-
-        # power.pprint()
-        scenario_instance.preprocess()
-        scenario_instances[scenario._name] = scenario_instance
+    try:
+        for s, scenario in enumerate(scenarios):
+            if s < len(scenarios) - 1:
+                scenario_instance = power_system._model.clone()
+            else:
+                scenario_instance = power_system._model
 
-    gc.enable()
-    scenario_tree.defineVariableIndexSets(power_system._model)
+            # set the values of the parameter for this scenario
+            power = getattr(scenario_instance, "power_{}".format(str(gen)))
+            power.store_values(dict(zip(times, scenario_values[s])))
+            scenario_instances[scenario._name] = scenario_instance
+    finally:
+        gc.enable()
 
     cvar_params = {}
     if user_config.cvar_weight > 0:
@@ -172,9 +347,349 @@ def create_problem_with_scenarios(power_system, times):
     power_system._stochastic_instance = full_problem_instance
     power_system._scenario_tree = scenario_tree
     power_system._scenario_instances = scenario_instances
+    power_system._model_changed()
+    return
+
+
+def create_scenario_instances(power_system, times):
+    """
+    Set up the scenarios to be solved separately by progressive hedging
+    (instead of as one extensive form problem). The scenarios share the
+    problem's instance and differ only in the stochastic generator's
+    power, which is set from the (scenario x time) array of its values
+    before each scenario is solved (see :class:`ScenarioInstances`).
+    The objective gets a penalty on the first stage (status) variables
+    differing from their average over the scenarios.
+    """
+    gen = power_system.get_generator_with_scenarios()
+    probabilities = gen._get_scenario_probabilities(times).values
+    scenario_values = gen._get_scenario_array(times)
+
+    # the first stage variables are the statuses within the commitment
+    # horizon (beyond it the statuses can differ between scenarios)
+    post_horizon = set(times.post_horizon())
+    first_stage = [
+        ComponentUID(status)
+        for status in [
+            g.status(t)
+            for g in power_system.get_generators_controllable()
+            for t in times
+            if t not in post_horizon
+        ]
+        if getattr(status, "is_variable_type", lambda: False)()
+    ]
+
+    logging.debug("constructing scenario instances")
+    _add_hedging_objective(power_system._model, first_stage)
+    scenario_instances = ScenarioInstances(
+        power_system._model,
+        "power_{}".format(str(gen)),
+        list(times),
+        scenario_values,
+        ["s{n}".format(n=s) for s in range(len(scenario_values))],
+    )
+
+    power_system._scenario_instances = scenario_instances
+    power_system._scenario_probabilities = pd.Series(
+        probabilities, index=list(scenario_instances.keys())
+    )
+    power_system._first_stage = first_stage
+    power_system._model_changed()
     return
 
 
+class ScenarioInstances(OrderedDict):
+    """
+    The scenarios of a problem solved by progressive hedging, by name.
+    The scenarios share one instance and differ only in the values of
+    its `power` parameter: a row of the (scenario x time) array `values`
+    for each scenario. Once solved, each scenario is a
+    :class:`ScenarioSolution` of its values.
+    """
+
+    def __init__(self, instance, power, times, values, names):
+        OrderedDict.__init__(self, [(nm, None) for nm in names])
+        self.instance = instance
+        self.power = power
+        self.times = times
+        self.values = values
+        self._positions = dict((nm, s) for s, nm in enumerate(names))
+
+    def set_scenario(self, name):
+        """the instance, with the scenario's power values"""
+        getattr(self.instance, self.power).store_values(
+            dict(zip(self.times, self.values[self._positions[name]]))
+        )
+        return self.instance
+
+    def load(self, name):
+        """the instance, with the scenario's power and solved values"""
+        instance = self.set_scenario(name)
+        for component, values in self[name].values.items():
+            if isinstance(getattr(instance, component), Var):
+                getattr(instance, component).set_values(values, skip_validation=True)
+        return instance
+
+
+class ScenarioSolution(object):
+    """
+    The solved values of a scenario (a dict of the values of each
+    component, by index), looked up like the components of an instance.
+    Other components are those of the shared `instance`.
+    """
+
+    def __init__(self, instance, values):
+        self.instance = instance
+        self.values = values
+
+    def __getattr__(self, name):
+        values = self.__dict__.get("values", {})
+        if name in values:
+            return SolvedValues(values[name])
+        return getattr(self.__dict__["instance"], name)
+
+
+class SolvedValues(dict):
+    """the values of an indexed component (by index)"""
+
+    def extract_values(self):
+        return self
+
+
+def _add_hedging_objective(instance, first_stage):
+    """
+    Add the progressive hedging objective: the scenario's cost plus
+    the weighted and penalized differences of the first stage (binary)
+    variables `u` from their average `xbar`. For a binary variable the
+    penalty term (u - xbar)^2 is linear: u * (1 - 2 * xbar) + xbar^2.
+    """
+    index = list(range(len(first_stage)))
+    instance.ph_weight = Param(index, mutable=True, initialize=0)
+    instance.ph_average = Param(index, mutable=True, initialize=0)
+    instance.ph_rho = Param(mutable=True, initialize=0)
+    status = [cuid.find_component_on(instance) for cuid in first_stage]
+    instance.objective.deactivate()
+    instance.ph_objective = Objective(
+        expr=instance.objective.expr
+        + sum(
+            instance.ph_weight[i] * u
+            + instance.ph_rho
+            / 2.0
+            * (u * (1 - 2 * instance.ph_average[i]) + instance.ph_average[i] ** 2)
+            for i, u in zip(index, status)
+        )
+    )
+
+
+def solve_progressive_hedging(power_system, times):
+    """
+    Solve the scenario instances (see :func:`create_scenario_instances`)
+    by progressive hedging. Each iteration solves every scenario (in a
+    pool of processes), then moves each scenario's weights by the
+    difference of its statuses from the probability weighted average.
+    Once the statuses agree (or the iteration limit is reached), the
+    statuses are fixed and the scenarios are solved once more for their
+    costs. If the statuses still differ, the rounded average statuses
+    are fixed (see :func:`_consensus_candidates` for what is tried
+    when those are infeasible in some scenario).
+
+    The convergence and wall time of each iteration are stored
+    in ``power_system.ph_iterations``.
+    """
+    names = list(power_system._scenario_instances.keys())
+    probability = power_system._scenario_probabilities[names].values
+    n = len(power_system._first_stage)
+    rho = user_config.ph_rho
+
+    weights = np.zeros((len(names), n))
+    average = np.zeros(n)
+    records = []
+    start = time.time()
+
+    with _scenario_pool(power_system) as pool:
+        for iteration in range(user_config.ph_max_iterations):
+            iteration_start = time.time()
+            with instrumentation.phase("progressive hedging iteration"):
+                solutions = _solve_scenarios(
+                    pool, names, weights, average, rho if iteration > 0 else 0
+                )
+            status = np.array([solutions[nm]["status"] for nm in names])
+            average = probability.dot(status)
+            weights += rho * (status - average)
+            convergence = probability.dot(np.abs(status - average).sum(axis=1)) / max(
+                n, 1
+            )
+            records.append(
+                dict(
+                    iteration=iteration,
+                    convergence=convergence,
+                    expected_cost=probability.dot(
+                        [solutions[nm]["cost"] for nm in names]
+                    ),
+                    wall_time=time.time() - iteration_start,
+                )
+            )
+            logging.info(
+                "progressive hedging iteration {i}: convergence={c:0.6f} "
+                "({t:0.2f}s)".format(
+                    i=iteration, c=convergence, t=records[-1]["wall_time"]
+                )
+            )
+            if convergence <= user_config.ph_tolerance:
+                break
+        else:
+            logging.warning(
+                "progressive hedging did not converge in {} iterations".format(
+                    user_config.ph_max_iterations
+                )
+            )
+
+        with instrumentation.phase("progressive hedging final solve"):
+            solutions = _solve_consensus(
+                pool, names, _consensus_candidates(status, probability), average
+            )
+
+    # keep the final solutions of the scenarios
+    # and restore the original objective (e.g. for a resolve)
+    scenario_instances = power_system._scenario_instances
+    for nm in names:
+        scenario_instances[nm] = ScenarioSolution(
+            scenario_instances.instance, solutions[nm]["values"]
+        )
+    scenario_instances.instance.ph_objective.deactivate()
+    scenario_instances.instance.objective.activate()
+
+    power_system.ph_iterations = pd.DataFrame(records).set_index("iteration")
+    power_system.solution_time = time.time() - start
+    power_system.solved = True
+    power_system.objective = probability.dot([solutions[nm]["cost"] for nm in names])
+    return power_system._scenario_instances
+
+
+def _consensus_candidates(status, probability):
+    """
+    The first stage statuses to try fixing in the final solve, in order:
+    the rounded probability weighted average (the consensus, once the
+    scenarios agree), the units committed in any scenario,
+    then each scenario's own statuses (most probable first).
+    """
+    candidates = [probability.dot(status).round(), status.max(axis=0).round()]
+    most_probable = np.argsort(-probability, kind="stable")
+    candidates.extend(status[i].round() for i in most_probable)
+    unique = []
+    for candidate in candidates:
+        if not any(np.array_equal(candidate, u) for u in unique):
+            unique.append(candidate)
+    return unique
+
+
+def _solve_consensus(pool, names, candidates, average):
+    """
+    Solve the scenarios with the first of the `candidates` statuses
+    fixed which is feasible in every scenario.
+    """
+    weights = np.zeros((len(names), len(average)))
+    for i, fixed in enumerate(candidates):
+        try:
+            return _solve_scenarios(pool, names, weights, average, 0, fixed=fixed)
+        except OptimizationError as error:
+            logging.warning(
+                "progressive hedging consensus {} of {} is infeasible ({})".format(
+                    i + 1, len(candidates), error
+                )
+            )
+    raise OptimizationError("no progressive hedging consensus is feasible")
+
+
+# the scenarios of the problem being solved by progressive
+# hedging (inherited by the worker processes when they are forked)
+_hedging_problem = {}
+
+
+@contextmanager
+def _scenario_pool(power_system):
+    """
+    A pool of processes to solve the scenarios in. The workers are forked,
+    so they get a copy of the scenarios' instance without pickling it.
+    Where forking is not available (or there is one process),
+    the scenarios are solved in this process.
+    """
+    _hedging_problem.update(
+        instances=power_system._scenario_instances,
+        first_stage=power_system._first_stage,
+    )
+    processes = user_config.ph_processes or os.cpu_count()
+    processes = min(processes, len(power_system._scenario_instances))
+    try:
+        if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(processes, mp_context=context) as pool:
+                yield pool
+        else:
+            yield None
+    finally:
+        _hedging_problem.clear()
+
+
+def _solve_scenarios(pool, names, weights, average, rho, fixed=None):
+    args = [(nm, weights[i], average, rho, fixed) for i, nm in enumerate(names)]
+    if pool is None:
+        solutions = [_solve_scenario(*a) for a in args]
+    else:
+        solutions = list(pool.map(_solve_scenario, *zip(*args)))
+    return dict(zip(names, solutions))
+
+
+def _solve_scenario(name, weights, average, rho, fixed=None):
+    """
+    Solve a scenario's problem with the progressive hedging weights,
+    average and penalty (or with the first stage variables `fixed`).
+
+    :returns: a dict of the scenario's cost, its first stage values
+        and (if `fixed`) the values of all of its variables
+        and of its power (by component name and index)
+    """
+    scenarios = _hedging_problem["instances"]
+    instance = scenarios.set_scenario(name)
+    status = [
+        cuid.find_component_on(instance) for cuid in _hedging_problem["first_stage"]
+    ]
+    instance.ph_rho = rho
+    for i, u in enumerate(status):
+        instance.ph_weight[i] = weights[i]
+        instance.ph_average[i] = average[i]
+        if fixed is not None:
+            u.fix(fixed[i])
+
+    solver = cooprsolver.SolverFactory(user_config.solver)
+    solver.options.mipgap = user_config.mipgap
+    try:
+        results = solver.solve(instance, load_solutions=False)
+    finally:
+        # without a pool, this is the problem's own instance
+        # (shared by all of the scenarios)
+        if fixed is not None:
+            for u in status:
+                u.unfix()
+    if not detect_status(results, user_config.solver):
+        raise OptimizationError("scenario {} not solved".format(name))
+    _load_solution(instance, results)
+
+    solution = dict(
+        cost=value(instance.objective),
+        status=[value(u) for u in status],
+    )
+    if fixed is not None:
+        solution["values"] = dict(
+            (component.name, component.extract_values())
+            for component in instance.component_objects(Var)
+        )
+        solution["values"][scenarios.power] = getattr(
+            instance, scenarios.power
+        ).extract_values()
+    return solution
+
+
 def get_scenario_based_costs(scenario_tree, scenario_instances):
     # scenario_tree.pprintCosts(scenario_instances)
     costs = dict()
@@ -1,7 +1,17 @@
 """Test the constraint behavior of the bids"""
+import numpy as np
+import pandas as pd
 from minpower.generators import Generator
 from minpower.optimization import value
-from minpower.bidding import parse_polynomial
+from minpower.bidding import (
+    parse_polynomial,
+    BidArrays,
+    is_convex,
+    discretize_range,
+    adaptive_breakpoints,
+    linearization_errors,
+    bid_template,
+)
 from .test_utils import *
 
 
@@ -14,6 +24,9 @@ def parser():
     assert parse_polynomial("6*P - 5 + 7*P^2") == [-5, 6, 7]
     # make sure we can skip the linear term
     assert parse_polynomial("6P") == [0, 6]
+    # the parsed multipliers are cached, but changing them is safe
+    parse_polynomial("6P")[1] = 7
+    assert parse_polynomial("6 P") == [0, 6]
 
 
 @istest
@@ -79,6 +92,7 @@ def cubic_non_convex():
 def coverage():
     """
     Make sure that the bid range covers the whole pmin-pmax range
+    (and zero, for when the unit is off)
     """
     Pd = 221
     a = 5
@@ -96,7 +110,7 @@ def coverage():
     ]
     _, times = solve_problem(generators, **make_loads_times(Pd))
     bid_points = generators[0].bids.discrete_input_points
-    assert pmin == bid_points[0] and pmax == bid_points[-1]
+    assert 0 == bid_points[0] and pmin == bid_points[1] and pmax == bid_points[-1]
 
 
 @istest
@@ -128,5 +142,161 @@ def fixed_costs_when_off():
     assert generators[2].cost(times[0], evaluate=True) == 0
 
 
+@istest
+def pmin_unit_turns_off():
+    """
+    Create a cheap generator and a polynomial cost generator with a pmin.
+    Ensure that the pmin generator is off while the cheap generator can
+    meet the load (its piecewise cost does not force its power to pmin).
+    """
+    generators = [
+        Generator(name="cheap gen", costcurveequation="10P+0.01P^2", pmax=200),
+        make_expensive_gen(costcurveequation="30P+0.01P^2", pmin=50, pmax=200),
+    ]
+    power_system, times = solve_problem(
+        generators, **make_loads_times(Pdt=[80, 150, 250])
+    )
+    assert [value(generators[1].status(t)) for t in times] == [0, 0, 1]
+    assert [value(generators[1].power(t)) for t in times] == [0, 0, 50]
+
+
+@istest
+def stacked_bids():
+    """
+    Create linear, cubic and bid points generators.
+    Ensure that the true and incremental costs evaluated for all of the
+    generators at once match those evaluated for each generator and power.
+    """
+    generators = [
+        Generator(costcurveequation="5+30P"),
+        Generator(costcurveequation="5+30P+0.2P^2+0.1P^3", pmax=300),
+        Generator(
+            bid_points=pd.DataFrame(dict(power=[0, 100, 200], cost=[0, 1000, 3000])),
+            pmax=200,
+        ),
+    ]
+    solve_problem(generators, **make_loads_times(Pd=150))
+    bids = BidArrays([gen.bids for gen in generators])
+    power = np.array([[0, 50, 100, 150, 200.0]] * len(generators))
+
+    assert np.allclose(
+        bids.output_true(power),
+        [[gen.bids.output_true(P) for P in power[0]] for gen in generators],
+    )
+    assert np.allclose(
+        bids.output_incremental(power),
+        [[gen.bids.output_incremental(P) for P in power[0]] for gen in generators],
+    )
+    # the slope at a bid point is that of the lower segment
+    assert bids.output_incremental(power)[2].tolist() == [10, 10, 10, 20, 20]
+
+
+@istest
+def cost_cuts():
+    """
+    Create quadratic and convex bid points generators (and an expensive
+    quadratic generator with a pmin) and solve with and without cost cuts.
+    Ensure that:
+        - the costs are modeled by cuts
+        - the objective, commitment and dispatch are the same
+          (the pmin generator is only on when it is needed)
+        - non-convex costs are not modeled by cuts
+    """
+    results = dict()
+    for cuts in [True, False]:
+        user_config.cost_cuts = cuts
+        generators = [
+            Generator(costcurveequation="5+20P+0.05P^2", pmax=100),
+            Generator(
+                bid_points=pd.DataFrame(
+                    dict(power=[0, 50, 100], cost=[0, 1000, 3000])
+                ),
+                pmax=100,
+            ),
+            Generator(costcurveequation="40P+0.05P^2", pmin=50, pmax=100),
+        ]
+        power_system, times = solve_problem(
+            generators, **make_loads_times(Pdt=[50, 120, 230])
+        )
+        assert [gen.bids.cuts is not None for gen in generators] == [cuts] * 3
+        assert [value(generators[2].status(t)) for t in times] == [0, 0, 1]
+        results[cuts] = dict(
+            objective=round(power_system.objective, 4),
+            power=[
+                [round(value(gen.power(t)), 4) for t in times] for gen in generators
+            ],
+        )
+    user_config.cost_cuts = False
+
+    assert results[True] == results[False]
+    assert not is_convex(np.array([0, 50, 100.0]), np.array([0, 1500, 2500.0]))
+
+
+@istest
+def adaptive_breakpoint_error():
+    """
+    Linearize a quadratic and a cubic with adaptive breakpoints.
+    Ensure that:
+        - the errors are within the tolerance
+        - the quadratic uses the fewest (evenly spaced) segments
+        - the cubic uses fewer breakpoints than even spacing needs
+    """
+    tolerance = 1.0
+    quadratic = [0, 20, 0.05]
+    points = adaptive_breakpoints(quadratic, 0, 100, tolerance)
+    assert linearization_errors(quadratic, points).max() <= tolerance
+    # the error of a segment of length h is 0.05 h^2 / 4
+    assert len(points) - 1 == int(np.ceil(100 / np.sqrt(4 * tolerance / 0.05)))
+    assert np.allclose(np.diff(points), np.diff(points)[0])
+
+    cubic = [0, 20, 0.01, 0.0003]
+    points = adaptive_breakpoints(cubic, 10, 500, tolerance)
+    assert points[0] == 10 and points[-1] == 500
+    assert linearization_errors(cubic, points).max() <= tolerance
+    even = discretize_range(len(points), 10, 500)
+    assert linearization_errors(cubic, even).max() > tolerance
+
+    user_config.breakpoint_error = tolerance
+    generators = [
+        Generator(costcurveequation="5+20P+0.01P^2+0.0003P^3", pmin=10, pmax=500)
+    ]
+    solve_problem(generators, **make_loads_times(Pd=221))
+    assert generators[0].bids.discrete_input_points == [0] + points
+    assert generators[0].bids.linearization_error <= tolerance
+
+
+@istest
+def shared_bid_templates():
+    """
+    Create generators with the same cost curve and one with different limits.
+    Ensure that the identical curves share their linearization.
+    """
+    generators = [
+        Generator(costcurveequation="5+30P+0.2P^2", pmax=100),
+        Generator(costcurveequation="5 + 30P + 0.2P^2", pmax=100),
+        Generator(costcurveequation="5+30P+0.2P^2", pmax=200),
+    ]
+    bid_template.cache_clear()
+    solve_problem(generators, **make_loads_times(Pd=150))
+    # two templates were made, and the second bid used the first's
+    cache = bid_template.cache_info()
+    assert (cache.misses, cache.hits, cache.currsize) == (2, 1, 2)
+
+    templates = [
+        bid_template(
+            tuple([0] + gen.cost_coeffs[1:]),
+            gen.pmin,
+            gen.pmax,
+            gen.cost_breakpoints,
+            user_config.breakpoint_error,
+        )
+        for gen in generators
+    ]
+    assert bid_template.cache_info().misses == 2
+    assert templates[0] is templates[1]
+    assert templates[0] is not templates[2]
+    assert generators[0].bids.discrete_input_points == list(templates[0].points)
+
+
 if __name__ == "__main__":
     nose.runmodule(argv=[__file__, "-vvs", "-x", "--pdb", "--pdb-failure"], exit=False)
@@ -1,6 +1,23 @@
 from minpower.tests.test_utils import user_config, istest, with_setup, reset_config
-from minpower.get_data import parsedir
+from minpower.get_data import (
+    parsedir,
+    setup_scenarios,
+    setup_initialcond,
+    build_class_list,
+    setup_times,
+    compile_case,
+    _load_bundle,
+    _parse_scenario_day,
+)
+from minpower import get_data
+from minpower.generators import Generator, Generator_nonControllable
+from minpower.powersystems import Line
+from minpower.schedule import TimeIndex
+from minpower.stochastic import reduce_scenarios, ScenarioStore
 import os
+import shutil
+import tempfile
+import pandas as pd
 
 
 basedir = os.path.split(__file__)[0]
@@ -13,3 +30,210 @@ def check_pmin():
     generators, loads, _, times, _, data = parsedir()
 
     assert data["generators"].pmin.tolist() == [gen.pmin for gen in generators]
+
+
+@istest
+def scenario_reduction_merges_nearest():
+    """
+    Reduce three scenarios (two of them the same) to two. Ensure that
+    the duplicate is dropped and its probability moved to its twin.
+    """
+    values = [[0, 0], [0, 0], [10, 10]]
+    selected, probability = reduce_scenarios(values, [0.25, 0.25, 0.5], count=2)
+    assert len(selected) == 2 and selected[-1] == 2
+    assert probability.tolist() == [0.5, 0.5]
+
+
+@istest
+@with_setup(teardown=reset_config)
+def scenario_reduction_from_file():
+    """
+    Read a day of wind scenarios, reduced to five.
+    Ensure that the scenarios are renumbered and the
+    probabilities of all of the scenarios are kept.
+    """
+    user_config.scenario_reduction = True
+    user_config.scenarios = 5
+    filename = os.path.join(
+        basedir, "uc-stochastic-rolling", "wind_scenarios", "scenarios-2010-01-01.csv"
+    )
+    data = _parse_scenario_day(filename)
+    reset_config()
+
+    assert data.index.tolist() == list(range(5))
+    assert round(data.probability.sum(), 10) == 1
+    assert data.columns[0] == "probability"
+
+
+@istest
+@with_setup(teardown=reset_config)
+def scenario_store():
+    """
+    Read the scenarios of a stochastic case.
+    Ensure that each day's values and probabilities are in the store,
+    and that the store is the same after saving and loading it
+    (and after converting it to and from a DataFrame).
+    """
+    user_config.directory = os.path.join(basedir, "uc-stochastic-rolling")
+    user_config.scenarios_directory = ""
+    store = parsedir()[4]
+    reset_config()
+    day = store.days[0]
+
+    assert store.shape == (2, 365, 24)
+    assert round(store.probabilities_for(day).sum(), 10) == 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, "scenarios")
+        store.save(prefix)
+        loaded = ScenarioStore.load(prefix)
+        assert loaded.days == store.days
+        assert (loaded.values_for(day) == store.values_for(day)).all()
+
+    from_frame = ScenarioStore.from_frame(store.to_frame())
+    assert (from_frame.values_for(day, 3) == store.values_for(day, 3)).all()
+
+
+@istest
+@with_setup(teardown=reset_config)
+def scenario_files_for_times():
+    """
+    Read the scenarios for the first day of a two day scenarios directory,
+    parsing the files in this process and in a pool of processes.
+    Ensure that only the day in the times is read, and that
+    the scenarios are the same either way.
+    """
+    user_config.directory = os.path.join(basedir, "uc-stochastic-rolling")
+    gen_data = pd.DataFrame(dict(scenariosdirectory=["wind_scenarios"]))
+    times = TimeIndex(pd.date_range("2010-01-01", periods=24, freq="H"))
+    stores = []
+    for processes in [1, 2]:
+        user_config.scenario_processes = processes
+        stores.append(setup_scenarios(gen_data, [Generator()], times))
+
+    day = pd.Timestamp("2010-01-01").date()
+    assert [store.days for store in stores] == [[day], [day]]
+    assert (stores[0].values_for(day) == stores[1].values_for(day)).all()
+
+
+@istest
+@with_setup(teardown=reset_config)
+def build_from_columns():
+    """
+    Build generators and lines from frames with missing values
+    and initial conditions (out of order) for some generators.
+    Ensure that:
+        - each row gets its own values and model
+        - fields not in the model raise an error, unless they are empty
+    """
+    times = TimeIndex(pd.date_range("2010-01-01", periods=2, freq="H"))
+    data = pd.DataFrame(
+        dict(
+            name=["a", "b", "c"],
+            pmax=[100, None, 300],
+            power=[None, 20, None],
+            costcurveequation=["10P", "20P", None],
+            badfield=[None, None, None],
+        )
+    )
+    generators = build_class_list(data, Generator, times)
+    assert [gen.pmax for gen in generators][::2] == [100, 300]
+    assert isinstance(generators[1], Generator_nonControllable)
+    assert [gen.index for gen in generators] == [0, 1, 2]
+
+    setup_initialcond(
+        pd.DataFrame(dict(name=["c", "a"], power=[150, 50], status=[1, None])),
+        generators,
+        times,
+    )
+    assert [(gen.initial_power, gen.initial_status) for gen in generators[::2]] == [
+        (50, 1),
+        (150, 1),
+    ]
+
+    lines = pd.DataFrame(dict(frombus=["A"], tobus=["B"], color=["red"]))
+    try:
+        build_class_list(lines, Line)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("an invalid field should raise an error")
+
+
+@istest
+@with_setup(teardown=reset_config)
+def compiled_case():
+    """
+    Compile a copy of the rolling UC case and load it.
+    Ensure that:
+        - the compiled case loads the same tables, generators and timeseries
+        - the case is not pickled (the arrays load without pickle)
+        - a change to a schedule file (or to the minpower version)
+          makes the compiled case out of date
+    """
+    directory = tempfile.mkdtemp()
+    case = os.path.join(basedir, "uc-rolling")
+    for filename in os.listdir(case):
+        if filename.endswith(".csv") and not filename.startswith("commitment"):
+            shutil.copy(os.path.join(case, filename), directory)
+    user_config.directory = directory
+    generators, _, _, times, _, data = parsedir()
+
+    compile_case()
+    bundle = _load_bundle()
+    assert bundle is not None
+    for df, compiled_df in zip(get_data._load_raw_data(), bundle["raw"]):
+        pd.testing.assert_frame_equal(df, compiled_df, check_index_type=False)
+    assert not [nm for nm in os.listdir(directory) if nm.endswith(".pkl")]
+    compiled_generators, _, _, compiled_times, _, compiled_data = parsedir()
+    assert [gen.pmax for gen in generators] == [
+        gen.pmax for gen in compiled_generators
+    ]
+    assert (times.strings == compiled_times.strings).all()
+    pd.testing.assert_frame_equal(data["timeseries"], compiled_data["timeseries"])
+
+    version = get_data.__version__
+    get_data.__version__ = "0.0.0"
+    try:
+        assert _load_bundle() is None
+    finally:
+        get_data.__version__ = version
+
+    with open(os.path.join(directory, "ireland_load_fewdays.csv"), "a") as f:
+        f.write("\n")
+    assert _load_bundle() is None
+    shutil.rmtree(directory)
+
+
+@istest
+@with_setup(teardown=reset_config)
+def wide_schedule_file():
+    """
+    Read the schedules of two loads from one file with a column for each
+    and of two generators from the same single column file.
+    Ensure that each unit gets its own schedule.
+    """
+    directory = tempfile.mkdtemp()
+    user_config.directory = directory
+    times = pd.date_range("2011-01-01 01:00", periods=3, freq="H")
+    pd.DataFrame(dict(north=[1, 2, 3], south=[4, 5, 6]), index=times).to_csv(
+        os.path.join(directory, "loads-wide.csv")
+    )
+    pd.DataFrame(dict(power=[7, 8, 9]), index=times).to_csv(
+        os.path.join(directory, "wind.csv")
+    )
+    loads_data = pd.DataFrame(
+        dict(name=["south", "north"], schedulefilename=["loads-wide.csv"] * 2)
+    )
+    generators_data = pd.DataFrame(
+        dict(name=["w1", "w2"], schedulefilename=["wind.csv"] * 2)
+    )
+    timeseries, times, generators_data, loads_data = setup_times(
+        generators_data, loads_data
+    )
+    shutil.rmtree(directory)
+
+    assert loads_data.schedulename.tolist() == ["d0", "d1"]
+    assert timeseries.d0.tolist() == [4, 5, 6]
+    assert timeseries.d1.tolist() == [1, 2, 3]
+    assert timeseries.g0.tolist() == timeseries.g1.tolist() == [7, 8, 9]
@@ -11,6 +11,7 @@ from pandas.testing import assert_series_equal
 from minpower.generators import Generator_nonControllable, Generator_Stochastic
 from minpower.optimization import value
 from minpower.schedule import TimeIndex
+from pyomo import environ as pyomo
 from .test_utils import *
 
 
@@ -577,3 +578,60 @@ def final_min_down_time():
         pd.Series([0, 0, 1], index=times.strings),
         generators[1].values("status").astype(int),
     )
+
+
+@istest
+def fleet_formulation():
+    """
+    The fleet formulation should give the same solution as
+    the per-generator formulation, with fewer model components.
+    """
+
+    def make_generators():
+        return [
+            make_cheap_gen(pmax=100, rampratemax=40, rampratemin=-40),
+            make_mid_gen(pmin=20, pmax=200, minuptime=2, startupcost=50),
+            make_expensive_gen(pmin=10, shutdowncost=10),
+        ]
+
+    initial = [{"power": 80}, {"status": 0}, {"power": 10}]
+    Pdt = [90, 150, 210, 120, 90]
+
+    generators = make_generators()
+    power_system, times = solve_problem(
+        generators, gen_init=initial, **make_loads_times(Pdt=Pdt)
+    )
+
+    user_config.fleet_formulation = True
+    fleet_generators = make_generators()
+    fleet_system, times = solve_problem(
+        fleet_generators, gen_init=initial, **make_loads_times(Pdt=Pdt)
+    )
+
+    assert fleet_system.fleet is not None
+    assertAlmostEqual(fleet_system.objective, power_system.objective)
+    for gen, fleet_gen in zip(generators, fleet_generators):
+        assert_series_equal(gen.values("status"), fleet_gen.values("status"))
+        assert_series_equal(gen.values("power"), fleet_gen.values("power"))
+
+    count_constraints = lambda ps: len(
+        list(ps._model.component_objects(pyomo.Constraint))
+    )
+    assert count_constraints(fleet_system) < count_constraints(power_system)
+
+
+@istest
+def cached_variables_after_reset():
+    """
+    Look up a generator's variables, then reset and rebuild the model.
+    Ensure that the lookups return the new model's variables.
+    """
+    generators = [make_cheap_gen(), make_expensive_gen()]
+    power_system, times = solve_problem(generators, **make_loads_times(Pdt=[90, 150]))
+    gen = generators[0]
+    assert gen.power(times[0]) is gen.power(times[0])
+
+    power_system.reset_model()
+    solve.create_problem(power_system, times)
+    power = power_system._model.component("power_{}".format(gen))
+    assert gen.power(times[0]) is power[str(times[0])]
@@ -3,12 +3,21 @@ A selection of integration tests. These are designed to find failures that
 the unit tests don't pick up.
 """
 import os
+import threading
 import nose
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
 from nose.tools import istest
 from pandas.testing import assert_frame_equal, assert_series_equal
 
+from minpower import instrumentation
 from minpower.solve import solve_problem as solve_dir
 from minpower.config import user_config
+from minpower.schedule import TimeIndex
+from minpower.stochastic import ScenarioStore
+from minpower.standalone import put_data
+from minpower.get_data import _stage_timeseries, _stage_scenarios
 from .test_utils import reset_config, with_setup
 
 
@@ -90,6 +99,147 @@ def run_uc_rolling():
     run_case("uc-rolling")
 
 
+@istest
+@with_setup(teardown=reset_config)
+def run_uc_rolling_warmstart():
+    cold = run_case("uc-rolling")
+    warm = run_case("uc-rolling", warmstart=True)
+    assert round(warm.objective, 1) == round(cold.objective, 1)
+    # every stage after the first is warm started
+    assert not warm.stage_solve_times.warmstart.iloc[0]
+    assert warm.stage_solve_times.warmstart.iloc[1:].all()
+
+
+@istest
+@with_setup(teardown=reset_config)
+def run_uc_rolling_standalone():
+    sln = run_case("uc-rolling")
+    standalone = run_case("uc-rolling", standalone=True)
+    os.remove(user_config.store_filename)
+    status = standalone.generators_status.loc[sln.generators_status.index]
+    assert_frame_equal(status, sln.generators_status, check_dtype=False)
+
+
+@istest
+@with_setup(teardown=reset_config)
+def run_uc_rolling_standalone_restart():
+    """
+    Interrupt a standalone rolling UC while it stores its last stage
+    (after the power and status, before the solve time) and restart it.
+    Ensure that the stage's rows are not stored twice and that restarting
+    once every stage is stored changes nothing.
+    """
+    standalone = run_case("uc-rolling", standalone=True)
+    power = standalone.generators_power.copy()
+    storage = pd.HDFStore(user_config.store_filename)
+    stages = len(storage["solve_time"])
+    for name in ["mipgap", "solve_time"]:
+        storage.remove(name, where="index == {}".format(stages - 1))
+    storage.close()
+
+    for _ in range(2):
+        restarted = run_case("uc-rolling", standalone=True, standalone_restart=True)
+        assert len(restarted.mipgaps) == stages
+        assert not restarted.generators_power.index.duplicated().any()
+        assert_frame_equal(restarted.generators_power, power)
+    os.remove(user_config.store_filename)
+
+
+@istest
+def standalone_stage_data():
+    """
+    Store a three day timeseries and scenarios as the standalone mode does.
+    Ensure that a stage reads just its own rows and day of scenarios.
+    """
+    times = TimeIndex(pd.date_range("2020-01-01", periods=72, freq="H"))
+    timeseries = pd.DataFrame(
+        dict(d0=np.arange(72.0), g2=np.arange(72.0) * 2), index=times.strings.values
+    )
+    days = OrderedDict(
+        (
+            day.date(),
+            pd.DataFrame(np.full((2, 24), d), columns=list(range(24))).assign(
+                probability=[0.4, 0.6]
+            ),
+        )
+        for d, day in enumerate(pd.date_range("2020-01-01", periods=3))
+    )
+    scenarios = ScenarioStore.from_days(days)
+
+    filename = os.path.join(this_directory, "stage-data.hd5")
+    storage = pd.HDFStore(filename)
+    put_data(storage, "data_timeseries", timeseries)
+    put_data(storage, "data_scenario_values", scenarios.to_frame())
+
+    stage = times.subdivide(24, 0)[1]
+    stage_timeseries = _stage_timeseries(storage, stage)
+    stage_scenarios = _stage_scenarios(storage, stage)
+    storage.close()
+    os.remove(filename)
+
+    assert_frame_equal(stage_timeseries, timeseries.iloc[24:48])
+    assert stage_scenarios.days == [stage.Start.date()]
+    assert (stage_scenarios.values_for(stage.Start.date()) == 1).all()
+    assert stage_scenarios.probabilities_for(stage.Start.date()).tolist() == [0.4, 0.6]
+
+
+@istest
+@with_setup(teardown=reset_config)
+def run_uc_rolling_phase_times():
+    sln = run_case("uc-rolling", phase_times=True)
+    filename = os.path.join(this_directory, "uc-rolling", "phase-times.csv")
+    phase_times = pd.read_csv(filename)
+    os.remove(filename)
+
+    stages = phase_times.stage.dropna().unique()
+    assert len(stages) == len(sln.stage_solve_times)
+    for stage in stages:
+        phases = set(phase_times.phase[phase_times.stage == stage])
+        assert {
+            "create variables",
+            "create constraints",
+            "solve/write problem and read results",
+            "solve/solver",
+            "solve/load solution",
+            "make solution",
+        }.issubset(phases)
+    assert "parse data" in set(phase_times.phase)
+    assert (phase_times.wall_time >= 0).all()
+    # the stages are solved one after another, on one thread
+    assert not phase_times.overlapped.any()
+
+
+@istest
+def phase_times_overlapping_threads():
+    """
+    Record a phase on a worker thread while a main thread phase is open.
+    Ensure that both are marked as overlapped (their peak memory is shared)
+    and that a later phase is not.
+    """
+    instrumentation.reset()
+
+    def worker():
+        instrumentation.set_stage(1)
+        with instrumentation.phase("build"):
+            pass
+
+    with instrumentation.phase("solve"):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    with instrumentation.phase("write output"):
+        pass
+
+    phase_times = instrumentation.phase_times().set_index("phase")
+    instrumentation.reset()
+    assert phase_times.overlapped.to_dict() == {
+        "build": True,
+        "solve": True,
+        "write output": False,
+    }
+    assert phase_times.stage.loc["build"] == 1
+
+
 @istest
 def run_ed():
     run_case("ed")
@@ -117,5 +117,98 @@ def three_buses():
     assert num_lmps > 1
 
 
+@istest
+@with_setup(get_duals, reset_config)
+def ptdf_formulation():
+    """
+    Create the three bus system (with congestion) and solve it
+    with the bus angle and PTDF formulations of the power flow.
+    Ensure that:
+        - the line flows, LMPs and congestion prices are the same
+        - only the lines with limits are monitored in the PTDF formulation
+    """
+    results = dict()
+    for ptdf in [True, False]:
+        user_config.ptdf_formulation = ptdf
+        generators = [
+            make_cheap_gen(bus="A"),
+            make_mid_gen(bus="B"),
+            make_expensive_gen(bus="C"),
+        ]
+        loads = [
+            powersystems.Load(schedule=Series(Pd, singletime), bus=bus)
+            for Pd, bus in [(105, "A"), (225, "B"), (302, "C")]
+        ]
+        lines = [
+            powersystems.Line(frombus="A", tobus="B"),
+            powersystems.Line(frombus="A", tobus="C", pmax=50),
+            powersystems.Line(frombus="B", tobus="C", pmax=50),
+        ]
+        power_system, times = solve_problem(
+            generators, do_reset_config=False, times=singletime, loads=loads, lines=lines
+        )
+        t = times[0]
+        results[ptdf] = dict(
+            flows=[round(value(line.power(t)), 6) for line in lines],
+            lmps=[b.price(t) for b in power_system.buses],
+            congestion=[line.price(t) for line in lines],
+        )
+        if ptdf:
+            assert [line.monitored for line in lines] == [False, True, True]
+
+    assert results[True] == results[False]
+
+
+@istest
+@with_setup(get_duals, reset_config)
+def lazy_line_limits():
+    """
+    Solve the three bus system (with congestion) with and without
+    lazy line limits, in both power flow formulations.
+    Ensure that:
+        - the objective, line flows and LMPs are the same
+        - only the lines over their limits get limit constraints
+    """
+    for ptdf in [False, True]:
+        results = dict()
+        for lazy in [True, False]:
+            user_config.ptdf_formulation = ptdf
+            user_config.lazy_line_limits = lazy
+            generators = [
+                make_cheap_gen(bus="A"),
+                make_mid_gen(bus="B"),
+                make_expensive_gen(bus="C"),
+            ]
+            loads = [
+                powersystems.Load(schedule=Series(Pd, singletime), bus=bus)
+                for Pd, bus in [(105, "A"), (225, "B"), (302, "C")]
+            ]
+            lines = [
+                powersystems.Line(frombus="A", tobus="B"),
+                powersystems.Line(frombus="A", tobus="C", pmax=50),
+                powersystems.Line(frombus="B", tobus="C", pmax=50),
+            ]
+            power_system, times = solve_problem(
+                generators,
+                do_reset_config=False,
+                times=singletime,
+                loads=loads,
+                lines=lines,
+            )
+            t = times[0]
+            results[lazy] = dict(
+                objective=round(power_system.objective, 6),
+                flows=[round(value(line.power(t)), 6) for line in lines],
+                lmps=[b.price(t) for b in power_system.buses],
+            )
+            if lazy:
+                assert len(lines[0].limited_times) == 0
+                assert any(len(line.limited_times) for line in lines[1:])
+
+        assert results[True] == results[False]
+    user_config.lazy_line_limits = False
+    user_config.ptdf_formulation = False
+
+
 def test_config_cleared():
     assert user_config.duals == False
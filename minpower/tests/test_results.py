@@ -1,3 +1,4 @@
+import pandas as pd
 from .test_utils import *
 from minpower.results import make_solution
 
@@ -22,3 +23,43 @@ def check_power_status():
     assert sln.generators_power.loc[t0, "g0"] == value(generators[0].power(times[0]))
 
     assert sln.generators_status.loc[t0, "g1"] == value(generators[1].status(times[0]))
+
+
+@istest
+@with_setup(teardown=reset_config)
+def check_costs():
+    """
+    Solve a UC with a startup cost and a nonlinear cost curve.
+    Ensure that the solution's cost frames match
+    the costs evaluated at each time.
+    """
+    generators = [
+        make_cheap_gen(pmax=100),
+        make_expensive_gen(
+            costcurveequation="200 + 20P + 0.1P^2", pmax=100, startupcost=500
+        ),
+    ]
+    power_system, times = solve_problem(
+        generators, **make_loads_times(Pdt=[80, 150, 130])
+    )
+    sln = make_solution(power_system, times)
+
+    for t, time in zip(sln.generators_power.index, times):
+        for gen in generators:
+            name = str(gen)
+            assert sln.totalcost_generation.loc[t, name] == value(
+                gen.cost(time, evaluate=True)
+            )
+            assert sln.fuelcost.loc[t, name] == value(
+                gen.operatingcost(time, evaluate=True)
+            )
+            incremental = gen.incrementalcost(time)
+            if incremental is None:
+                assert pd.isnull(sln.incremental_cost.loc[t, name])
+            else:
+                assert round(sln.incremental_cost.loc[t, name], 6) == round(
+                    incremental, 6
+                )
+    assert round(sln.fuelcost_true, 6) == round(
+        sum(gen.truecost(time) for gen in generators for time in times), 6
+    )
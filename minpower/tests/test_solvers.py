@@ -88,3 +88,66 @@ def gurobi():
     """Test the gurobi solver on a simple problem"""
     if "gurobi" in config.available_solvers:
         assert run_one_solver("gurobi")
+
+
+@istest
+def persistent_fallback():
+    """A solver without a persistent interface should fall back to problem files"""
+    orig_config = user_config.copy()
+    user_config.persistent_solver = True
+    prob = simple_problem()
+    prob.solve()
+    user_config.update(orig_config)
+    assert prob.solved
+    assert not prob._persistent_solver
+
+
+@istest
+def persistent_resolve():
+    """
+    Resolves with a persistent solver only send the changes to the model,
+    but should get the same solutions.
+    """
+    if "gurobi" not in config.available_solvers:
+        return
+    orig_config = user_config.copy()
+    user_config.solver = "gurobi"
+    user_config.persistent_solver = True
+    user_config.duals = False
+
+    prob = simple_problem()
+    prob.solve()
+    assert prob._persistent_solver
+    assertAlmostEqual(prob.objective, -8)
+
+    # add a constraint
+    x = prob.get_component("x")
+    prob.add_constraint("limit", x <= 1)
+    prob.solve()
+    assertAlmostEqual(prob.objective, -4)
+
+    # remove a constraint and fix a variable
+    prob._remove_component("limit")
+    x.fix(0.5)
+    prob.solve()
+    user_config.update(orig_config)
+    assertAlmostEqual(prob.objective, -2)
+
+
+@istest
+def persistent_duals():
+    """The fixed-integer LP resolve for duals should work with a persistent solver"""
+    if "gurobi" not in config.available_solvers:
+        return
+    orig_config = user_config.copy()
+    user_config.solver = "gurobi"
+    user_config.persistent_solver = True
+    user_config.duals = True
+    generators = [make_cheap_gen(pmax=100), make_mid_gen(pmax=20), make_expensive_gen()]
+    power_system, times = solve_problem(
+        generators, do_reset_config=False, **make_loads_times(Pdt=[80, 110, 130])
+    )
+    assert power_system._persistent_solver
+    lmps = [power_system.buses[0].price(t) for t in times]
+    user_config.update(orig_config)
+    assert lmps == [gen_costs["cheap"], gen_costs["mid"], gen_costs["expensive"]]
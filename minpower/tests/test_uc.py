@@ -1,6 +1,10 @@
 """Test the higher level behavior of the unit commitment"""
+import gc
 import random
+from collections import Counter
 from minpower.generators import Generator
+from pyomo.core.base.component import ComponentBase
+import numpy as np
 import pandas as pd
 from pandas.testing import assert_series_equal
 from .test_utils import *
@@ -64,6 +68,36 @@ def load_shedding():
     assert price_t1 == user_config.cost_load_shedding
 
 
+@istest
+@with_setup(teardown=reset_config)
+def load_shedding_prebuilt():
+    """
+    Create the shedding variables with the problem.
+    Create a load that exceeds the generator limit at t1
+    and a reserve requirement that can't be met.
+    Ensure that:
+    * the problem is not rebuilt for shedding
+    * Pshedt1 = Pdt1 - pmax
+    * the shedding limits are restored afterwards
+    """
+    user_config.prebuilt_shedding = True
+    user_config.reserve_fixed = 10.0
+    pmax = 100
+    Pdt1 = 211
+    generators = [make_cheap_gen(pmax=pmax)]
+    power_system, times = solve_problem(
+        generators, do_reset_config=False, **make_loads_times(Pdt=[90, Pdt1, 90])
+    )
+    load = power_system.loads()[0]
+    assert not power_system.shedding_mode
+    assert load.power(times[1], evaluate=True) == pmax
+    assert load.shed(times[1], evaluate=True) == Pdt1 - pmax
+    assert load.shed(times[0], evaluate=True) == 0
+
+    power_system.disallow_shedding()
+    assert all(load.shed(t).ub == 0 for t in times)
+
+
 @istest
 @with_setup(teardown=reset_config)
 def reserve_fixed_amount():
@@ -133,3 +167,180 @@ def startup_ramprate_default():
         pd.Series([0.0, 100.0, 0.0], index=times.times),
         generators[1].values("power", times.times),
     )
+
+
+def count_pyomo_objects():
+    gc.collect()
+    return Counter(
+        type(obj).__name__ for obj in gc.get_objects() if isinstance(obj, ComponentBase)
+    )
+
+
+@istest
+def rolling_memory_released():
+    """
+    Run a 30 day rolling unit commitment, one stage at a time (as in standalone mode).
+    Ensure that each stage's model is released:
+    the number of pyomo objects is the same after every stage
+    as it was before the first stage.
+    """
+    generators = [
+        make_cheap_gen(pmax=100),
+        make_mid_gen(pmax=80, minuptime=3, startupcost=50),
+        make_expensive_gen(),
+    ]
+    for g, gen in enumerate(generators):
+        gen.index = g
+        gen.set_initial_condition()
+    rng = random.Random(0)
+    loads_times = make_loads_times(Pdt=[rng.randrange(50, 200) for i in range(720)])
+    power_system = powersystems.PowerSystem(generators, loads_times["loads"], [])
+    stage_times = loads_times["times"].subdivide(24, 0)
+    assert len(stage_times) == 30
+
+    initial_count = count_pyomo_objects()
+    counts = []
+    for stg, t_stage in enumerate(stage_times):
+        sln = solve.create_solve_problem(power_system, t_stage, stage_number=stg)
+        del sln
+        solve._next_stage(power_system, stage_times, stg)
+        counts.append(count_pyomo_objects())
+
+    assert all(count == initial_count for count in counts)
+
+
+@istest
+@with_setup(teardown=reset_config)
+def rolling_pipelined():
+    """
+    Run a rolling unit commitment with min up/down times, ramp limits
+    and startup costs, with the next stage built while the current stage
+    is solved. Ensure that the stage costs are the same as when the
+    stages are built and solved one after another.
+    """
+    objectives = _pipelined_objectives(hours=96)
+    assert len(objectives[True]) == 4
+    assert objectives[True] == objectives[False]
+
+
+@istest
+@with_setup(teardown=reset_config)
+def rolling_pipelined_many_stages():
+    """
+    Run a pipelined rolling unit commitment with many short stages, so that
+    the next stage is built on the worker thread many times over.
+    Ensure that the stage costs are the same as when the
+    stages are built and solved one after another.
+    """
+    user_config.hours_commitment = 4
+    objectives = _pipelined_objectives(hours=120)
+    assert len(objectives[True]) == 30
+    assert objectives[True] == objectives[False]
+
+
+def _pipelined_objectives(hours):
+    """the stage objectives of a rolling UC, solved with and without pipelining"""
+    # (some random loads are infeasible with these ramp limits)
+    rng = random.Random(0)
+    Pdt = [rng.randrange(50, 200) for i in range(hours)]
+    objectives = dict()
+    for pipeline in [True, False]:
+        user_config.pipeline_stages = pipeline
+        generators = [
+            make_cheap_gen(pmax=100, rampratemax=40, rampratemin=-40),
+            make_mid_gen(pmax=80, minuptime=3, mindowntime=2, startupcost=50),
+            make_expensive_gen(mindowntime=4, shutdowncost=10),
+        ]
+        for g, gen in enumerate(generators):
+            gen.index = g
+            gen.set_initial_condition()
+        loads_times = make_loads_times(Pdt=Pdt)
+        power_system = powersystems.PowerSystem(generators, loads_times["loads"], [])
+        stage_solutions, stage_times = solve.solve_multistage(
+            power_system, loads_times["times"]
+        )
+        objectives[pipeline] = [round(sln.objective, 2) for sln in stage_solutions]
+    return objectives
+
+
+@istest
+@with_setup(teardown=reset_config)
+def progressive_hedging():
+    """
+    Run a stochastic unit commitment with two wind scenarios by
+    progressive hedging. With low wind the peaker must be on, with
+    high wind it would rather be off. Ensure that the scenarios
+    converge to a common commitment (peaker on), with both the
+    serial and the parallel (process pool) scenario solves, and that
+    the solution's expected cost is the objective.
+    """
+    from minpower.generators import Generator_Stochastic
+    from minpower.stochastic import ScenarioStore
+    from minpower.results import make_solution
+
+    user_config.progressive_hedging = True
+    user_config.ph_rho = 50
+    times = schedule.make_times_basic(N=4)
+    scenarios = pd.DataFrame(
+        {"probability": [0.5, 0.5], 0: [60, 10], 1: [60, 10], 2: [60, 10], 3: [60, 10]}
+    )
+    for processes in [1, 2]:
+        user_config.ph_processes = processes
+        generators = [
+            make_cheap_gen(pmax=100),
+            make_expensive_gen(pmin=20, pmax=100, startupcost=200),
+            Generator_Stochastic(
+                name="wind",
+                pmax=100,
+                scenario_values=ScenarioStore.from_days(
+                    {times.Start.date(): scenarios}
+                ),
+            ),
+        ]
+        for g, gen in enumerate(generators):
+            gen.index = g
+            gen.set_initial_condition()
+        loads = [powersystems.Load(schedule=pd.Series(150, index=times.strings.values))]
+        power_system = powersystems.PowerSystem(generators, loads, [])
+        solve.create_problem(power_system, times)
+        power_system.solve_problem(times)
+
+        assert power_system.ph_iterations.convergence.iloc[-1] == 0
+        for s in power_system._scenario_instances:
+            assert [value(generators[1].status(t, s)) for t in times] == [1] * 4
+        # the final solve's fixed statuses are released
+        assert not any(generators[1].status(t).fixed for t in times)
+        # low wind: 100MW cheap, 40MW expensive; high wind: 70MW, 20MW
+        assert round(power_system.objective, 2) == 0.5 * 4 * (
+            (100 * 10 + 40 * 30) + (70 * 10 + 20 * 30)
+        )
+
+        sln = make_solution(power_system, times)
+        assert sln.expected_power["g0"].tolist() == [85] * 4
+        assert round(sln.expected_totalcost.sum().sum(), 2) == round(
+            power_system.objective, 2
+        )
+
+        # the scenarios share one instance, which can be loaded
+        # with a scenario's values (e.g. to resolve it)
+        power_system._scenario_instances.load("s1")
+        assert [value(generators[2].power_available(t)) for t in times] == [10] * 4
+        assert [value(generators[0].power(t)) for t in times] == [100] * 4
+
+
+@istest
+def progressive_hedging_consensus():
+    """
+    Without agreement, the final solve fixes the rounded probability
+    weighted average statuses before those committed in any scenario.
+    """
+    from minpower.stochastic import _consensus_candidates
+
+    status = np.array([[1, 0, 1], [0, 0, 1], [0, 1, 1]])
+    candidates = _consensus_candidates(status, np.array([0.2, 0.5, 0.3]))
+    assert [c.tolist() for c in candidates] == [
+        [0, 0, 1],
+        [1, 1, 1],
+        [0, 1, 1],
+        [1, 0, 1],
+    ]
@@ -28,8 +28,8 @@ setup(
     install_requires=[
         "pandas>=1.3",
         "pyomo>=6.0",
+        "scipy>=1.6",
         "matplotlib>=3.4",
-        "xarray>=0.18",
     ],
     tests_require=["nose", "coverage", "objgraph"],
     # it helps to have seed if you are going to make releases
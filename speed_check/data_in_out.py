@@ -0,0 +1,29 @@
+from vbench.benchmark import Benchmark
+
+SECTION = 'Data input and output'
+
+common_setup = """
+from minpower_benchmark_utils import *
+"""
+
+# reading a large synthetic case (the spreadsheets into generator,
+# load and line objects with their schedules and initial conditions)
+parse_setup = common_setup + """
+import tempfile
+from minpower import get_data
+directory = tempfile.mkdtemp()
+write_case(directory, {n})
+user_config.directory = directory
+"""
+parse_statement = """
+get_data.parsedir()
+"""
+
+bm_parse_case_5000 = Benchmark(parse_statement, parse_setup.format(n=5000),
+                               ncalls=1, name='parse_case_5000')
+
+# the same case, loaded from its compiled bundle
+bm_parse_compiled_case_5000 = Benchmark(
+    parse_statement,
+    parse_setup.format(n=5000) + "get_data.compile_case()\n",
+    ncalls=1, name='parse_compiled_case_5000')
@@ -1,8 +1,132 @@
+import os
 import pandas as pd
 import numpy as np
 
-from minpower.powersystem import PowerSystem
-from minpower.generators import Generator
+from minpower.powersystems import PowerSystem
+from minpower.generators import Generator, Generator_Stochastic
+from minpower.stochastic import ScenarioStore
 
+from minpower import get_data, instrumentation
 from minpower.config import user_config
-from minpower.solve import solve_problem
+from minpower.solve import solve_problem, create_problem
+from minpower.powersystems import Load, Line
+from minpower.schedule import just_one_time, make_times_basic
+
+
+def make_grid(n_buses, seed=0, n_hours=1):
+    """
+    A synthetic transmission grid: a ring of buses with random cross
+    connections to nearby buses (about 1.4 lines per bus).
+    Every bus has a load and every tenth bus has a generator.
+    About a tenth of the lines have (tight) limits.
+    For more than one hour, the loads follow a daily cycle
+    and the generators have minimum outputs (a unit commitment).
+    """
+    rng = np.random.RandomState(seed)
+    times = just_one_time() if n_hours == 1 else make_times_basic(n_hours)
+    names = ['b{}'.format(i) for i in range(n_buses)]
+
+    ends = [(i, (i + 1) % n_buses) for i in range(n_buses)]
+    starts = rng.randint(n_buses, size=int(0.4 * n_buses))
+    ends.extend(zip(starts, (starts + rng.randint(2, 50, size=len(starts))) % n_buses))
+    lines = [Line(frombus=names[i], tobus=names[j],
+                  reactance=rng.uniform(0.01, 0.1),
+                  pmax=rng.uniform(50, 200) if rng.rand() < 0.1 else 9999)
+             for i, j in ends if i != j]
+
+    cycle = 1 - 0.3 * np.cos(2 * np.pi * np.arange(n_hours) / 24.0)
+    loads = [Load(bus=name, schedule=pd.Series(rng.uniform(5, 15) * cycle,
+                                               index=times.strings.values))
+             for name in names]
+    generators = [Generator(bus=name, pmax=300,
+                            pmin=0 if n_hours == 1 else 50,
+                            startupcost=0 if n_hours == 1 else 500,
+                            costcurveequation='{}P'.format(rng.randint(10, 50)))
+                  for name in names[::10]]
+    for g, gen in enumerate(generators):
+        gen.index = g
+        gen.set_initial_condition()
+    return generators, loads, lines, times
+
+
+def add_stochastic_wind(generators, times, n_scenarios, seed=0):
+    """
+    Add a wind generator with `n_scenarios` (equally likely)
+    random scenarios to the generators of :func:`make_grid`.
+    """
+    rng = np.random.RandomState(seed)
+    scenarios = pd.DataFrame(rng.uniform(0, 200, (n_scenarios, len(times))))
+    scenarios.insert(0, 'probability', 1.0 / n_scenarios)
+    wind = Generator_Stochastic(
+        name='wind', pmax=200, bus=generators[0].bus,
+        scenario_values=ScenarioStore.from_days(
+            {times.Start.date(): scenarios}))
+    wind.index = len(generators)
+    wind.set_initial_condition()
+    return generators + [wind]
+
+
+def write_case(directory, n_generators, n_hours=24, seed=0):
+    """
+    Write a synthetic case to a directory: polynomial cost generators
+    (one in twenty with a power schedule), one scheduled load and
+    initial conditions for every generator.
+    """
+    rng = np.random.RandomState(seed)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    times = pd.date_range('2011-01-01 01:00', periods=n_hours, freq='H')
+    cycle = 1 - 0.3 * np.cos(2 * np.pi * np.arange(n_hours) / 24.0)
+    pd.DataFrame(dict(time=times, power=100.0 * n_generators * cycle)).to_csv(
+        os.path.join(directory, 'load.csv'), index=False)
+    pd.DataFrame(dict(time=times, power=rng.uniform(0, 50, n_hours))).to_csv(
+        os.path.join(directory, 'wind.csv'), index=False)
+    pd.DataFrame({'name': ['load'], 'schedule filename': ['load.csv']}).to_csv(
+        os.path.join(directory, 'loads.csv'), index=False)
+
+    names = ['g{}'.format(g) for g in range(n_generators)]
+    scheduled = np.arange(n_generators) % 20 == 0
+    pmax = rng.uniform(100, 500, n_generators).round()
+    pd.DataFrame({
+        'name': names,
+        'pmin': np.where(scheduled, np.nan, (0.2 * pmax).round()),
+        'pmax': pmax,
+        'min up time': rng.randint(1, 8, n_generators),
+        'start up cost': rng.uniform(0, 1000, n_generators).round(),
+        'cost curve equation': [
+            '{}+{}P+{}P^2'.format(a, b, c) for a, b, c in zip(
+                rng.randint(0, 100, n_generators),
+                rng.randint(10, 50, n_generators),
+                rng.choice([0.001, 0.002, 0.005], n_generators))],
+        'schedule filename': np.where(scheduled, 'wind.csv', None),
+    }).to_csv(os.path.join(directory, 'generators.csv'), index=False)
+    pd.DataFrame({
+        'name': names,
+        'power': np.where(scheduled, 0, 0.5 * pmax),
+        'status': 1,
+        'hours in status': rng.randint(1, 24, n_generators),
+    }).to_csv(os.path.join(directory, 'initial.csv'), index=False)
+
+
+def stochastic_build_phases(directory):
+    """
+    Build (without solving) each stage of a stochastic case and
+    return the wall time (in sec) and peak memory (in MB) of building
+    each stage's scenario problem (the "create scenario problem" phase).
+    """
+    user_config.directory = os.path.expanduser(directory)
+    generators, loads, lines, times, scenario_tree, data = get_data.parsedir()
+    stage_times = times.subdivide(
+        user_config.hours_commitment, user_config.hours_overlap) \
+        if times.spanhrs > user_config.hours_commitment else [times]
+
+    instrumentation.reset()
+    power_system = PowerSystem(generators, loads, lines)
+    for stg, t in enumerate(stage_times):
+        instrumentation.set_stage(stg)
+        create_problem(power_system, t, scenario_tree, stg)
+        power_system.reset_model()
+    phases = instrumentation.phase_times()
+    phases = phases[phases.phase == 'create scenario problem']
+    instrumentation.reset()
+    return phases.set_index('stage')[['wall_time', 'peak_memory']]
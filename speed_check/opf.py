@@ -0,0 +1,60 @@
+from vbench.benchmark import Benchmark
+
+SECTION = 'Optimal power flow'
+
+common_setup = """
+from minpower_benchmark_utils import *
+"""
+
+setup = common_setup + """
+directory = '~/minpower/minpower/tests/opf'
+user_config.ptdf_formulation = {ptdf}
+"""
+statement = """
+solve_problem(directory,
+    shell=False,
+    problemfile=False,
+    csv=False)
+"""
+
+bm_opf = Benchmark(statement, setup.format(ptdf=False), ncalls=1,
+                   name='opf')
+bm_opf_ptdf = Benchmark(statement, setup.format(ptdf=True), ncalls=1,
+                        name='opf_ptdf')
+
+# problem creation only (no solve) for a large synthetic grid
+grid_setup = common_setup + """
+from minpower.solve import create_problem
+user_config.ptdf_formulation = {ptdf}
+generators, loads, lines, times = make_grid({n_buses})
+"""
+grid_statement = """
+power_system = PowerSystem(generators, loads, lines)
+create_problem(power_system, times)
+"""
+
+bm_build_grid = Benchmark(grid_statement,
+                          grid_setup.format(ptdf=False, n_buses=5000),
+                          ncalls=1, name='build_grid_5000')
+bm_build_grid_ptdf = Benchmark(grid_statement,
+                               grid_setup.format(ptdf=True, n_buses=5000),
+                               ncalls=1, name='build_grid_5000_ptdf')
+
+# unit commitment for a synthetic grid, with the line limits
+# all created or added lazily (only for lines over their limits)
+uc_grid_setup = common_setup + """
+from minpower.solve import create_problem
+user_config.ptdf_formulation = True
+user_config.lazy_line_limits = {lazy}
+generators, loads, lines, times = make_grid(500, n_hours=24)
+"""
+uc_grid_statement = """
+power_system = PowerSystem(generators, loads, lines)
+create_problem(power_system, times)
+power_system.solve_problem(times)
+"""
+
+bm_uc_grid = Benchmark(uc_grid_statement, uc_grid_setup.format(lazy=False),
+                       ncalls=1, name='uc_grid_500_ptdf')
+bm_uc_grid_lazy = Benchmark(uc_grid_statement, uc_grid_setup.format(lazy=True),
+                            ncalls=1, name='uc_grid_500_ptdf_lazy')
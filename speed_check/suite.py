@@ -5,6 +5,7 @@ import os
 
 modules = [
     'unit_commitment',
+    'opf',
     'data_in_out'
     ]
 
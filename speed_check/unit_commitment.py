@@ -19,3 +19,88 @@ solve_problem(directory,
 
 bm_simple_uc = Benchmark(statement, setup, ncalls=1,
                        name='simple_uc')
+
+# problem creation only (no solve)
+build_setup = common_setup + """
+import os
+from minpower import get_data
+from minpower.solve import create_problem
+user_config.directory = os.path.expanduser('~/minpower/minpower/tests/{case}')
+generators, loads, lines, times, scenario_tree, data = get_data.parsedir()
+stage_times = times.subdivide(
+    user_config.hours_commitment, user_config.hours_overlap) \\
+    if times.spanhrs > user_config.hours_commitment else [times]
+"""
+build_statement = """
+power_system = PowerSystem(generators, loads, lines)
+for t in stage_times:
+    create_problem(power_system, t)
+    power_system.reset_model()
+"""
+
+bm_build_uc = Benchmark(build_statement, build_setup.format(case='uc'),
+                        name='build_uc')
+bm_build_uc_rolling = Benchmark(build_statement,
+                                build_setup.format(case='uc-rolling'),
+                                name='build_uc_rolling')
+
+# stochastic problem creation, including the scenario instances
+# (vbench only times the build, run this module for the build time
+# and peak memory of each stage)
+build_stochastic_statement = """
+power_system = PowerSystem(generators, loads, lines)
+for stg, t in enumerate(stage_times):
+    create_problem(power_system, t, scenario_tree, stg)
+    power_system.reset_model()
+"""
+
+bm_build_uc_stochastic_rolling = Benchmark(
+    build_stochastic_statement,
+    build_setup.format(case='uc-stochastic-rolling'),
+    name='build_uc_stochastic_rolling')
+
+# the scenarios of a progressive hedging problem
+# (they share the problem's instance, so there are no copies to make)
+ph_setup = common_setup + """
+from minpower.solve import create_problem
+generators, loads, lines, times = make_grid(1000, n_hours=24)
+generators = add_stochastic_wind(generators, times, n_scenarios=50)
+user_config.progressive_hedging = True
+"""
+ph_statement = """
+power_system = PowerSystem(generators, loads, lines)
+create_problem(power_system, times)
+power_system.reset_model()
+"""
+
+bm_build_uc_stochastic_ph = Benchmark(ph_statement, ph_setup, ncalls=1,
+                                      name='build_uc_stochastic_ph_50')
+
+# results extraction for a large (copper plate) unit commitment
+results_setup = common_setup + """
+from minpower.solve import create_problem
+from minpower.results import make_solution
+generators, loads, lines, times = make_grid(3000, n_hours=48)
+for obj in generators + loads:
+    obj.bus = 'b0'
+power_system = PowerSystem(generators, loads, [])
+create_problem(power_system, times)
+power_system.solve_problem(times)
+"""
+results_statement = """
+make_solution(power_system, times)
+"""
+
+bm_results_uc_grid = Benchmark(results_statement, results_setup,
+                               ncalls=1, name='results_uc_grid_3000')
+
+
+if __name__ == '__main__':
+    # the build time and peak memory of each stochastic stage
+    from minpower_benchmark_utils import stochastic_build_phases, user_config
+    for progressive_hedging in [False, True]:
+        user_config.progressive_hedging = progressive_hedging
+        print('progressive hedging' if progressive_hedging
+              else 'extensive form')
+        print(stochastic_build_phases(
+            '~/minpower/minpower/tests/uc-stochastic-rolling'))